@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+Synthetic media written by the benchmark suite, so that it needs no assets:
+    write_wav -> 16 bit PCM WAV file with a sine tone
+    write_avi -> uncompressed 24 bit AVI file with a moving gradient
+
+'''
+
+import math
+import struct
+import wave
+
+def write_wav(filename,seconds=10,rate=44100,channels=2,frequency=440.0):
+    '''Write a 16 bit PCM WAV file with a sine tone at -6 dBFS
+
+    Parameters:
+        filename (str): file to write
+        seconds (float): duration
+        rate (int): sample rate in Hz
+        channels (int): number of channels, all with the same tone
+        frequency (float): frequency of the tone in Hz
+    '''
+    period = [int(16383*math.sin(2*math.pi*frequency*i/rate)) for i in range(rate)] # one second
+    second = struct.pack(f"<{rate*channels}h",*[v for v in period for _ in range(channels)])
+    with wave.open(filename,'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        for _ in range(int(seconds)):
+            f.writeframes(second)
+
+def _chunk(fourcc,data):
+    return fourcc + struct.pack('<I',len(data)) + data + (b'\0' if len(data) % 2 else b'')
+
+def _list(kind,data):
+    return _chunk(b'LIST',kind + data)
+
+def write_avi(filename,seconds=4,fps=25,width=160,height=120):
+    '''Write an uncompressed AVI file ('DIB ' frames, bottom-up BGR) with a moving gradient
+
+    Parameters:
+        filename (str): file to write
+        seconds (float): duration
+        fps (int): frames per second
+        width (int): width in pixels, multiple of 4
+        height (int): height in pixels
+    '''
+    frames = int(seconds*fps)
+    size = width*height*3
+    avih = struct.pack('<14I',1000000//fps,size*fps,0,0x10,frames,0,1,size,width,height,0,0,0,0)
+    strh = struct.pack('<4s4sIHHIIIIIIIIhhhh',b'vids',b'DIB ',0,0,0,0,1,fps,0,frames,size,0xFFFFFFFF,0,
+                       0,0,width,height)
+    strf = struct.pack('<IiiHHIIiiII',40,width,height,1,24,0,size,0,0,0,0)
+    hdrl = _list(b'hdrl',_chunk(b'avih',avih) + _list(b'strl',_chunk(b'strh',strh) + _chunk(b'strf',strf)))
+    movi, index = [], []
+    offset = 4 # from the 'movi' fourcc
+    for n in range(frames):
+        row = bytes((x + n*4) % 256 for x in range(width) for _ in range(3))
+        chunk = _chunk(b'00db',row*height)
+        index.append(struct.pack('<4sIII',b'00db',0x10,offset,size))
+        movi.append(chunk)
+        offset += len(chunk)
+    body = b'AVI ' + hdrl + _list(b'movi',b''.join(movi)) + _chunk(b'idx1',b''.join(index))
+    with open(filename,'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I',len(body)) + body)
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+Microbenchmark and regression suite of the core components, run on the offscreen Qt platform.
+
+Each case is timed several times and its best time per call is compared
+with benchmarks/baseline.json: a case slower than its baseline by more
+than the tolerance is a regression, and the suite exits with status 1,
+as it does when a case of the baseline cannot run. The cases of the
+player (convertDuration, probe) need the multimedia backend of Qt and
+are left out of the baseline until it is recorded on a machine with it.
+The suite runs in a temporary folder holding the synthetic media and a
+copy of the configuration, so the configuration of the application is
+never touched.
+
+Usage:
+    python benchmarks/run.py [--update] [--tolerance 0.5] [--only NAME ...] [--output FILE]
+
+'''
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT,"benchmarks","baseline.json")
+WIDGET_TREES = (100,1000,10000) # labels of the synthetic widget trees of updateLanguage
+MIN_TIME = 0.05 # s of each timed run, the number of calls is calibrated to reach it
+REPEAT = 7 # timed runs of each case, the best one is kept
+
+os.environ["QT_QPA_PLATFORM"] = "offscreen"
+sys.path.insert(0,ROOT)
+sys.path.insert(0,os.path.dirname(os.path.abspath(__file__)))
+
+def measure(fn):
+    '''Best time of a call of fn, in microseconds
+
+    The number of calls of each run is calibrated so that a run lasts at
+    least MIN_TIME seconds; the best of REPEAT runs is kept.
+
+    Parameters:
+        fn (callable): function without arguments to time
+    Returns:
+        float: microseconds per call
+    '''
+    t0 = time.perf_counter()
+    fn()
+    number = max(1,int(MIN_TIME/max(time.perf_counter() - t0,1e-7)))
+    best = None
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call = (time.perf_counter() - t0)/number
+        best = per_call if best is None else min(best,per_call)
+    return best*1e6
+
+class Suite:
+    '''Cases of the suite, sharing the QApplication, the paths and the synthetic media
+
+    Each case is a method named case_<name> which prepares its objects and
+    returns the function to time, or a dictionary of them by name.
+    '''
+    def __init__(self,folder):
+        '''Class initialization, writing the synthetic media in folder
+
+        Parameters:
+            folder (str): working folder of the suite
+        '''
+        from PySide6.QtWidgets import QApplication
+        from media import write_wav, write_avi
+        self.folder = folder
+        self.app = QApplication.instance() or QApplication(["catplayer-benchmarks"])
+        self.wav = os.path.join(folder,"tone.wav")
+        self.avi = os.path.join(folder,"gradient.avi")
+        write_wav(self.wav)
+        write_avi(self.avi)
+        self.path, self.config, self.language = self.load()
+
+    def load(self):
+        '''Paths, configuration and vocabulary of the application, as read at startup'''
+        from src.main import load_settings
+        return load_settings()
+
+    def cases(self):
+        '''Names of the cases, in the order of definition'''
+        return [name[5:] for name in Suite.__dict__ if name.startswith("case_")]
+
+    def case_path_setup(self):
+        from src.os_folder_system import Path
+        from src.setup import INSTALLATION_TYPE, APP_OWNER, APP_NAME
+        return lambda: Path(INSTALLATION_TYPE,APP_OWNER,APP_NAME)
+
+    def case_config_load(self):
+        from src.utils import get_past_settings
+        return lambda: get_past_settings(self.path)
+
+    def case_config_save(self):
+        from src.settings import SettingsStore
+        store = SettingsStore(os.path.join(self.folder,"saved.json"),self.config)
+        store.close() # no background writes while timing
+        def save():
+            store["open_date"] = time.perf_counter() # always a change
+            store.flush()
+        return save
+
+    def case_language_fromKey(self):
+        keys = list(self.language.vocabulary(self.language.selected)) + ["missing-key"]
+        def lookup():
+            for key in keys:
+                self.language.fromKey(key)
+        return lookup
+
+    def case_language_getKey(self):
+        words = list(self.language.vocabulary(self.language.selected).values()) + ["missing word"]
+        def lookup():
+            for word in words:
+                self.language.getKey(word)
+        return lookup
+
+    def case_updateLanguage(self):
+        from PySide6.QtWidgets import QLabel, QVBoxLayout, QWidget
+        from src.language import Language
+        from src.selectLanguage import SelectLanguage
+        keys = list(self.language.vocabulary(self.language.selected))
+        languages = self.language.list_languages
+        self.trees = []
+        cases = {}
+        for size in WIDGET_TREES:
+            language = Language(dict(self.config),self.path) # own bindings for each tree
+            dialog = SelectLanguage(language,self.config)
+            root = QWidget()
+            layout = QVBoxLayout(root)
+            for i in range(size):
+                label = QLabel()
+                layout.addWidget(label)
+                language.bind(label,"text",keys[i % len(keys)])
+                language.bind(label,"toolTip",keys[(i + 1) % len(keys)])
+            self.trees.append((dialog,root))
+            state = {"n":0}
+            def update(dialog=dialog,language=language,state=state):
+                state["n"] += 1
+                language.select(languages[state["n"] % len(languages)])
+                dialog.updateLanguage(language.selected)
+            cases[f"updateLanguage_{size}"] = update
+        return cases
+
+    def case_mainwindow(self):
+        from src.mainWindow import MainWindow
+        def construct():
+            window = MainWindow(None,self.config,self.language,self.path)
+            window.new_config.close()
+            window.deleteLater()
+        return construct
+
+    def case_convertDuration(self):
+        from src.videoplayer import MediaPlayer
+        player = MediaPlayer()
+        positions = range(0,7200000,997) # two hours, a bit less than a second apart
+        def convert():
+            for ms in positions:
+                player.convertDuration(ms)
+        return convert
+
+    def case_loudness_wav(self):
+        from src.loudness import LoudnessAccumulator
+        import numpy as np
+        import wave
+        with wave.open(self.wav,'rb') as f:
+            rate, channels = f.getframerate(), f.getnchannels()
+            samples = np.frombuffer(f.readframes(f.getnframes()),dtype=np.int16).reshape(-1,channels)
+        samples = samples.astype(np.float32)/32768.0
+        def analyse():
+            accumulator = LoudnessAccumulator()
+            for i in range(0,len(samples),4096):
+                accumulator.feed(samples[i:i + 4096],rate)
+            accumulator.result()
+        return analyse
+
+    def case_probe(self):
+        from src.benchmark import wait_for
+        from src.probe import MediaProbe
+        probe = MediaProbe()
+        cases = {}
+        for name,filename in (("probe_wav",self.wav),("probe_avi",self.avi)):
+            def load(filename=filename):
+                probe.probe(filename)
+                if not wait_for(probe.probed):
+                    raise RuntimeError(f"{filename} not probed")
+            cases[name] = load
+        return cases
+
+def run(suite,only=None):
+    '''Time the cases of a suite
+
+    Parameters:
+        suite (Suite): suite to run
+        only (list): names of the cases to run, all by default
+    Returns:
+        tuple: microseconds per call by case, reason by case not available
+    '''
+    results, unavailable = {}, {}
+    for name in suite.cases():
+        if only and not any(o == name or o.startswith(name + "_") for o in only):
+            continue
+        try:
+            with contextlib.redirect_stdout(sys.stderr): # keep the diagnostics of the application apart
+                functions = getattr(suite,"case_" + name)()
+        except Exception as e: # e.g. a multimedia backend missing on this machine
+            unavailable[name] = f"{type(e).__name__}: {e}"
+            continue
+        if callable(functions):
+            functions = {name:functions}
+        for case,fn in functions.items():
+            if only and case not in only and name not in only:
+                continue
+            try:
+                with contextlib.redirect_stdout(sys.stderr):
+                    results[case] = round(measure(fn),3)
+            except Exception as e:
+                unavailable[case] = f"{type(e).__name__}: {e}"
+            suite.app.processEvents()
+    return results,unavailable
+
+def compare(results,baseline,tolerance):
+    '''Print the results against the baseline
+
+    Parameters:
+        results (dict): microseconds per call by case
+        baseline (dict): microseconds per call by case of the baseline
+        tolerance (float): accepted slowdown, 0.5 for 50% slower than the baseline
+    Returns:
+        list: names of the regressed cases
+    '''
+    regressions = []
+    print(f"{'case':<24} {'baseline us':>13} {'current us':>13} {'ratio':>7}")
+    for case,current in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            print(f"{case:<24} {'-':>13} {current:13.3f} {'-':>7}  new")
+            continue
+        ratio = current/reference if reference else float("inf")
+        status = ""
+        if ratio > 1.0 + tolerance:
+            status = "REGRESSION"
+            regressions.append(case)
+        elif ratio < 1.0/(1.0 + tolerance):
+            status = "faster"
+        print(f"{case:<24} {reference:13.3f} {current:13.3f} {ratio:7.2f}  {status}")
+    return regressions
+
+def missing(unavailable,baseline):
+    '''Cases of the baseline which could not run
+
+    Parameters:
+        unavailable (dict): reason by case not available, a case method giving several cases by its name
+        baseline (dict): microseconds per call by case of the baseline
+    Returns:
+        list: names of the missing cases of the baseline
+    '''
+    return sorted(case for case in baseline for name in unavailable if case == name or case.startswith(name + "_"))
+
+def main():
+    parser = argparse.ArgumentParser(description='Offscreen benchmarks of the core components, compared with a baseline.')
+    parser.add_argument('--update',action='store_true',help='Write the results as the new baseline')
+    parser.add_argument('--tolerance',default=0.5,type=float,
+                        help='Accepted slowdown before failing, 0.5 for 50%% slower than the baseline')
+    parser.add_argument('--only',default=None,nargs='+',metavar='NAME',help='Run only these cases')
+    parser.add_argument('--baseline',default=BASELINE,metavar='FILE',help='Baseline json file')
+    parser.add_argument('--output',default=None,metavar='FILE',help='Write the results as json in FILE')
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="catplayer-bench-")
+    cwd = os.getcwd()
+    try:
+        # Path "local_dir" reads and writes in the working folder: read-only data is linked, configuration copied
+        os.symlink(os.path.join(ROOT,"data"),os.path.join(folder,"data"),target_is_directory=True)
+        os.makedirs(os.path.join(folder,"config"))
+        if os.path.exists(os.path.join(ROOT,"config","config.json")):
+            shutil.copy(os.path.join(ROOT,"config","config.json"),os.path.join(folder,"config","config.json"))
+        os.chdir(folder)
+        from PySide6.QtCore import qVersion
+        results,unavailable = run(Suite(folder),args.only)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(folder,ignore_errors=True)
+
+    try:
+        with open(args.baseline,'r',encoding='utf8') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {"results":{}}
+    regressions = compare(results,baseline.get("results",{}),args.tolerance)
+    for case,reason in unavailable.items():
+        print(f"{case:<24} not available: {reason}")
+    lost = missing(unavailable,baseline.get("results",{}))
+
+    report = {"python":sys.version.split()[0],"qt":qVersion(),"platform":sys.platform,"results":results}
+    if args.output:
+        with open(args.output,'w',encoding='utf8') as f:
+            json.dump(report,f,indent=2)
+    if args.update:
+        baseline["results"] = {**baseline.get("results",{}),**results}
+        baseline.update({k:v for k,v in report.items() if k != "results"})
+        with open(args.baseline,'w',encoding='utf8') as f:
+            json.dump(baseline,f,indent=2)
+            f.write("\n")
+        print(f"Baseline written in {args.baseline}")
+    elif regressions:
+        print(f"FAILED: {len(regressions)} regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+    if lost:
+        print(f"FAILED: {len(lost)} cases of the baseline not available: {', '.join(lost)}")
+    return 1 if lost or regressions and not args.update else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
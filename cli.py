@@ -19,15 +19,50 @@ __version__ = "0.0.0"
 __maintainer__ = "Marco Catillo"
 __status__ = "Production"
 
+from src.tracer import trace
 from src.main import main
+from src.mvars import PROBE_TIMEOUT
 import argparse
-import sys
 import os
-from src.setup import *
+import sys
 
 
 parser = argparse.ArgumentParser(description='Basic video/music player app.',prog='catplayer')
-parser.add_argument('filename',default=None,nargs='?',help='Video/Music input file')
+parser.add_argument('files',default=[],nargs='*',metavar='FILE',
+                    help='Video/Music input files, folders or M3U/M3U8/PLS playlists')
+parser.add_argument('-r','--recursive',action='store_true',
+                    help='Include the subfolders of the given folders')
+parser.add_argument('--enqueue',action='store_true',
+                    help='Append the files to the queue of the running instance instead of playing them')
+parser.add_argument('--new-instance',action='store_true',
+                    help='Start a new instance instead of forwarding the files to the running one')
+parser.add_argument('--trace-startup',action='store_true',
+                    help='Print where the startup time is spent')
+parser.add_argument('--profile',action='store_true',
+                    help='Time the slots and the event loop lag, printing a report when the window is closed')
+parser.add_argument('--profile-stats',default=None,metavar='FILE',
+                    help='With --profile, write cProfile statistics of the GUI thread in FILE (pstats format)')
+parser.add_argument('--benchmark',default=None,nargs='+',metavar='FILE',
+                    help='Run headless and write timing measures of the given media files as json')
+parser.add_argument('--seek-positions',default=[10.0,50.0,90.0],nargs='+',type=float,metavar='PCT',
+                    help='Seek positions, as percentage of the duration, measured by --benchmark')
+parser.add_argument('--benchmark-output',default=None,metavar='FILE',
+                    help='Write the --benchmark report in FILE instead of the standard output')
+
+probe_parser = argparse.ArgumentParser(description='Probe media files headless and report their duration, tracks and codecs.',
+                                       prog='catplayer probe')
+probe_parser.add_argument('files',nargs='+',metavar='FILE',
+                          help='Media files, folders or M3U/M3U8/PLS playlists to probe')
+probe_parser.add_argument('-r','--recursive',action='store_true',
+                          help='Include the subfolders of the given folders')
+probe_parser.add_argument('-j','--jobs',default=os.cpu_count() or 1,type=int,metavar='N',
+                          help='Number of worker processes (default: number of CPUs)')
+probe_parser.add_argument('--timeout',default=PROBE_TIMEOUT,type=int,metavar='MS',
+                          help=f'Milliseconds given to each file for loading (default: {PROBE_TIMEOUT})')
+probe_parser.add_argument('--format',default='jsonl',choices=('jsonl','csv'),
+                          help='Report format: one json object per line, or csv')
+probe_parser.add_argument('-o','--output',default=None,metavar='FILE',
+                          help='Write the report in FILE instead of the standard output')
 
 class ParseArgs:
     def __init__(self,parser):
@@ -35,7 +70,9 @@ class ParseArgs:
         self.list = sys.argv
   
 if __name__ == "__main__":
-    arg = parser.parse_args() # file video/music to open
-    arg = ParseArgs(parser.parse_args())
-    arg.parser.filename = arg.parser.filename if len(arg.list)>1 else None
+    trace.mark("application modules imported")
+    if len(sys.argv) > 1 and sys.argv[1] == "probe": # subcommand, use ./probe for a file named probe
+        from src.batchprobe import run_probe
+        sys.exit(run_probe(probe_parser.parse_args(sys.argv[2:])))
+    arg = ParseArgs(parser.parse_args()) # files video/music to open
     main(arg)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we have the class:
+    AssetCache -> icons of data/media rasterized once for each size and device pixel ratio
+
+'''
+
+from PySide6.QtGui import QIcon
+from PySide6.QtCore import QSize
+import os
+import sys
+
+FORMAT = 'svg' if sys.platform=="linux" or sys.platform=="linux2" else "png"
+
+class AssetCache:
+    '''Icons of data/media rasterized once for each size and device pixel ratio
+
+    Attributes:
+        folder (str): folder of the icon files
+        fmt (str): extension of the icon files
+        hits (int): icons taken from the cache
+        misses (int): icons read and rasterized
+    '''
+    def __init__(self,folder,fmt=FORMAT):
+        '''Class initialization
+
+        Parameters:
+            folder (str): folder of the icon files
+            fmt (str): extension of the icon files
+        '''
+        self.folder = folder
+        self.fmt = fmt
+        self.pixmaps = {} # (name, width, height, dpr) -> QIcon
+        self.hits = 0
+        self.misses = 0
+
+    def icon(self,name,size,dpr=1.0):
+        '''Icon rasterized at a size, read from disk only the first time
+
+        Parameters:
+            name (str): file name of the icon, without extension
+            size (QSize): logical size of the icon
+            dpr (float): device pixel ratio of the screen
+        Returns:
+            QIcon: icon holding the rasterized pixmap
+        '''
+        key = (name,size.width(),size.height(),dpr)
+        icon = self.pixmaps.get(key)
+        if icon is not None:
+            self.hits += 1
+            return icon
+        self.misses += 1
+        pixmap = QIcon(os.path.join(self.folder,f"{name}.{self.fmt}")).pixmap(size,dpr)
+        icon = self.pixmaps[key] = QIcon(pixmap)
+        return icon
+
+    def apply(self,button,name):
+        '''Set the icon of a button, only if it shows a different one
+
+        Parameters:
+            button (QAbstractButton): button showing the icon
+            name (str): file name of the icon, without extension
+        Returns:
+            bool: True if the icon has been changed
+        '''
+        dpr = button.devicePixelRatioF()
+        state = f"{name}@{dpr}"
+        if button.property("asset") == state:
+            return False
+        button.setIcon(self.icon(name,button.iconSize(),dpr))
+        button.setProperty("asset",state)
+        return True
+
+    def stats(self):
+        '''Hit and miss counters of the cache'''
+        return {"hits":self.hits,"misses":self.misses,"items":len(self.pixmaps)}
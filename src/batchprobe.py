@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+Headless probing of many media files with a pool of worker processes:
+    run_probe -> probe the files of the command line, writing a JSONL or CSV report
+
+Each worker runs an offscreen Qt application with one MediaProbe, reused
+for all its files. The parent hands one file at a time to each worker
+and replaces the workers which do not answer within the timeout, so a
+broken file cannot stall the batch.
+
+'''
+
+from src.inputs import iter_inputs
+import csv
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+CSV_COLUMNS = ("path","duration_ms","has_video","has_audio","width","height","video_codec","audio_codec",
+               "video_tracks","audio_tracks","subtitle_tracks","probe_ms","error")
+
+def _worker(worker_id,tasks,results,timeout):
+    '''Main function of a worker process: probe the files received from tasks
+
+    Parameters:
+        worker_id (int): identifier of the worker, given back with each result
+        tasks (Queue): files to probe, None to stop
+        results (Queue): (worker_id, path, info) tuples
+        timeout (int): milliseconds given to each file by MediaProbe
+    '''
+    os.environ.setdefault("QT_QPA_PLATFORM","offscreen")
+    from PySide6.QtCore import QEventLoop
+    from PySide6.QtGui import QGuiApplication
+    app = QGuiApplication(["catplayer-probe"])
+    from src.probe import MediaProbe
+    probe = MediaProbe(timeout)
+    loop = QEventLoop()
+    result = {}
+    def probed(path,info):
+        result["info"] = info
+        loop.quit()
+    probe.probed.connect(probed)
+    while True:
+        path = tasks.get()
+        if path is None:
+            break
+        start = time.perf_counter()
+        result.clear()
+        probe.probe(path)
+        if "info" not in result:
+            loop.exec()
+        info = result["info"]
+        info["probe_ms"] = round((time.perf_counter() - start)*1000.0,1)
+        results.put((worker_id,path,info))
+
+def csv_row(path,info):
+    '''Flatten a probe result in the CSV_COLUMNS
+
+    Parameters:
+        path (str): probed file
+        info (dict): media_info of the file, or {"error":...}
+    Returns:
+        dict: value of each column
+    '''
+    resolution = info.get("resolution") or [None,None]
+    tracks = info.get("tracks",{})
+    return {"path":path,
+            "duration_ms":info.get("duration"),
+            "has_video":info.get("has_video"),
+            "has_audio":info.get("has_audio"),
+            "width":resolution[0],
+            "height":resolution[1],
+            "video_codec":info.get("video_codec"),
+            "audio_codec":info.get("audio_codec"),
+            "video_tracks":len(tracks.get("video",[])) if tracks else None,
+            "audio_tracks":len(tracks.get("audio",[])) if tracks else None,
+            "subtitle_tracks":len(tracks.get("subtitles",[])) if tracks else None,
+            "probe_ms":info.get("probe_ms"),
+            "error":info.get("error")}
+
+class _Pool:
+    '''Worker processes with one file in flight each, replaced when stuck'''
+    def __init__(self,jobs,timeout):
+        self.context = multiprocessing.get_context("spawn") # no Qt state is inherited by the workers
+        self.timeout = timeout
+        self.results = self.context.Queue()
+        self.workers = {} # worker_id -> [process, tasks, path in flight, start time]
+        self.next_id = 0
+        for _ in range(jobs):
+            self.__spawn()
+
+    def __spawn(self):
+        tasks = self.context.Queue()
+        process = self.context.Process(target=_worker,args=(self.next_id,tasks,self.results,self.timeout),daemon=True)
+        process.start()
+        self.workers[self.next_id] = [process,tasks,None,0.0]
+        self.next_id += 1
+
+    def idle(self):
+        '''Identifiers of the workers without a file in flight'''
+        return [w for w,state in self.workers.items() if state[2] is None]
+
+    def busy(self):
+        '''Number of files in flight'''
+        return sum(1 for state in self.workers.values() if state[2] is not None)
+
+    def submit(self,worker_id,path):
+        state = self.workers[worker_id]
+        state[2], state[3] = path, time.monotonic()
+        state[1].put(path)
+
+    def collect(self,wait):
+        '''Results received within wait seconds, with the timeouts of the stuck workers
+
+        Yields:
+            tuple: (path, info)
+        '''
+        try:
+            worker_id,path,info = self.results.get(timeout=wait)
+            if worker_id in self.workers:
+                self.workers[worker_id][2] = None
+                yield path,info
+            while True:
+                worker_id,path,info = self.results.get_nowait()
+                if worker_id in self.workers:
+                    self.workers[worker_id][2] = None
+                    yield path,info
+        except queue.Empty:
+            pass
+        # the worker startup is not charged to the file: twice the timeout plus a grace period
+        deadline = 2*self.timeout/1000.0 + 10.0
+        now = time.monotonic()
+        for worker_id,(process,tasks,path,start) in list(self.workers.items()):
+            if path is not None and (now - start > deadline or not process.is_alive()):
+                reason = "worker crashed" if not process.is_alive() else "timeout"
+                process.kill()
+                del self.workers[worker_id]
+                self.__spawn()
+                yield path,{"error":reason}
+
+    def close(self):
+        for process,tasks,path,start in self.workers.values():
+            tasks.put(None)
+        for process,tasks,path,start in self.workers.values():
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+
+def run_probe(args):
+    '''Probe the files of the command line, writing a JSONL or CSV report as results arrive
+
+    Parameters:
+        args (argparse.Namespace): files, recursive, format, jobs, timeout and output
+    Returns:
+        int: exit code, 1 if any file could not be probed
+    '''
+    output = open(args.output,'w',encoding='utf8',newline='') if args.output else sys.stdout
+    writer = None
+    if args.format == "csv":
+        writer = csv.DictWriter(output,fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+    def write(path,info):
+        if writer is not None:
+            writer.writerow(csv_row(path,info))
+        else:
+            output.write(json.dumps({"path":path,**info},ensure_ascii=False) + "\n")
+        output.flush()
+
+    start = time.perf_counter()
+    count = errors = 0
+    pool = _Pool(max(1,args.jobs),args.timeout)
+    files = iter_inputs(args.files,args.recursive)
+    pending = True
+    try:
+        while pending or pool.busy():
+            for worker_id in pool.idle():
+                path = next(files,None)
+                if path is None:
+                    pending = False
+                    break
+                pool.submit(worker_id,path)
+            for path,info in pool.collect(0.2):
+                count += 1
+                errors += "error" in info
+                write(path,info)
+    finally:
+        pool.close()
+        if output is not sys.stdout:
+            output.close()
+    print(f"Probed {count} files, {errors} errors, in {time.perf_counter() - start:.1f} s",file=sys.stderr)
+    return 1 if errors else 0
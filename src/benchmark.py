@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+Headless benchmark of the application, run on the offscreen Qt platform.
+It measures import time, QApplication startup, MainWindow and player construction and,
+for each media file, the time to LoadedMedia, the time to the first frame
+and the seek latency, writing the results as json.
+The application reads and writes in a temporary folder holding a copy of
+the configuration, so the configuration, the resume positions and the
+caches of the user are never touched.
+
+'''
+
+import contextlib
+import copy
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from PySide6.QtCore import QEventLoop, QTimer, qVersion
+
+TIMEOUT = 10000 # ms waited for each event before giving up
+
+def elapsed(t0):
+    '''Milliseconds elapsed since t0, taken with time.perf_counter'''
+    return round((time.perf_counter()-t0)*1000.0,3)
+
+def wait_for(signal,check=lambda *args: True,timeout=TIMEOUT):
+    '''Run the event loop until signal is emitted with arguments satisfying check
+
+    Parameters:
+        signal (Signal): signal to wait for
+        check (function): predicate on the arguments of the signal
+        timeout (int): maximum waiting time in milliseconds
+    Returns:
+        bool: False if the timeout expired
+    '''
+    loop = QEventLoop()
+    result = {"ok":False}
+    def received(*args):
+        if check(*args):
+            result["ok"] = True
+            loop.quit()
+    signal.connect(received)
+    QTimer.singleShot(timeout,loop.quit)
+    loop.exec()
+    signal.disconnect(received)
+    return result["ok"]
+
+def import_time():
+    '''Measure the import of the application modules, with the multimedia stack, in a fresh interpreter'''
+    code = ("import time;t=time.perf_counter();import src.mainWindow;import src.videoplayer;"
+            "print((time.perf_counter()-t)*1000.0)")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ,QT_QPA_PLATFORM="offscreen")
+    out = subprocess.run([sys.executable,"-c",code],cwd=root,env=env,capture_output=True,text=True)
+    try:
+        return round(float(out.stdout.strip().splitlines()[-1]),3)
+    except (ValueError,IndexError):
+        return None
+
+def scratch_path(path,folder):
+    '''Copy of the paths of the application reading and writing in another folder
+
+    Parameters:
+        path (Path): paths of the application
+        folder (str): read-write folder of the copy, receiving a copy of config.json
+    Returns:
+        Path: paths with the read-write files in folder
+    '''
+    config_file = path.expand('rw_files','config','config.json')
+    os.makedirs(os.path.join(folder,'config'),exist_ok=True)
+    if os.path.exists(config_file):
+        shutil.copy(config_file,os.path.join(folder,'config','config.json'))
+    scratch = copy.copy(path)
+    scratch.fs = {**path.fs,path.installation_type:{**path.fs[path.installation_type],'rw_files':folder}}
+    return scratch
+
+def bench_file(window,filename,positions):
+    '''Measure loading, first frame and seek latency of a media file
+
+    Parameters:
+        window (MainWindow): window of the application
+        filename (str): media file to measure
+        positions (list): seek positions as percentage of the duration
+    Returns:
+        dict: measures in milliseconds, None when the event did not happen
+    '''
+    from PySide6.QtMultimedia import QMediaPlayer
+
+    video_widget = window.video_widget
+    result = {"file":filename,"set_source_ms":None,"loaded_ms":None,
+              "first_frame_ms":None,"seeks":[]}
+    player = video_widget.mediaPlayer
+    set_source = {}
+    def source_ready(url):
+        set_source["t"] = time.perf_counter()
+    player.loader.sourceReady.connect(source_ready)
+
+    t0 = time.perf_counter()
+    video_widget.open(filename)
+    loaded = wait_for(player.mediaStatusChanged,lambda s: s in (QMediaPlayer.LoadedMedia,QMediaPlayer.InvalidMedia))
+    player.loader.sourceReady.disconnect(source_ready)
+    if not loaded or player.mediaStatus() != QMediaPlayer.LoadedMedia:
+        result["error"] = player.errorString() or "media not loaded"
+        return result
+    if "t" in set_source:
+        result["set_source_ms"] = elapsed(set_source["t"])
+    result["loaded_ms"] = elapsed(t0)
+    result["duration_ms"] = player.duration()
+    result["has_video"] = player.hasVideo()
+
+    sink = video_widget.videoWidget.videoSink()
+    t0 = time.perf_counter()
+    video_widget.play()
+    if player.hasVideo():
+        ok = wait_for(sink.videoFrameChanged,lambda frame: frame.isValid())
+    else:
+        ok = wait_for(player.positionChanged,lambda pos: pos > 0)
+    if ok:
+        result["first_frame_ms"] = elapsed(t0)
+
+    for pct in positions:
+        target = int(player.duration()*pct/100.0)
+        t0 = time.perf_counter()
+        player.setPosition(target)
+        if player.hasVideo():
+            ok = wait_for(sink.videoFrameChanged,
+                          lambda frame: frame.isValid() and abs(frame.startTime()/1000.0-target) < 1000)
+        else:
+            ok = wait_for(player.positionChanged,lambda pos: abs(pos-target) < 1000)
+        result["seeks"].append({"position_pct":pct,"target_ms":target,
+                                "latency_ms":elapsed(t0) if ok else None})
+    video_widget.stop()
+    return result
+
+def run_benchmark(arg,path,config,language):
+    '''Run the benchmark and write the json report
+
+    Parameters:
+        arg (ParseArgs): parsed command line arguments
+        path (Path): paths of the application
+        config (dict): dictionary of the previous configuration
+        language (Language): words translated in the selected language
+    Returns:
+        int: exit status
+    '''
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    from PySide6.QtWidgets import QApplication
+    from src.mainWindow import MainWindow
+
+    report = {"python":sys.version.split()[0],"qt":qVersion(),"platform":sys.platform,
+              "import_ms":import_time()}
+
+    t0 = time.perf_counter()
+    app = QApplication(arg.list[:1])
+    report["qapplication_ms"] = elapsed(t0)
+
+    folder = tempfile.mkdtemp(prefix="catplayer-benchmark-")
+    try:
+        path = scratch_path(path,folder)
+        t0 = time.perf_counter()
+        window = MainWindow(None,dict(config),language,path)
+        report["mainwindow_ms"] = elapsed(t0)
+        window.show()
+        t0 = time.perf_counter()
+        window.build_player()
+        report["player_ms"] = elapsed(t0)
+
+        with contextlib.redirect_stdout(sys.stderr): # keep the diagnostics out of the report
+            report["files"] = [bench_file(window,os.path.abspath(f),arg.parser.seek_positions)
+                               for f in arg.parser.benchmark]
+            window.close() # stops the background writers and decoders
+            app.processEvents()
+    finally:
+        shutil.rmtree(folder,ignore_errors=True)
+
+    text = json.dumps(report,indent=2)
+    if arg.parser.benchmark_output:
+        with open(arg.parser.benchmark_output,'w',encoding='utf8') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we define the streaming decode of audio files:
+    audio_format -> float format requested to the decoder
+    buffer_samples -> samples of a QAudioBuffer as a numpy array
+    DecodeWorker -> QAudioDecoder feeding the decoded samples of a queue of files to an accumulator
+    DecodeThread -> DecodeWorker running in its own thread
+
+An accumulator is any object with feed(samples, rate), called for each
+decoded buffer with a (frames, channels) float32 array, and result(),
+called at the end of the file.
+
+'''
+
+from PySide6.QtCore import QObject, QThread, QUrl, Signal, Slot
+from PySide6.QtMultimedia import QAudioDecoder, QAudioFormat
+from collections import deque
+import numpy as np
+
+SAMPLE_TYPES = {QAudioFormat.UInt8:(np.uint8,128.0,128.0),
+                QAudioFormat.Int16:(np.int16,0.0,32768.0),
+                QAudioFormat.Int32:(np.int32,0.0,2147483648.0),
+                QAudioFormat.Float:(np.float32,0.0,1.0)}
+
+def audio_format(channels,rate):
+    '''Float format requested to the decoder
+
+    Parameters:
+        channels (int): number of channels
+        rate (int): sample rate in Hz
+    Returns:
+        QAudioFormat: format of the decoded buffers
+    '''
+    fmt = QAudioFormat()
+    fmt.setSampleFormat(QAudioFormat.Float)
+    fmt.setChannelCount(channels)
+    fmt.setSampleRate(rate)
+    return fmt
+
+def buffer_samples(buffer):
+    '''Samples of a QAudioBuffer as a numpy array
+
+    The backend may give a format different from the requested one, so
+    integer samples are converted as well.
+
+    Parameters:
+        buffer (QAudioBuffer): decoded buffer
+    Returns:
+        numpy.ndarray: (frames, channels) float32 samples between -1 and 1
+    '''
+    fmt = buffer.format()
+    dtype,offset,scale = SAMPLE_TYPES[fmt.sampleFormat()]
+    samples = np.frombuffer(buffer.constData(),dtype=dtype,count=buffer.sampleCount())
+    samples = samples.astype(np.float32) # copy, the buffer memory belongs to the decoder
+    if offset or scale != 1.0:
+        samples = (samples - offset)/scale
+    return samples.reshape(-1,max(1,fmt.channelCount()))
+
+class DecodeWorker(QObject):
+    '''QAudioDecoder feeding the decoded samples of a queue of files to an accumulator
+
+    Attributes:
+        fmt (QAudioFormat): format requested to the decoder
+        make_accumulator (callable): function returning a new accumulator for each file
+    '''
+    finished = Signal(str,str,object) # path, fingerprint, result of the accumulator
+    failed = Signal(str,str,str) # path, fingerprint, reason
+
+    def __init__(self,fmt,make_accumulator):
+        '''Class initialization
+
+        Parameters:
+            fmt (QAudioFormat): format requested to the decoder
+            make_accumulator (callable): function returning a new accumulator for each file
+        '''
+        super().__init__()
+        self.fmt = fmt
+        self.make_accumulator = make_accumulator
+        self.queue = deque()
+        self.current = None
+        self.decoder = None
+
+    @Slot(str,str)
+    def decode(self,path,fp):
+        '''Append a file to the queue of the files to decode
+
+        Parameters:
+            path (str): audio or video file
+            fp (str): fingerprint of the file, given back with the result
+        '''
+        if (path,fp) != self.current and (path,fp) not in self.queue:
+            self.queue.append((path,fp))
+        if self.current is None:
+            self.__next()
+
+    def __next(self):
+        if not self.queue:
+            return
+        self.current = self.queue.popleft()
+        self.accumulator = self.make_accumulator()
+        if self.decoder is None:
+            self.decoder = QAudioDecoder(self) # created in the worker thread
+            self.decoder.bufferReady.connect(self.__buffer_ready)
+            self.decoder.finished.connect(self.__finished)
+            self.decoder.error.connect(self.__error)
+        self.decoder.setAudioFormat(self.fmt)
+        self.decoder.setSource(QUrl.fromLocalFile(self.current[0]))
+        self.decoder.start()
+
+    def __buffer_ready(self):
+        while self.current is not None and self.decoder.bufferAvailable():
+            buffer = self.decoder.read()
+            if buffer.isValid() and buffer.sampleCount():
+                self.accumulator.feed(buffer_samples(buffer),buffer.format().sampleRate())
+
+    def __finished(self):
+        if self.current is None:
+            return
+        self.__buffer_ready()
+        (path,fp), self.current = self.current, None
+        try:
+            result = self.accumulator.result()
+        except ValueError as e:
+            self.failed.emit(path,fp,str(e))
+        else:
+            self.finished.emit(path,fp,result)
+        self.__next()
+
+    def __error(self,error):
+        if self.current is None:
+            return
+        (path,fp), self.current = self.current, None
+        self.decoder.stop()
+        self.failed.emit(path,fp,self.decoder.errorString())
+        self.__next()
+
+class DecodeThread(QObject):
+    '''DecodeWorker running in its own thread, so that decoding never blocks the GUI'''
+    requested = Signal(str,str) # path, fingerprint
+
+    def __init__(self,fmt,make_accumulator,parent=None):
+        '''Class initialization, starting the thread
+
+        Parameters:
+            fmt (QAudioFormat): format requested to the decoder
+            make_accumulator (callable): function returning a new accumulator for each file
+            parent (QObject): parent object
+        '''
+        super().__init__(parent)
+        self.worker_thread = QThread()
+        self.worker = DecodeWorker(fmt,make_accumulator)
+        self.worker.moveToThread(self.worker_thread)
+        self.requested.connect(self.worker.decode)
+        self.finished = self.worker.finished
+        self.failed = self.worker.failed
+        self.worker_thread.start(QThread.LowPriority)
+
+    def decode(self,path,fp):
+        '''Queue a file for decoding in the worker thread
+
+        Parameters:
+            path (str): audio or video file
+            fp (str): fingerprint of the file, given back with the result
+        '''
+        self.requested.emit(path,fp)
+
+    def stop(self):
+        '''Stop the worker thread'''
+        self.worker_thread.quit()
+        self.worker_thread.wait()
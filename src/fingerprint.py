@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+Cheap content fingerprint of media files: the size plus the hash of a few
+sampled chunks, so that a renamed or moved file keeps its fingerprint
+without reading it whole.
+
+'''
+
+import hashlib
+import os
+
+SAMPLE = 64*1024 # bytes of each sampled chunk
+
+def fingerprint(path,size=None):
+    '''Fingerprint of a file from its size and the chunks at its start, middle and end
+
+    Parameters:
+        path (str): file to fingerprint
+        size (int): size of the file, taken with os.stat if None
+    Returns:
+        str: hexadecimal fingerprint
+    '''
+    size = os.stat(path).st_size if size is None else size
+    h = hashlib.blake2b(str(size).encode(),digest_size=16)
+    with open(path,'rb') as f:
+        if size <= 3*SAMPLE:
+            h.update(f.read())
+        else:
+            for offset in (0,size//2 - SAMPLE//2,size - SAMPLE):
+                f.seek(offset)
+                h.update(f.read(SAMPLE))
+    return h.hexdigest()
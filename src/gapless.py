@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we define the engine for gapless playback of a queue:
+    GaplessEngine -> keep the next item pre-rolled in a second player and swap the outputs at the end of media
+
+'''
+
+from PySide6.QtCore import QObject, QUrl, Signal
+from PySide6.QtMultimedia import QMediaPlayer
+from src.playlist import Playlist
+
+class GaplessEngine(QObject):
+    '''Engine alternating two players for playing a playlist without reload gaps
+
+    While the active player is playing, the standby player loads the next
+    file of the playlist and waits in LoadedMedia state. At the end of media
+    the video and audio outputs move to the standby player, which starts
+    playing at once, and the old player pre-rolls the following file.
+    When the playlist changes, the pre-rolled file is replaced if it is no
+    longer the next one.
+
+    Attributes:
+        active (MediaPlayer): player attached to the outputs
+        standby (MediaPlayer): player pre-rolling the next file
+        playlist (Playlist): files to play
+        current (str): file of the active player
+    '''
+    swapped = Signal(object,object) # old player, new active player
+    finished = Signal() # end of media at the end of the playlist
+
+    def __init__(self,players,videoOutput,audioOutput):
+        '''Class initialization
+
+        Parameters:
+            players (tuple): the two MediaPlayer to alternate
+            videoOutput (QVideoWidget): widget displaying the video
+            audioOutput (QAudioOutput): output device of the audio
+        '''
+        super().__init__()
+        self.active, self.standby = players
+        self.videoOutput = videoOutput
+        self.audioOutput = audioOutput
+        self.playlist = Playlist()
+        self.standby_item = None # entry identifier of the pre-rolled file
+        self.current = None
+        self.pending_play = False
+        self.active.setAudioOutput(self.audioOutput)
+        self.active.setVideoOutput(self.videoOutput)
+        for player in players:
+            player.mediaStatusChanged.connect(lambda status,player=player: self.__status_changed(player,status))
+            player.loader.failed.connect(lambda path,reason,player=player: self.__load_failed(player))
+        for signal in (self.playlist.rowsInserted,self.playlist.rowsRemoved,self.playlist.rowMoved):
+            signal.connect(self.__playlist_changed)
+        self.playlist.reset.connect(self.__playlist_changed)
+        self.playlist.shuffleChanged.connect(self.__playlist_changed)
+
+    def open(self,path):
+        '''Play a file at once, inserting it in the playlist after the current one
+
+        Parameters:
+            path (str): file to open
+        '''
+        row = self.playlist.insert(self.playlist.current + 1,path)
+        self.play(row,autoplay=False)
+
+    def play(self,row,autoplay=True):
+        '''Load a row of the playlist in the active player
+
+        Parameters:
+            row (int): row of the playlist
+            autoplay (bool): start playing as soon as the file is loaded
+        '''
+        self.pending_play = autoplay
+        self.current = self.playlist.path(row)
+        self.playlist.setCurrent(row)
+        self.active.MysetSource(self.current)
+        self.__preroll()
+
+    def enqueue(self,path):
+        '''Append a file to the playlist
+
+        Parameters:
+            path (str): file to append
+        '''
+        self.playlist.append(path)
+
+    def enqueueMany(self,paths):
+        '''Append files to the playlist at once
+
+        Parameters:
+            paths (list): files to append
+        '''
+        self.playlist.extend(paths)
+
+    def clear(self):
+        '''Remove all the files of the playlist, releasing the pre-rolled one'''
+        self.playlist.clear()
+
+    def hasNext(self):
+        '''Check if there is a file after the current one'''
+        return self.standby_item is not None
+
+    def next(self):
+        '''Play the next file of the playlist, if any'''
+        row = self.playlist.rowOf(self.standby_item) if self.standby_item is not None else -1
+        if row < 0:
+            self.finished.emit()
+            return
+        old, new = self.active, self.standby
+        self.standby_item = None
+
+        old.setVideoOutput(None)
+        old.setAudioOutput(None)
+        new.setAudioOutput(self.audioOutput)
+        new.setVideoOutput(self.videoOutput)
+        self.active, self.standby = new, old
+        if new.mediaStatus() in (QMediaPlayer.LoadedMedia,QMediaPlayer.BufferedMedia):
+            new.play()
+        else:
+            self.pending_play = True # pre-roll not completed yet
+        old.stop()
+        old.setSource(QUrl())
+        self.current = self.playlist.path(row)
+        self.playlist.setCurrent(row,jump=False)
+        self.swapped.emit(old,new)
+        self.__preroll()
+
+    def __preroll(self):
+        '''Load the next file of the playlist in the standby player, if not loaded yet'''
+        row = self.playlist.nextRow()
+        item = self.playlist.entryId(row) if row >= 0 else None
+        if item == self.standby_item:
+            return
+        self.standby_item = item
+        if item is None:
+            self.standby.setSource(QUrl())
+        else:
+            self.standby.MysetSource(self.playlist.path(row))
+
+    def __playlist_changed(self,*arg):
+        '''Replace the pre-rolled file when it is no longer the next one'''
+        self.__preroll()
+
+    def __status_changed(self,player,status):
+        '''Move to the next file at the end of media of the active player'''
+        if player is not self.active:
+            return
+        if status == QMediaPlayer.EndOfMedia:
+            self.next()
+        elif self.pending_play and status == QMediaPlayer.LoadedMedia:
+            self.pending_play = False
+            player.play()
+
+    def __load_failed(self,player):
+        '''Skip the files which cannot be loaded'''
+        if player is self.standby:
+            row = self.playlist.rowOf(self.standby_item) if self.standby_item is not None else -1
+            self.standby_item = None
+            if row >= 0:
+                self.playlist.remove([row],undo=False) # pre-rolls the following file
+        elif self.pending_play:
+            self.pending_play = False
+            self.next()
@@ -16,7 +16,6 @@ https://www.gnu.org/licenses/gpl-3.0.html
 from PySide6.QtWidgets import *
 from PySide6.QtGui import *
 from PySide6.QtCore import *
-from src.language import *
 
 class Header(QLabel):
     def __init__(self,arg,lang):
@@ -29,7 +28,13 @@ class Header(QLabel):
         self.setCursor(QCursor(Qt.IBeamCursor))
 
     def setHeaderTitle(self,arg):
-        self.arg = arg if arg else self.lang.fromKey('nofileselected')
-        self.setText(self.arg)
-        self.setToolTip(self.arg)
+        if arg:
+            self.lang.unbind(self,"text")
+            self.lang.unbind(self,"toolTip")
+            self.setText(arg)
+            self.setToolTip(arg)
+        else:
+            self.lang.bind(self,"text","nofileselected")
+            self.lang.bind(self,"toolTip","nofileselected")
+        self.arg = self.text()
 
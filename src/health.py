@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we have the classes:
+    RollingHistogram -> histogram of the latest samples of a measure
+    PlaybackHealth -> frame delivery, stalls and errors of the playing media
+    HealthOverlay -> label showing the PlaybackHealth measures over the video
+
+'''
+
+from PySide6.QtCore import QObject, QTimer, Qt
+from PySide6.QtWidgets import QLabel
+from PySide6.QtMultimedia import QMediaPlayer
+from src.mvars import HEALTH_WINDOW, HEALTH_LATE_FACTOR, HEALTH_DISCONTINUITY, HEALTH_OVERLAY_INTERVAL
+from collections import deque
+import bisect
+import json
+import time
+
+INTERVAL_EDGES = (8,17,34,50,67,100,200,500) # ms, upper bounds of the buckets
+DURATION_EDGES = (100,250,500,1000,2000,5000,10000) # ms
+
+class RollingHistogram:
+    '''Histogram of the latest samples of a measure
+
+    Attributes:
+        edges (tuple): upper bounds of the buckets, the last bucket is unbounded
+        samples (deque): latest samples
+        total (int): samples added since the last reset
+    '''
+    def __init__(self,edges,size=HEALTH_WINDOW):
+        '''Class initialization
+
+        Parameters:
+            edges (tuple): upper bounds of the buckets, in increasing order
+            size (int): number of latest samples kept
+        '''
+        self.edges = edges
+        self.samples = deque(maxlen=size)
+        self.total = 0
+
+    def add(self,value):
+        '''Add a sample'''
+        self.samples.append(value)
+        self.total += 1
+
+    def percentile(self,p):
+        '''Value below which p percent of the latest samples fall, None without samples'''
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1,int(len(ordered)*p/100.0))]
+
+    def summary(self):
+        '''Json serializable summary of the latest samples
+
+        Returns:
+            dict: count, window, mean, p50, p95, max and the count of each bucket
+        '''
+        buckets = [0]*(len(self.edges) + 1)
+        for value in self.samples:
+            buckets[bisect.bisect_left(self.edges,value)] += 1
+        labels = [f"<={e}" for e in self.edges] + [f">{self.edges[-1]}"]
+        n = len(self.samples)
+        return {"count":self.total,
+                "window":n,
+                "mean":round(sum(self.samples)/n,3) if n else None,
+                "p50":self.percentile(50),
+                "p95":self.percentile(95),
+                "max":max(self.samples) if n else None,
+                "buckets":dict(zip(labels,buckets))}
+
+class PlaybackHealth(QObject):
+    '''Frame delivery, stalls and errors of the playing media
+
+    A tap on the video sink times every frame shown: the wall clock
+    interval between two frames goes in a histogram, a frame is late when
+    its interval exceeds HEALTH_LATE_FACTOR times its expected duration, and
+    the frames missing between two timestamps are counted as dropped. The
+    player signals give the stalls, the buffer progress, the errors and the
+    time from a new source to its first frame.
+
+    Attributes:
+        player (QMediaPlayer): observed player
+        interval (RollingHistogram): ms between two shown frames
+        first_frame (RollingHistogram): ms from a new source to its first frame
+        stall (RollingHistogram): ms of each stall
+    '''
+    def __init__(self,sink):
+        '''Class initialization
+
+        Parameters:
+            sink (QVideoSink): sink of the video output, shared by the players
+        '''
+        super().__init__()
+        self.player = None
+        self.sink = sink
+        self.sink.videoFrameChanged.connect(self.__frame)
+        self.reset()
+
+    def reset(self):
+        '''Clear all the measures'''
+        self.interval = RollingHistogram(INTERVAL_EDGES)
+        self.first_frame = RollingHistogram(DURATION_EDGES)
+        self.stall = RollingHistogram(DURATION_EDGES)
+        self.frames = 0
+        self.late = 0
+        self.dropped = 0
+        self.stalls = 0
+        self.buffer_progress = None
+        self.min_buffer_progress = None
+        self.errors = deque(maxlen=20)
+        self.source_time = None
+        self.stall_start = None
+        self.last_wall = None
+        self.last_start = None
+        self.frame_ms = None
+
+    def setPlayer(self,player):
+        '''Observe a new player, e.g. the one taking over the video output
+
+        Parameters:
+            player (QMediaPlayer): player to observe
+        '''
+        if self.player is not None:
+            self.player.bufferProgressChanged.disconnect(self.__buffer_progress)
+            self.player.mediaStatusChanged.disconnect(self.__media_status)
+            self.player.errorOccurred.disconnect(self.__error)
+            self.player.sourceChanged.disconnect(self.__source_changed)
+        self.player = player
+        self.player.bufferProgressChanged.connect(self.__buffer_progress)
+        self.player.mediaStatusChanged.connect(self.__media_status)
+        self.player.errorOccurred.connect(self.__error)
+        self.player.sourceChanged.connect(self.__source_changed)
+        self.last_wall = None
+        self.stall_start = None
+
+    def report(self):
+        '''Json serializable report of the measures
+
+        Returns:
+            dict: frame, stall, buffer and error measures
+        '''
+        return {"source":self.player.source().toString() if self.player is not None else None,
+                "frames":self.frames,
+                "late_frames":self.late,
+                "dropped_frames":self.dropped,
+                "frame_interval_ms":self.interval.summary(),
+                "time_to_first_frame_ms":self.first_frame.summary(),
+                "stalls":self.stalls,
+                "stall_ms":self.stall.summary(),
+                "buffer_progress":self.buffer_progress,
+                "min_buffer_progress":self.min_buffer_progress,
+                "readahead_fill":self.player.readAheadFill() if hasattr(self.player,"readAheadFill") else None,
+                "errors":list(self.errors)}
+
+    def export(self,filename):
+        '''Write the report in a json file
+
+        Parameters:
+            filename (str): json file to write
+        '''
+        with open(filename,'w',encoding='utf8') as f:
+            json.dump(self.report(),f,indent=2,ensure_ascii=False)
+
+    def __source_changed(self,media):
+        self.source_time = time.perf_counter() if not media.isEmpty() else None
+        self.last_wall = None
+
+    def __frame(self,frame):
+        if self.player is None or not frame.isValid():
+            return
+        now = time.perf_counter()
+        if self.source_time is not None:
+            self.first_frame.add((now - self.source_time)*1000.0)
+            self.source_time = None
+        if self.player.playbackState() != QMediaPlayer.PlayingState:
+            self.last_wall = None
+            return
+        start = frame.startTime() # microseconds
+        self.frames += 1
+        if frame.endTime() > start:
+            self.frame_ms = (frame.endTime() - start)/1000.0
+        if self.last_wall is not None and start >= 0 and self.last_start >= 0:
+            wall = (now - self.last_wall)*1000.0
+            media = (start - self.last_start)/1000.0
+            if 0 < media < HEALTH_DISCONTINUITY: # seeks and loops are not measured
+                frame_ms = self.frame_ms or media
+                self.interval.add(wall)
+                self.dropped += max(0,round(media/frame_ms) - 1)
+                rate = self.player.playbackRate() or 1.0
+                if wall > HEALTH_LATE_FACTOR*frame_ms/rate:
+                    self.late += 1
+        self.last_wall = now
+        self.last_start = start
+
+    def __media_status(self,status):
+        now = time.perf_counter()
+        if status == QMediaPlayer.StalledMedia:
+            if self.stall_start is None:
+                self.stall_start = now
+                self.stalls += 1
+        elif self.stall_start is not None:
+            self.stall.add((now - self.stall_start)*1000.0)
+            self.stall_start = None
+            self.last_wall = None
+
+    def __buffer_progress(self,progress):
+        self.buffer_progress = progress
+        if self.player.playbackState() == QMediaPlayer.PlayingState:
+            if self.min_buffer_progress is None or progress < self.min_buffer_progress:
+                self.min_buffer_progress = progress
+
+    def __error(self,error,error_string):
+        if error != QMediaPlayer.NoError:
+            self.errors.append({"time":time.strftime("%Y-%m-%dT%H:%M:%S"),"error":error_string})
+
+class HealthOverlay(QLabel):
+    '''Label showing the PlaybackHealth measures over the video, updated while visible'''
+    def __init__(self,health,parent):
+        '''Class initialization, hidden
+
+        Parameters:
+            health (PlaybackHealth): measures to show
+            parent (QWidget): widget covered by the overlay
+        '''
+        super().__init__(parent)
+        self.health = health
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet("background-color: rgba(0,0,0,160); color: white; padding: 4px; font-family: monospace;")
+        self.timer = QTimer(self)
+        self.timer.setInterval(HEALTH_OVERLAY_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def toggle(self):
+        '''Show or hide the overlay'''
+        if self.isVisible():
+            self.timer.stop()
+            self.hide()
+        else:
+            self.refresh()
+            self.move(8,8)
+            self.show()
+            self.raise_()
+            self.timer.start()
+
+    def refresh(self):
+        '''Write the latest measures in the label'''
+        r = self.health.report()
+        interval = r["frame_interval_ms"]
+        fmt = lambda v: "--" if v is None else f"{v:.1f}"
+        self.setText("\n".join([
+            f"frames {r['frames']}  late {r['late_frames']}  dropped {r['dropped_frames']}",
+            f"interval p50 {fmt(interval['p50'])}  p95 {fmt(interval['p95'])}  max {fmt(interval['max'])} ms",
+            f"first frame {fmt(r['time_to_first_frame_ms']['p50'])} ms",
+            f"stalls {r['stalls']}  p95 {fmt(r['stall_ms']['p95'])} ms",
+            f"buffer {fmt(r['buffer_progress'])}  read-ahead {fmt(r['readahead_fill'])}  errors {len(r['errors'])}"]))
+        self.adjustSize()
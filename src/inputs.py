@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we resolve the inputs given to the application:
+    is_playlist -> check if a file is a M3U/M3U8/PLS playlist
+    iter_playlist -> entries of a playlist, read line by line
+    iter_folder -> media files of a folder
+    iter_inputs -> media files of a list of files, folders and playlists
+    InputFeeder -> iter_inputs running in a background thread, delivering the files in batches
+
+'''
+
+from PySide6.QtCore import QObject, QUrl, Signal
+from src.mvars import VIDEO_EXTENSIONS, INPUT_BATCH, INPUT_BATCH_INTERVAL
+import os
+import threading
+import time
+
+PLAYLIST_EXTENSIONS = ('.m3u','.m3u8','.pls')
+MAX_DEPTH = 8 # playlists nested in playlists
+
+def is_playlist(path):
+    '''Check if a file is a M3U/M3U8/PLS playlist, from its extension'''
+    return os.path.splitext(path)[1].lower() in PLAYLIST_EXTENSIONS
+
+def is_media(path):
+    '''Check if a file has one of the extensions of the "Videos" filter'''
+    return os.path.splitext(path)[1][1:].lower() in {e.lower() for e in VIDEO_EXTENSIONS}
+
+def _entry(location,folder):
+    '''Local file of a playlist entry, None for remote urls
+
+    Parameters:
+        location (str): entry as written in the playlist
+        folder (str): folder of the playlist, base of the relative entries
+    '''
+    if location.startswith("file:"):
+        return QUrl(location).toLocalFile()
+    if "://" in location:
+        return None
+    return os.path.normpath(os.path.join(folder,os.path.expanduser(location)))
+
+def iter_playlist(path):
+    '''Entries of a playlist, read line by line so that the first ones come at once
+
+    Parameters:
+        path (str): M3U, M3U8 or PLS playlist
+    Yields:
+        str: location of each local entry, in the playlist order
+    '''
+    folder = os.path.dirname(os.path.abspath(path))
+    pls = path.lower().endswith('.pls')
+    with open(path,'r',encoding='utf-8-sig',errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if pls:
+                key,_,location = line.partition('=')
+                if not key.lower().startswith('file'):
+                    continue
+            elif not line or line.startswith('#'):
+                continue
+            else:
+                location = line
+            entry = _entry(location,folder)
+            if entry is None:
+                print(f"Skipping {location}: remote entries are not supported")
+            else:
+                yield entry
+
+def iter_folder(folder,recursive=False):
+    '''Media files of a folder, in name order, filtered by the "Videos" extensions
+
+    Parameters:
+        folder (str): folder to list
+        recursive (bool): list the subfolders as well
+    Yields:
+        str: path of each media file
+    '''
+    try:
+        entries = sorted(os.scandir(folder),key=lambda e: e.name.lower())
+    except OSError as e:
+        print(f"Skipping {folder}: {e}")
+        return
+    for entry in entries:
+        if entry.is_dir():
+            if recursive:
+                yield from iter_folder(entry.path,recursive)
+        elif is_media(entry.name):
+            yield entry.path
+
+def iter_inputs(items,recursive=False,depth=0):
+    '''Media files of a list of files, folders and playlists
+
+    Everything is resolved lazily: the first file is yielded before the
+    rest of the folders and playlists are read.
+
+    Parameters:
+        items (list): files, folders and playlists
+        recursive (bool): list the subfolders of the folders as well
+        depth (int): nesting level of the playlists
+    Yields:
+        str: path of each media file
+    '''
+    for item in items:
+        if os.path.isdir(item):
+            yield from iter_folder(item,recursive)
+        elif is_playlist(item) and depth < MAX_DEPTH:
+            try:
+                yield from iter_inputs(iter_playlist(item),recursive,depth + 1)
+            except OSError as e:
+                print(f"Skipping {item}: {e}")
+        else:
+            yield item
+
+class InputFeeder(QObject):
+    '''iter_inputs running in a background thread, delivering the files in batches
+
+    The first file is delivered alone and at once; the others are grouped
+    in batches of INPUT_BATCH files or INPUT_BATCH_INTERVAL seconds. The
+    signals are emitted in the thread of the feeder.
+
+    Attributes:
+        count (int): files delivered so far
+    '''
+    first = Signal(str) # first file, when split_first is set
+    resolved = Signal(list) # following files
+    finished = Signal(int) # number of files delivered
+    _ready = Signal(list)
+    _done = Signal()
+
+    def __init__(self,items,recursive=False,split_first=True,parent=None):
+        '''Class initialization
+
+        Parameters:
+            items (list): files, folders and playlists
+            recursive (bool): list the subfolders of the folders as well
+            split_first (bool): deliver the first file through the first signal
+            parent (QObject): parent object
+        '''
+        super().__init__(parent)
+        self.items = list(items)
+        self.recursive = recursive
+        self.split_first = split_first
+        self.count = 0
+        self.stopping = False
+        self._ready.connect(self.__deliver)
+        self._done.connect(self.__done)
+        self.worker = None
+
+    def start(self):
+        '''Start resolving the inputs'''
+        self.worker = threading.Thread(target=self.__run,name="inputs",daemon=True)
+        self.worker.start()
+
+    def stop(self):
+        '''Stop resolving the inputs, the batch being read is dropped'''
+        self.stopping = True
+
+    def __deliver(self,batch):
+        if self.stopping:
+            return
+        if self.split_first and self.count == 0:
+            self.count += 1
+            self.first.emit(batch[0])
+            batch = batch[1:]
+        if batch:
+            self.count += len(batch)
+            self.resolved.emit(batch)
+
+    def __done(self):
+        if not self.stopping:
+            self.finished.emit(self.count)
+
+    def __run(self):
+        batch = []
+        first = True
+        last = time.monotonic()
+        for path in iter_inputs(self.items,self.recursive):
+            if self.stopping:
+                return
+            batch.append(path)
+            if first or len(batch) >= INPUT_BATCH or time.monotonic() - last >= INPUT_BATCH_INTERVAL:
+                self._ready.emit(batch)
+                batch = []
+                first = False
+                last = time.monotonic()
+        if batch:
+            self._ready.emit(batch)
+        self._done.emit()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+Single instance mode: the first instance listens on a local socket, the
+later ones forward their files to it and exit.
+    forward -> send a command to the running instance
+    InstanceServer -> local server of the running instance
+
+'''
+
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtNetwork import QLocalServer, QLocalSocket, QAbstractSocket
+from src.setup import APP_NAME
+from src.mvars import INSTANCE_TIMEOUT
+import getpass
+import json
+import os
+
+COMMANDS = ("play","enqueue","show")
+
+def server_name():
+    '''Name of the local socket of the running instance, one for each user'''
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "user"
+    return f"{APP_NAME}-{user}"
+
+def forward(command,files,recursive=False,timeout=INSTANCE_TIMEOUT):
+    '''Send a command to the running instance
+
+    Parameters:
+        command (str): "play" opens the files, "enqueue" appends them to the queue,
+            "show" brings the window to the front
+        files (list): files, folders or playlists of the command, relative to the current folder
+        recursive (bool): include the subfolders of the folders
+        timeout (int): milliseconds given to each step of the handoff
+    Returns:
+        bool: True if the running instance has accepted the command
+    '''
+    socket = QLocalSocket()
+    socket.connectToServer(server_name())
+    if not socket.waitForConnected(timeout):
+        return False
+    message = {"command":command,"files":[os.path.abspath(f) for f in files],"recursive":recursive}
+    socket.write(json.dumps(message).encode('utf8')+b"\n")
+    accepted = socket.waitForBytesWritten(timeout) and socket.waitForReadyRead(timeout) \
+               and bytes(socket.readLine()).strip() == b"ok"
+    socket.disconnectFromServer()
+    return accepted
+
+class InstanceServer(QObject):
+    '''Local server receiving the commands of the later instances
+
+    Attributes:
+        listening (bool): False if another instance already owns the socket
+    '''
+    received = Signal(str,list,bool) # command, files, recursive
+
+    def __init__(self,parent=None):
+        '''Class initialization, starting to listen
+
+        Parameters:
+            parent (QObject): owner of the server
+        '''
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.__new_connection)
+        name = server_name()
+        self.listening = self.server.listen(name)
+        if not self.listening and self.server.serverError() == QAbstractSocket.AddressInUseError:
+            # socket file left by a crashed instance: remove it unless someone answers
+            probe = QLocalSocket()
+            probe.connectToServer(name)
+            if not probe.waitForConnected(INSTANCE_TIMEOUT):
+                QLocalServer.removeServer(name)
+                self.listening = self.server.listen(name)
+            else:
+                probe.disconnectFromServer()
+        if not self.listening:
+            print(f"Single instance mode disabled: {self.server.errorString()}")
+
+    def close(self):
+        '''Stop listening'''
+        self.server.close()
+
+    def __new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.__read(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def __read(self,socket):
+        if not socket.canReadLine():
+            return
+        try:
+            message = json.loads(bytes(socket.readLine()).decode('utf8'))
+            command, files = message["command"], [str(f) for f in message["files"]]
+            recursive = bool(message.get("recursive",False))
+            if command not in COMMANDS:
+                raise ValueError(command)
+        except (ValueError,KeyError,TypeError) as e:
+            print(f"Invalid command from another instance: {e}")
+            socket.write(b"error\n")
+            return
+        socket.write(b"ok\n")
+        socket.flush()
+        self.received.emit(command,files,recursive)
@@ -10,22 +10,25 @@ Copyright (C) 2024 Marco Catillo
 Distribuited under GPLv3 license
 https://www.gnu.org/licenses/gpl-3.0.html
 
-In this python file we have two classes:
+In this python file we have the class:
     Language -> for handling words to be translated with different languages
-    SelectLanguage -> window for selecting a given language
 
 '''
 
-from PySide6.QtWidgets import *
-from PySide6.QtGui import *
-from PySide6 import QtCore
-import json
+from src.vocabulary import VocabularyCache
+import weakref
 
 class Language:
     '''This class handles words to be translated with different languages
+
+    The widgets register the keys of their texts through bind(), so that
+    retranslate() updates only them, without looking up their current text.
     
     Attributes:
         config (dict): dictionary containing the current configuration
+        words (dict): for each loaded language, dictionary from key to word
+        index (dict): for each loaded language, reverse dictionary from word to key
+        bindings (dict): registered (widget, property) with their key
     '''
     def __init__(self,config,path):
         '''Class initialization
@@ -36,6 +39,7 @@ class Language:
         self.selected = 'en'
         self.config = config
         self.path = path
+        self.bindings = {}
         self.__take_language()
         self.select()
 
@@ -48,24 +52,71 @@ class Language:
             str: word of the correspective key
         '''
         try:
-            word = self.data[key][self.selected]
+            word = self.vocabulary(self.selected)[key]
         except:
             word = '--'
         return word
     
-    def getKey(self,word):
+    def getKey(self,word,language=None):
         '''Function for getting the id (key) from a given word
         
         Parameters:
             word (str): word from which we want to get the id (key)
+            language (str): language of the word, the selected one by default
         Returns:
             str: id of word
         '''
-        for k,v in self.data.items():
-            for value in v.values():
-                if value == word:
-                    return k
-        return 'id'
+        language = language if language else self.selected
+        if language not in self.index:
+            self.index[language] = {v:k for k,v in self.vocabulary(language).items()}
+        return self.index[language].get(word,'id')
+
+    def vocabulary(self,lang):
+        '''Function for getting the words of a language, loading them at the first use
+        
+        Parameters:
+            lang (str): language of the words
+        Returns:
+            dict: dictionary from key to word
+        '''
+        if lang not in self.words:
+            if lang not in self.list_languages:
+                raise KeyError(lang)
+            self.words[lang] = self.cache.load(lang)
+        return self.words[lang]
+
+    def bind(self,widget,prop,key,column=None):
+        '''Set a text property of a widget with the word of key, registering it for retranslate()
+
+        Parameters:
+            widget (QObject): widget or action to translate, or an item with texts by column (e.g. QTreeWidgetItem)
+            prop (str): name of the property, e.g. text, toolTip, statusTip, windowTitle, placeholderText
+            key (str): id of the word
+            column (int): column of the text for the items, None for the widgets
+        '''
+        setter = getattr(widget,'set'+prop[0].upper()+prop[1:])
+        args = () if column is None else (column,)
+        setter(*args,self.fromKey(key))
+        self.bindings[(id(widget),prop,column)] = (weakref.ref(widget),setter.__name__,args,key)
+
+    def unbind(self,widget,prop,column=None):
+        '''Stop translating a text property of a widget
+
+        Parameters:
+            widget (QObject): registered widget or action
+            prop (str): name of the registered property
+            column (int): registered column of the items
+        '''
+        self.bindings.pop((id(widget),prop,column),None)
+
+    def retranslate(self):
+        '''Update the registered widgets with the words of the selected language'''
+        for k,(ref,setter,args,key) in list(self.bindings.items()):
+            widget = ref()
+            try:
+                getattr(widget,setter)(*args,self.fromKey(key))
+            except (AttributeError,RuntimeError): # widget already deleted
+                del self.bindings[k]
 
     def select(self,el=None):
         '''Function for seeting up self.select
@@ -75,13 +126,10 @@ class Language:
         '''
         self.old_selected = self.selected
         if el is None:
-            if "language" in self.config.keys():
-                if self.config["language"] in self.list_languages:
-                    self.selected = self.config["language"]
-                else:
-                    self.selected = self.list_languages[0]
+            if self.config.get("language") in self.list_languages:
+                self.selected = self.config["language"]
             else:
-                self.selected = None
+                self.selected = self.list_languages[0]
         else:
             if el in self.list_languages:
                 self.selected = el
@@ -89,139 +137,10 @@ class Language:
                 self.selected = None
 
     def __take_language(self):
-        '''Read the word vocabulary and put it in self.data'''
+        '''Validate the compiled vocabulary: the words of each language are loaded by self.vocabulary'''
 
         vocabulary_file = self.path.expand("r_files","data","vocabulary.json")
-        with open(vocabulary_file,"r") as f:
-            self.data = json.load(f)
-        self.list_languages = list(self.data[list(self.data)[0]].keys())
-
-class SelectLanguage(QDialog):
-    '''This class is for displaying the window for selecting a language
-    
-    Attributes:
-        language (str): selected language to translate words
-        config (dict): dictionary containing the current configuration
-    '''
-    def __init__(self,language,config):
-        '''Class initialization
-        
-        Parameters:
-            language (str): selected language to translate words
-            config (dict): dictionary containing the current configuration
-        '''
-        super().__init__()
-        self.language = language
-        self.config = config
-
-        self.setWindowTitle(self.language.fromKey("language"))
-        self.setFixedWidth(180)
-        self.setFixedHeight(160)
-
-        main_layout = QVBoxLayout()
-        list_layout = QVBoxLayout()
-        for el in self.language.list_languages:
-            w = self.button(el)
-            list_layout.addWidget(w)
-
-        self.decision()
-
-        decision_layout = QHBoxLayout()
-        decision_layout.addWidget(self.okay)
-        decision_layout.addWidget(self.canc)
-        main_layout.addLayout(list_layout)
-        main_layout.addLayout(decision_layout)
-
-        self.setLayout(main_layout)
-
-    def button(self,el):
-        '''Button widget for selecting a language
-        
-        Parameters:
-            el (str): selected language
-        '''
-        w = QPushButton()
-        w.clicked.connect(lambda : self.__select(el))
-        w.setCursor(QCursor(QtCore.Qt.PointingHandCursor))
-        w.setText(self.language.fromKey(el))
-        return w
-    
-    def decision(self):
-        '''Define Ok and Cancel buttons for implementing the language changes or not'''
-        self.okay = QDialogButtonBox(QDialogButtonBox.Ok)
-        self.okay.setToolTip(self.language.fromKey("okaylingua"))
-        self.okay.setCursor(QCursor(QtCore.Qt.PointingHandCursor))
-        self.okay.clicked.connect(self.commit_language_changes)
-
-        self.canc = QDialogButtonBox(QDialogButtonBox.Cancel)
-        self.canc.setToolTip(self.language.fromKey("canclingua"))
-        self.canc.setCursor(QCursor(QtCore.Qt.PointingHandCursor))
-        self.canc.clicked.connect(self.back_previous_language)
-
-    def back_previous_language(self):
-        '''Function activated when button Canc is chosen'''
-        self.language.select(self.language.old_selected)
-        self.config["language"] = self.language.selected
-        self.updateLanguage(self.language.old_selected)
-        self.close()
-
-    def commit_language_changes(self):
-        '''Function activated when button Ok is chosen'''
-        self.close()
-
-    def __select(self,el):
-        '''Select language el
-        
-        Parameters:
-            el (str): selected language
-        '''
-        self.language.select(el)
-        self.config["language"] = self.language.selected
-        self.updateLanguage(el)
-
-    def __update_widget(self,el):
-        '''Update all widgets of the app with the new selected language
-        
-        Parameters:
-            el (str): selected language
-        '''
-        list_methods = dir(type(el))
-        ktxt = None
-        ktip = None
-        ktit = None
-        if 'windowTitle' in list_methods:
-            ktit = self.language.getKey(el.windowTitle())
-        if 'setWindowTitle' in list_methods:
-            if ktit!=None and ktit!='id':
-                el.setWindowTitle(self.language.fromKey(ktit))
-        if 'text' in list_methods:
-            ktxt = self.language.getKey(el.text())
-        if 'setText' in list_methods:
-            if ktxt!=None and ktxt!='id':
-                el.setText(self.language.fromKey(ktxt))
-        if 'toolTip' in list_methods:
-            ktip = self.language.getKey(el.toolTip())
-        if 'setToolTip' in list_methods:
-            if ktip!=None and ktip!='id':
-                el.setToolTip(self.language.fromKey(ktip))
-        if 'repaint' in list_methods:
-            el.repaint()
-
-    def updateLanguage(self,el):
-        '''Update language
-        
-        Parameters:
-            el (str): selected language
-        '''
-        all_widg = QApplication.allWidgets()
-        for el in all_widg:
-            self.__update_widget(el)
-            children = el.findChildren(QAction)
-            for child in children:
-                self.__update_widget(child)
-
-
-        
-
-
-    
+        self.cache = VocabularyCache(vocabulary_file,self.path.cache_dir("vocabulary"))
+        self.list_languages = self.cache.languages()
+        self.words = {}
+        self.index = {}
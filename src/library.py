@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we define the media library:
+    MediaLibrary -> SQLite index of the media files of the configured folders
+    LibraryDialog -> window for searching the library and opening its files
+
+'''
+
+from PySide6.QtCore import QObject, QTimer, QFileSystemWatcher, Qt, Signal
+from PySide6.QtGui import QCursor
+from PySide6.QtWidgets import *
+from concurrent.futures import ThreadPoolExecutor
+from src.fingerprint import fingerprint
+from src.mvars import VIDEO_EXTENSIONS, AUDIO_EXTENSIONS, LIBRARY_WATCH_LIMIT
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    fingerprint TEXT,
+    duration INTEGER,
+    tracks TEXT,
+    scanned REAL
+);
+CREATE INDEX IF NOT EXISTS media_folder ON media(folder);
+CREATE INDEX IF NOT EXISTS media_name ON media(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS media_size ON media(size);
+CREATE INDEX IF NOT EXISTS media_mtime ON media(mtime_ns);
+CREATE INDEX IF NOT EXISTS media_duration ON media(duration);
+CREATE INDEX IF NOT EXISTS media_fingerprint ON media(fingerprint);
+"""
+
+# trigram index of the names, kept by triggers: substring searches of 3 or more characters without a table scan
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS media_names USING fts5(name, content='media', content_rowid='rowid', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS media_names_insert AFTER INSERT ON media BEGIN
+    INSERT INTO media_names(rowid,name) VALUES (new.rowid,new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS media_names_delete AFTER DELETE ON media BEGIN
+    INSERT INTO media_names(media_names,rowid,name) VALUES ('delete',old.rowid,old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS media_names_update AFTER UPDATE OF name ON media BEGIN
+    INSERT INTO media_names(media_names,rowid,name) VALUES ('delete',old.rowid,old.name);
+    INSERT INTO media_names(rowid,name) VALUES (new.rowid,new.name);
+END;
+"""
+FTS_MIN_LENGTH = 3 # shortest text found by the trigram index
+
+SORT_COLUMNS = {"name":"name COLLATE NOCASE","folder":"folder","size":"size",
+                "mtime":"mtime_ns","duration":"duration"}
+
+MEDIA_EXTENSIONS = {"."+ext.lower() for ext in VIDEO_EXTENSIONS + AUDIO_EXTENSIONS}
+
+def connect(database):
+    '''Open a connection to the library database, creating its tables if needed
+
+    The name index is built from the existing rows when it is created;
+    without FTS5 (SQLite older than 3.34) the searches scan the table.
+
+    Parameters:
+        database (str): SQLite file
+    Returns:
+        sqlite3.Connection: connection to the database
+    '''
+    con = sqlite3.connect(database,timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("PRAGMA recursive_triggers=ON") # INSERT OR REPLACE runs the delete trigger of the replaced row
+    con.executescript(SCHEMA)
+    if not has_fts(con):
+        try:
+            con.executescript(FTS_SCHEMA)
+            con.execute("INSERT INTO media_names(media_names) VALUES ('rebuild')")
+            con.commit()
+        except sqlite3.OperationalError as e:
+            print(f"Library name index not available: {e}")
+    return con
+
+def has_fts(con):
+    '''Check if the database has the trigram index of the names'''
+    return con.execute("SELECT 1 FROM sqlite_master WHERE name = 'media_names'").fetchone() is not None
+
+class MediaLibrary(QObject):
+    '''Index of the media files of the configured folders
+
+    Scans run in a background thread: the folders are listed with scandir,
+    and only the files whose size or modification time differ from the
+    index are fingerprinted, by a pool of workers. Duration and tracks are
+    filled by a MediaProbe on the files still missing them. The scanned
+    folders are watched, and rescanned (not recursively) when they change.
+
+    Attributes:
+        database (str): SQLite file of the index
+        folders (list): configured folders
+    '''
+    scanFinished = Signal(int,int,int,list,list) # added or changed, removed, unchanged files, scanned and vanished folders
+
+    def __init__(self,database,folders):
+        '''Class initialization
+
+        Parameters:
+            database (str): SQLite file of the index
+            folders (list): configured folders
+        '''
+        super().__init__()
+        self.database = database
+        self.folders = [os.path.abspath(f) for f in folders]
+        os.makedirs(os.path.dirname(self.database),exist_ok=True)
+        self.con = connect(self.database) # connection of the GUI thread
+        self.fts = has_fts(self.con)
+        self.scanning = threading.Lock()
+        self.prober = None
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.__directory_changed)
+        self.changed_dirs = set()
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.timeout.connect(self.__rescan_changed)
+        self.scanFinished.connect(self.__scan_finished)
+
+    def rescan(self,folders=None,recursive=True):
+        '''Rescan folders in a background thread
+
+        Parameters:
+            folders (list): folders to scan, all the configured ones by default
+            recursive (bool): scan also the subfolders
+        '''
+        folders = self.folders if folders is None else folders
+        watched = set(self.watcher.directories())
+        threading.Thread(target=self.__scan,args=(list(folders),recursive,watched),
+                         name="library-scan",daemon=True).start()
+
+    def addFolder(self,folder):
+        '''Add a folder to the library and scan it
+
+        Parameters:
+            folder (str): folder to add
+        '''
+        folder = os.path.abspath(folder)
+        if folder not in self.folders:
+            self.folders.append(folder)
+        self.rescan([folder])
+
+    def search(self,text="",order="name",descending=False,limit=1000):
+        '''Query the index
+
+        Parameters:
+            text (str): text contained in the file name, all files if empty
+            order (str): one among name, folder, size, mtime and duration
+            descending (bool): sort in descending order
+            limit (int): maximum number of rows
+        Returns:
+            list: rows of (path, name, folder, size, mtime_ns, duration)
+        '''
+        sql = "SELECT path,name,folder,size,mtime_ns,duration FROM media"
+        args = []
+        if text and self.fts and len(text) >= FTS_MIN_LENGTH:
+            sql += " WHERE rowid IN (SELECT rowid FROM media_names WHERE media_names MATCH ?)"
+            args.append('"' + text.replace('"','""') + '"') # one phrase: the text as a substring
+        elif text:
+            sql += " WHERE name LIKE ? ESCAPE '\\'"
+            args.append("%" + text.replace("\\","\\\\").replace("%","\\%").replace("_","\\_") + "%")
+        sql += f" ORDER BY {SORT_COLUMNS[order]} {'DESC' if descending else 'ASC'} LIMIT ?"
+        args.append(limit)
+        return self.con.execute(sql,args).fetchall()
+
+    def count(self):
+        '''Number of indexed files'''
+        return self.con.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+    def setMediaInfo(self,path,info):
+        '''Store duration and tracks of a file
+
+        Parameters:
+            path (str): media file
+            info (dict): result of src.probe.media_info, or {"error":...}
+        '''
+        duration = info.get("duration",-1) if "error" not in info else -1
+        self.con.execute("UPDATE media SET duration=?, tracks=? WHERE path=?",
+                         (duration,json.dumps(info.get("tracks")),path))
+        self.con.commit()
+
+    def __scan(self,folders,recursive,watched):
+        with self.scanning:
+            con = connect(self.database)
+            found = {}
+            dirs = []
+            for folder in folders:
+                self.__list(folder,recursive,watched,found,dirs)
+            known = {}
+            gone = []
+            for folder in folders:
+                if recursive:
+                    trees = [folder]
+                    rows = []
+                else:
+                    # the files of the folders indexed before and now missing are not below any listed folder
+                    trees = [d for d in watched | {folder} if d not in gone and not os.path.isdir(d)
+                             and (d == folder or d.startswith(folder + os.sep))]
+                    gone += trees
+                    rows = list(con.execute("SELECT path,size,mtime_ns FROM media WHERE folder = ?",(folder,)))
+                for tree in trees:
+                    rows += con.execute("SELECT path,size,mtime_ns FROM media WHERE path >= ? AND path < ?",
+                                        (tree + os.sep,tree + chr(ord(os.sep)+1)))
+                for path,size,mtime_ns in rows:
+                    known[path] = (size,mtime_ns)
+            changed = [(path,st) for path,st in found.items() if known.get(path) != st]
+            removed = [path for path in known if path not in found]
+
+            with ThreadPoolExecutor(max_workers=min(8,(os.cpu_count() or 1)*2)) as pool:
+                prints = pool.map(lambda item: self.__fingerprint(item[0],item[1][0]),changed,chunksize=64)
+                now = time.time()
+                con.executemany("INSERT OR REPLACE INTO media(path,folder,name,size,mtime_ns,fingerprint,duration,tracks,scanned) "
+                                "VALUES (?,?,?,?,?,?,NULL,NULL,?)",
+                                ((path,os.path.dirname(path),os.path.basename(path),size,mtime_ns,fp,now)
+                                 for (path,(size,mtime_ns)),fp in zip(changed,prints)))
+            con.executemany("DELETE FROM media WHERE path = ?",((path,) for path in removed))
+            con.commit()
+            con.close()
+            self.scanFinished.emit(len(changed),len(removed),len(found)-len(changed),dirs,gone)
+
+    def __list(self,folder,recursive,watched,found,dirs):
+        '''List the media files of a folder; when not recursive, only the subfolders not watched yet are listed'''
+        stack = [(folder,recursive)]
+        while stack:
+            d, deep = stack.pop()
+            try:
+                entries = list(os.scandir(d))
+            except OSError:
+                continue
+            dirs.append(d)
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if deep or entry.path not in watched:
+                            stack.append((entry.path,True))
+                    elif os.path.splitext(entry.name)[1].lower() in MEDIA_EXTENSIONS:
+                        st = entry.stat()
+                        found[entry.path] = (st.st_size,st.st_mtime_ns)
+                except OSError:
+                    pass
+
+    def __fingerprint(self,path,size):
+        try:
+            return fingerprint(path,size)
+        except OSError:
+            return None
+
+    def __scan_finished(self,changed,removed,unchanged,dirs,gone):
+        '''Watch the scanned folders, stop watching the vanished ones and probe the files without duration'''
+        print(f"Library scan: {changed} added or changed, {removed} removed, {unchanged} unchanged")
+        watched = set(self.watcher.directories())
+        vanished = [d for d in watched if any(d == g or d.startswith(g + os.sep) for g in gone)]
+        if vanished:
+            self.watcher.removePaths(vanished)
+            watched.difference_update(vanished)
+        room = LIBRARY_WATCH_LIMIT - len(watched)
+        new_dirs = [d for d in dirs if d not in watched]
+        if room > 0 and new_dirs:
+            self.watcher.addPaths(new_dirs[:room])
+        self.__probe_missing()
+
+    def __probe_missing(self):
+        if self.prober is None:
+            from src.probe import MediaProbe
+            self.prober = MediaProbe()
+            self.prober.probed.connect(self.__probed)
+        if self.prober.isIdle():
+            for (path,) in self.con.execute("SELECT path FROM media WHERE duration IS NULL LIMIT 100"):
+                self.prober.probe(path)
+
+    def __probed(self,path,info):
+        self.setMediaInfo(path,info)
+        if self.prober.isIdle():
+            QTimer.singleShot(0,self.__probe_missing)
+
+    def __directory_changed(self,d):
+        self.changed_dirs.add(d)
+        self.debounce.start(1000)
+
+    def __rescan_changed(self):
+        dirs, self.changed_dirs = list(self.changed_dirs), set()
+        self.rescan(dirs,recursive=False)
+
+class LibraryDialog(QDialog):
+    '''Window for searching the media library and opening its files
+
+    Attributes:
+        library (MediaLibrary): the media library
+        language (Language): words translated in the selected language
+    '''
+    fileSelected = Signal(str)
+
+    COLUMNS = ("name","duration","size","folder")
+
+    def __init__(self,library,language):
+        '''Class initialization
+
+        Parameters:
+            library (MediaLibrary): the media library
+            language (Language): words translated in the selected language
+        '''
+        super().__init__()
+        self.library = library
+        self.language = language
+        self.order = "name"
+        self.descending = False
+        self.language.bind(self,"windowTitle","library")
+        self.resize(720,480)
+
+        self.search = QLineEdit()
+        self.language.bind(self.search,"placeholderText","search")
+        self.search.textChanged.connect(lambda: self.timer.start(150))
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.refresh)
+
+        self.add = QPushButton()
+        self.language.bind(self.add,"text","addfolder")
+        self.add.setCursor(QCursor(Qt.PointingHandCursor))
+        self.add.clicked.connect(self.__add_folder)
+        self.rescan = QPushButton()
+        self.language.bind(self.rescan,"text","rescan")
+        self.rescan.setCursor(QCursor(Qt.PointingHandCursor))
+        self.rescan.clicked.connect(lambda: self.library.rescan())
+
+        self.table = QTreeWidget()
+        self.table.setRootIsDecorated(False)
+        self.table.setUniformRowHeights(True)
+        self.table.setColumnCount(len(self.COLUMNS))
+        self.header = self.table.headerItem() # kept, so that its binding lives as long as the table
+        for column,key in enumerate(self.COLUMNS):
+            self.language.bind(self.header,"text",key,column)
+        self.table.header().setSectionsClickable(True)
+        self.table.header().sectionClicked.connect(self.__sort)
+        self.table.itemDoubleClicked.connect(self.__open)
+
+        top = QHBoxLayout()
+        top.addWidget(self.search)
+        top.addWidget(self.add)
+        top.addWidget(self.rescan)
+        layout = QVBoxLayout()
+        layout.addLayout(top)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+        self.library.scanFinished.connect(self.refresh)
+        self.refresh()
+
+    def refresh(self):
+        '''Fill the table with the result of the current search'''
+        self.table.clear()
+        items = []
+        for path,name,folder,size,mtime_ns,duration in self.library.search(self.search.text(),self.order,self.descending):
+            duration = "--:--:--" if duration is None or duration < 0 else time.strftime("%H:%M:%S",time.gmtime(duration//1000))
+            item = QTreeWidgetItem([name,duration,f"{size/2**20:.1f} MB",folder])
+            item.setData(0,Qt.UserRole,path)
+            items.append(item)
+        self.table.addTopLevelItems(items)
+
+    def __sort(self,column):
+        order = self.COLUMNS[column]
+        self.descending = not self.descending if order == self.order else False
+        self.order = order
+        self.refresh()
+
+    def __open(self,item):
+        self.fileSelected.emit(item.data(0,Qt.UserRole))
+        self.close()
+
+    def __add_folder(self):
+        folder = QFileDialog.getExistingDirectory(self,self.language.fromKey("addfolder"),os.path.expanduser("~"))
+        if folder:
+            self.library.addFolder(folder)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we define the asynchronous pipeline for loading a new source:
+    SourceLoader -> validate a file off the GUI thread and hand its url to the player
+
+'''
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QUrl, Signal
+from src.fingerprint import fingerprint
+import os
+import stat
+
+class _ProbeSignals(QObject):
+    '''Signals emitted by a probe task from the thread pool'''
+    started = Signal(int)
+    finished = Signal(int,str,str,str,int) # ticket, path, error, fingerprint, resume position
+
+class _ProbeTask(QRunnable):
+    '''Task checking that a file exists, is regular, not empty and readable
+
+    When a resume store is given, the fingerprint of the file is computed
+    and its resume position looked up as well.
+
+    Attributes:
+        ticket (int): number of the load request the task belongs to
+        path (str): file to check
+        signals (_ProbeSignals): signals used to notify the result
+        resume (ResumeStore): store of the resume positions, or None
+    '''
+    def __init__(self,ticket,path,signals,resume=None):
+        super().__init__()
+        self.ticket = ticket
+        self.path = path
+        self.signals = signals
+        self.resume = resume
+
+    def run(self):
+        '''Probe the file, emitting an empty error string when it is valid'''
+        self.signals.started.emit(self.ticket)
+        error = ''
+        fp = ''
+        position = 0
+        try:
+            st = os.stat(self.path)
+            if not stat.S_ISREG(st.st_mode):
+                error = f"{self.path} is not a regular file"
+            elif st.st_size == 0:
+                error = f"{self.path} is empty"
+            else:
+                with open(self.path,'rb') as f:
+                    f.read(1)
+                if self.resume is not None:
+                    fp = fingerprint(self.path,st.st_size)
+                    position = self.resume.lookup(fp)
+        except OSError as e:
+            error = str(e)
+        self.signals.finished.emit(self.ticket,self.path,error,fp,position)
+
+class SourceLoader(QObject):
+    '''Load a new source without blocking the GUI thread
+
+    Each call to load() gets a new ticket: results of older requests are
+    discarded, so only the latest selected file reaches the player.
+
+    Attributes:
+        state (str): current load state, one among Idle, Queued, Probing, Loaded, Failed
+        path (str): file of the latest load request
+        resume (ResumeStore): store of the resume positions, or None
+        fingerprint (str): fingerprint of the file, computed when resume is set
+        resume_position (int): position where the file was left, in milliseconds
+    '''
+    Idle = "idle"
+    Queued = "queued"
+    Probing = "probing"
+    Loaded = "loaded"
+    Failed = "failed"
+
+    stateChanged = Signal(str,str) # state, path
+    sourceReady = Signal(QUrl)
+    failed = Signal(str,str) # path, reason
+
+    def __init__(self,parent=None):
+        '''Class initialization
+
+        Parameters:
+            parent (QObject): parent object
+        '''
+        super().__init__(parent)
+        self.ticket = 0
+        self.state = SourceLoader.Idle
+        self.path = None
+        self.resume = None
+        self.fingerprint = ''
+        self.resume_position = 0
+        self.signals = _ProbeSignals()
+        self.signals.started.connect(self.__probing)
+        self.signals.finished.connect(self.__probed)
+
+    def load(self,path):
+        '''Queue the file path for probing
+
+        Parameters:
+            path (str): file to load
+        '''
+        self.ticket += 1
+        self.path = path
+        self.fingerprint = ''
+        self.resume_position = 0
+        self.__set_state(SourceLoader.Queued)
+        QThreadPool.globalInstance().start(_ProbeTask(self.ticket,path,self.signals,self.resume))
+
+    def setLoaded(self):
+        '''Notify that the player has loaded the media'''
+        if self.state == SourceLoader.Probing:
+            self.__set_state(SourceLoader.Loaded)
+
+    def setFailed(self,reason):
+        '''Notify that the player could not load the media
+
+        Parameters:
+            reason (str): description of the failure
+        '''
+        if self.state != SourceLoader.Idle:
+            self.__set_state(SourceLoader.Failed)
+            self.failed.emit(self.path,reason)
+
+    def __set_state(self,state):
+        self.state = state
+        self.stateChanged.emit(state,self.path)
+
+    def __probing(self,ticket):
+        if ticket == self.ticket:
+            self.__set_state(SourceLoader.Probing)
+
+    def __probed(self,ticket,path,error,fp,position):
+        if ticket != self.ticket:
+            return # a newer file has been requested in the meanwhile
+        self.fingerprint = fp
+        self.resume_position = position
+        if error:
+            self.setFailed(error)
+        else:
+            self.sourceReady.emit(QUrl.fromLocalFile(path))
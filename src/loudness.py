@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we define the loudness analysis of the played files:
+    k_weighting -> power response of the K-weighting filter of ITU-R BS.1770
+    LoudnessAccumulator -> gated integrated loudness and sample peak of the decoded samples
+    LoudnessCache -> loudness decoded once per file fingerprint and kept on disk
+    track_gain -> gain bringing a file to LOUDNESS_TARGET without clipping
+
+'''
+
+from PySide6.QtCore import QObject, Signal
+from src.mvars import LOUDNESS_RATE, LOUDNESS_TARGET, LOUDNESS_MAX_GAIN
+from src.settings import write_atomic
+import json
+import numpy as np
+import os
+
+# K-weighting biquads of BS.1770 at 48 kHz: high shelf, then high pass
+SHELF = ((1.53512485958697,-2.69169618940638,1.19839281085285),(1.0,-1.69065929318241,0.73248077421585))
+HIGH_PASS = ((1.0,-2.0,1.0),(1.0,-1.99004745483398,0.99007225036621))
+ABSOLUTE_GATE = -70.0 # LUFS
+RELATIVE_GATE = -10.0 # LU below the loudness of the blocks over the absolute gate
+HISTOGRAM_STEP = 0.05 # LU of each bin of the block loudness histogram
+HISTOGRAM_TOP = 10.0 # LUFS of the last bin
+
+def k_weighting(n,rate):
+    '''Power response of the K-weighting filter at the frequencies of a rfft
+
+    Parameters:
+        n (int): length of the transformed blocks
+        rate (int): sample rate in Hz
+    Returns:
+        numpy.ndarray: n//2 + 1 power gains
+    '''
+    freqs = np.fft.rfftfreq(n,1.0/rate)
+    z = np.exp(-2j*np.pi*np.minimum(freqs,23999.0)/48000.0) # the filters are defined up to 24 kHz
+    power = np.ones(len(freqs))
+    for b,a in (SHELF,HIGH_PASS):
+        power *= np.abs(np.polyval(b[::-1],z)/np.polyval(a[::-1],z))**2
+    return power
+
+class LoudnessAccumulator:
+    '''Gated integrated loudness (BS.1770) and sample peak of the decoded samples
+
+    The samples are cut in 100 ms steps, K-weighted in the frequency domain
+    many steps at a time; each 400 ms block (four steps) is counted in a
+    histogram of its loudness, so the memory does not depend on the length
+    of the file. The frames which do not fill a step are kept for the next
+    buffer.
+    '''
+    def __init__(self):
+        self.rest = None
+        self.rate = 0
+        self.weights = None
+        self.last = np.zeros(0) # energy of the last three steps, start of the next blocks
+        self.bins = int((HISTOGRAM_TOP - ABSOLUTE_GATE)/HISTOGRAM_STEP) + 1
+        self.counts = np.zeros(self.bins,dtype=np.int64)
+        self.energies = np.zeros(self.bins)
+        self.peak = 0.0
+
+    def feed(self,samples,rate):
+        '''Add the blocks of a decoded buffer
+
+        Parameters:
+            samples (numpy.ndarray): (frames, channels) float32 samples
+            rate (int): sample rate in Hz
+        '''
+        if samples.size:
+            self.peak = max(self.peak,float(np.abs(samples).max()))
+        if rate != self.rate or self.rest is None or self.rest.shape[1] != samples.shape[1]:
+            self.rate = rate
+            self.step = max(1,rate//10)
+            self.weights = k_weighting(self.step,rate)
+            self.weights[1:(self.step + 1)//2] *= 2.0 # both halves of the spectrum, by Parseval
+            self.weights /= float(self.step)**2
+            self.rest = np.zeros((0,samples.shape[1]),dtype=np.float32)
+        frames = np.concatenate((self.rest,samples))
+        n = len(frames)//self.step*self.step
+        self.rest = frames[n:]
+        if not n:
+            return
+        steps = frames[:n].reshape(-1,self.step,frames.shape[1])
+        spectra = np.fft.rfft(steps,axis=1)
+        # mean square of the K-weighted signal of each step, summed over the channels (weight 1 for front channels)
+        energy = np.einsum('snc,n->s',spectra.real**2 + spectra.imag**2,self.weights)
+        energy = np.concatenate((self.last,energy))
+        if len(energy) >= 4:
+            blocks = np.convolve(energy,np.full(4,0.25),mode='valid')
+            self.__count(blocks)
+        self.last = energy[-3:]
+
+    def __count(self,blocks):
+        loudness = -0.691 + 10.0*np.log10(np.maximum(blocks,1e-20))
+        gated = loudness > ABSOLUTE_GATE
+        index = np.minimum(((loudness[gated] - ABSOLUTE_GATE)/HISTOGRAM_STEP).astype(np.int64),self.bins - 1)
+        self.counts += np.bincount(index,minlength=self.bins)
+        self.energies += np.bincount(index,weights=blocks[gated],minlength=self.bins)
+
+    def result(self):
+        '''Integrated loudness and sample peak of the whole file
+
+        Returns:
+            dict: loudness in LUFS (None for silence) and linear sample peak
+        '''
+        if self.rest is None:
+            raise ValueError("no audio samples")
+        total = self.counts.sum()
+        if not total:
+            return {"loudness":None,"peak":self.peak}
+        relative = -0.691 + 10.0*np.log10(self.energies.sum()/total) + RELATIVE_GATE
+        first = int(np.ceil((relative - ABSOLUTE_GATE)/HISTOGRAM_STEP)) if relative > ABSOLUTE_GATE else 0
+        counts, energies = self.counts[first:].sum(), self.energies[first:].sum()
+        if not counts:
+            return {"loudness":None,"peak":self.peak}
+        return {"loudness":round(-0.691 + 10.0*np.log10(energies/counts),2),"peak":self.peak}
+
+def track_gain(info):
+    '''Linear gain bringing a file to LOUDNESS_TARGET, limited by LOUDNESS_MAX_GAIN and by its peak
+
+    Parameters:
+        info (dict): loudness and peak of the file, or None when not analysed
+    Returns:
+        float: factor applied to the volume
+    '''
+    if not info or info.get("loudness") is None:
+        return 1.0
+    gain = min(LOUDNESS_TARGET - info["loudness"],LOUDNESS_MAX_GAIN)
+    if info.get("peak"):
+        gain = min(gain,-20.0*np.log10(info["peak"])) # no clipping
+    return float(10.0**(max(gain,-LOUDNESS_MAX_GAIN)/20.0))
+
+class LoudnessCache(QObject):
+    '''Loudness of the files, decoded once per file fingerprint and kept on disk
+
+    The decoding runs in a DecodeThread at LOUDNESS_RATE Hz stereo; the
+    result is saved as a small json file named after the fingerprint.
+    The decoder, and with it QtMultimedia, is imported at the first
+    decoding, so the analysis alone needs only numpy.
+
+    Attributes:
+        folder (str): folder of the results on disk
+        memory (dict): loudness of the files already loaded, by fingerprint
+    '''
+    ready = Signal(str,dict) # fingerprint, loudness and peak
+
+    def __init__(self,folder):
+        '''Class initialization
+
+        Parameters:
+            folder (str): folder of the results on disk
+        '''
+        super().__init__()
+        self.folder = folder
+        self.memory = {}
+        self.decoder = None
+
+    def request(self,path,fp):
+        '''Emit ready with the loudness of a file, decoding it in the background the first time
+
+        Parameters:
+            path (str): audio or video file
+            fp (str): fingerprint of the file
+        '''
+        if fp in self.memory:
+            self.ready.emit(fp,self.memory[fp])
+            return
+        try:
+            with open(os.path.join(self.folder,f"{fp}.json"),'r') as f:
+                self.memory[fp] = json.load(f)
+            self.ready.emit(fp,self.memory[fp])
+            return
+        except (OSError,ValueError):
+            pass
+        if self.decoder is None:
+            from src.decoder import DecodeThread, audio_format
+            self.decoder = DecodeThread(audio_format(2,LOUDNESS_RATE),LoudnessAccumulator,self)
+            self.decoder.finished.connect(self.__decoded)
+            self.decoder.failed.connect(self.__failed)
+        self.decoder.decode(path,fp)
+
+    def stop(self):
+        '''Stop the decoding thread'''
+        if self.decoder is not None:
+            self.decoder.stop()
+
+    def __decoded(self,path,fp,info):
+        self.memory[fp] = info
+        try:
+            os.makedirs(self.folder,exist_ok=True)
+            write_atomic(os.path.join(self.folder,f"{fp}.json"),json.dumps(info))
+        except OSError as e:
+            print(f"Loudness of {path} not cached: {e}")
+        self.ready.emit(fp,info)
+
+    def __failed(self,path,fp,reason):
+        print(f"Loudness of {path} not available: {reason}")
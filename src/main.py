@@ -15,31 +15,99 @@ Creating the main window of the application
 
 '''
 
-from PySide6.QtWidgets import *
-from src.mainWindow import MainWindow
-import json
+from src.tracer import trace
 from src.language import Language
 from src.os_folder_system import Path
 from src.mvars import *
 from src.utils import get_past_settings
 from src.setup import *
+from concurrent.futures import ThreadPoolExecutor
+import os
 import sys
 
+def load_settings():
+    '''Setup the application folders, read the previous configuration and the vocabulary
+
+    Returns:
+        tuple: Path, configuration dictionary and Language
+    '''
+    path = Path(INSTALLATION_TYPE,APP_OWNER,APP_NAME)
+    trace.mark("folders checked")
+    config = get_past_settings(path) # get previous configurations
+    trace.mark("configuration read")
+    language = Language(config,path)
+    trace.mark("vocabulary read")
+    return path,config,language
+
+def preload_player():
+    '''Import the multimedia stack while the window shell is being shown'''
+    import src.videoplayer
+    trace.mark("multimedia stack imported")
+
 def main(arg):
     '''Define the main window of the application
+
+    If another instance is running, the files are forwarded to it and the
+    function returns. Otherwise the configuration and the vocabulary are
+    read in a background thread while QApplication is constructed; the
+    window shell is shown before the video player, which is built at the
+    first event loop iteration.
     
     Args:
-        arg (str): file video or music to open
+        arg (ParseArgs): parsed command line, with the files, folders or playlists to open
     '''
-
-    path = Path(INSTALLATION_TYPE,APP_OWNER,APP_NAME)
-    config = get_past_settings(path) # get previous configurations
-    language = Language(config,path)
+    trace.enabled = arg.parser.trace_startup
+    trace.mark("arguments parsed")
+    single_instance = not (arg.parser.new_instance or arg.parser.benchmark)
+    if single_instance:
+        from src.instance import forward
+        files = arg.parser.files
+        command = "show" if not files else "enqueue" if arg.parser.enqueue else "play"
+        if forward(command,files,arg.parser.recursive):
+            trace.mark("files forwarded to the running instance")
+            trace.report()
+            return
+    executor = ThreadPoolExecutor(max_workers=1,thread_name_prefix="startup")
+    settings = executor.submit(load_settings)
+    if arg.parser.benchmark:
+        from src.benchmark import run_benchmark
+        sys.exit(run_benchmark(arg,*settings.result()))
     print(arg.list)
+
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTimer
     app = QApplication(arg.list) 
+    trace.mark("QApplication constructed")
+    if arg.parser.profile:
+        from src.profiler import profiler
+        profiler.enabled = True
+        profiler.install(arg.parser.profile_stats)
+        trace.mark("profiler installed")
+    path,config,language = settings.result()
+    player_import = executor.submit(preload_player)
+    executor.shutdown(wait=False)
 
-    window = MainWindow(arg.parser.filename,config,language,path)
+    from src.mainWindow import MainWindow
+    from src.inputs import is_playlist
+    files = arg.parser.files
+    first = files[0] if files and os.path.isfile(files[0]) and not is_playlist(files[0]) else None
+    window = MainWindow(first,config,language,path)
     window.resize(WIN_SIZE[0],WIN_SIZE[1])
     window.show()
-    app.exec()
+    app.processEvents()
+    trace.mark("window shown")
+    if single_instance:
+        from src.instance import InstanceServer
+        server = InstanceServer(window)
+        server.received.connect(window.remote_command)
+    inputs = files[1:] if first else files
+    if inputs: # folders, playlists and the other files are resolved in the background
+        window.open_inputs(inputs,arg.parser.recursive,enqueue=first is not None)
 
+    def build_player():
+        player_import.result()
+        window.build_player()
+        trace.mark("video player built")
+        trace.report()
+    QTimer.singleShot(0,build_player)
+    app.exec()
@@ -20,17 +20,19 @@ from PySide6.QtCore import *
 from PySide6 import QtGui
 import sys
 import os
-import json
 import datetime
-from src.videoplayer import VideoPlayer
 from src.header import Header
-from src.language import SelectLanguage
+from src.settings import SettingsStore
+from src.assets import AssetCache
+from src.profiler import profiler
 from src.mvars import *
 
-#fmt = 'svg' if sys.platform=="linux" or sys.platform=="linux2" else "png"
-fmt = "png"
 keyListConfig = ["os","open_date","close_date","volume","folder","num_videos_opened"]
 
+def file_filter():
+    '''Filter of the dialog windows for opening videos'''
+    return "Videos (" + " ".join(f"*.{ext}" for ext in VIDEO_EXTENSIONS) + ");; Any files (*)"
+
 class MainWindow(QMainWindow):
     '''Main window of of the video app
     
@@ -56,13 +58,15 @@ class MainWindow(QMainWindow):
         self.arg = arg
         self.lang = language
         self.path = path
+        self.assets = AssetCache(self.path.expand('r_files','data','media'))
         self.old_config = config
         self.new_config()
 
         self.header = Header(self.arg,self.lang)
-        self.video_widget = VideoPlayer(self.arg,self.new_config,self.lang,self.path)
-        self.video_widget.screen_regulator.clicked.connect(self.__toogleFullScreen)
-        self.video_widget.exit_button.clicked.connect(self.close)
+        self.video_widget = None # built by self.build_player, after the window is shown
+        self.library = None # built by self.media_library, at the first use
+        self.feeders = [] # InputFeeder resolving the folders and playlists to open
+        self.player_placeholder = QWidget()
 
         self.layout.addWidget(self.header)
         self._createActions()
@@ -72,7 +76,7 @@ class MainWindow(QMainWindow):
         font.setPointSize(FONT_SIZE)
         self.setFont(font)
 
-        self.layout.addWidget(self.video_widget)
+        self.layout.addWidget(self.player_placeholder)
         self.setWindowIcon(QtGui.QIcon(self.path.expand("logo",'data','logo','catplayer_128x128.ico')))
 
         # Set margins around the app to zero
@@ -84,38 +88,109 @@ class MainWindow(QMainWindow):
         self.mw.setLayout(self.layout)
         self.setCentralWidget(self.mw)
 
+    def build_player(self):
+        '''Build the video player in place of its placeholder, if not built yet
+
+        The multimedia stack is imported here, so that the window shell
+        can be shown before paying its cost.
+
+        Returns:
+            VideoPlayer: the video player widget
+        '''
+        if self.video_widget is None:
+            from src.videoplayer import VideoPlayer
+            self.video_widget = VideoPlayer(self.arg,self.new_config,self.lang,self.path,self.assets)
+            self.video_widget.screen_regulator.clicked.connect(self.__toogleFullScreen)
+            self.video_widget.exit_button.clicked.connect(self.close)
+            self.video_widget.mediaChanged.connect(self.__media_changed)
+            from src.playlist import PlaylistDock
+            self.playlist_dock = PlaylistDock(self.video_widget.engine.playlist,self.lang,self)
+            self.playlist_dock.activated.connect(self.video_widget.playRow)
+            self.addDockWidget(Qt.RightDockWidgetArea,self.playlist_dock)
+            self.playlist_dock.hide()
+            playlistAction = self.playlist_dock.toggleViewAction()
+            playlistAction.setShortcuts(QKeySequence(Qt.CTRL | Qt.Key_P))
+            self.fileMenu.insertAction(self.healthAction,playlistAction)
+            self.layout.replaceWidget(self.player_placeholder,self.video_widget)
+            self.player_placeholder.deleteLater()
+            self.player_placeholder = None
+            if self.new_config.get('library_folders'):
+                self.media_library().rescan()
+        return self.video_widget
+
+    def media_library(self):
+        '''Create the media library at the first use
+
+        Returns:
+            MediaLibrary: index of the media files of the configured folders
+        '''
+        if self.library is None:
+            from src.library import MediaLibrary
+            self.library = MediaLibrary(self.path.cache_dir('library.sqlite'),
+                                        self.new_config.get('library_folders') or [])
+        return self.library
+
+    def __media_changed(self,arg):
+        '''Update the header when the queue moves to the next file'''
+        self.arg = arg
+        self.header.setHeaderTitle(self.arg)
+
     def __toogleFullScreen(self):
         '''Function for expand or reduce app view'''
         if self.isFullScreen():
             self.showNormal()
-            self.video_widget.screen_regulator.setIcon(QtGui.QIcon(self.path.expand("r_files",'data','media',f'full_screen.{fmt}')))
+            self.assets.apply(self.video_widget.screen_regulator,'full_screen')
+            self.lang.bind(self.video_widget.screen_regulator,"toolTip","expand")
             self.menuBar.show()
             self.header.show()
         else:
             self.showFullScreen()
-            self.video_widget.screen_regulator.setIcon(QtGui.QIcon(self.path.expand("r_files",'data','media',f'normal_screen.{fmt}')))
-            self.video_widget.screen_regulator.setToolTip(self.lang.fromKey("reduce"))
+            self.assets.apply(self.video_widget.screen_regulator,'normal_screen')
+            self.lang.bind(self.video_widget.screen_regulator,"toolTip","reduce")
             self.menuBar.hide()
             self.header.hide()
 
     def _createActions(self):
         '''Create the actions for the menu bar'''
-        self.openAction = QAction(self.lang.fromKey('open'), self)
+        self.openAction = QAction(self)
+        self.lang.bind(self.openAction,"text","open")
         self.openAction.setShortcuts(QKeySequence.Open)
-        self.openAction.setStatusTip(self.lang.fromKey("opennewvideo"))
+        self.lang.bind(self.openAction,"statusTip","opennewvideo")
 
-        self.langAction = QAction(self.lang.fromKey("language"), self)
+        self.enqueueAction = QAction(self)
+        self.lang.bind(self.enqueueAction,"text","enqueue")
+        self.enqueueAction.setShortcuts(QKeySequence(Qt.CTRL | Qt.Key_E))
+        self.lang.bind(self.enqueueAction,"statusTip","enqueuenewvideo")
+
+        self.libraryAction = QAction(self)
+        self.lang.bind(self.libraryAction,"text","library")
+        self.libraryAction.setShortcuts(QKeySequence(Qt.CTRL | Qt.Key_B))
+        self.lang.bind(self.libraryAction,"statusTip","openlibrary")
+
+        self.healthAction = QAction(self)
+        self.lang.bind(self.healthAction,"text","health")
+        self.healthAction.setShortcuts(QKeySequence(Qt.CTRL | Qt.Key_I))
+        self.lang.bind(self.healthAction,"statusTip","showhealth")
+
+        self.exportHealthAction = QAction(self)
+        self.lang.bind(self.exportHealthAction,"text","exporthealth")
+        self.lang.bind(self.exportHealthAction,"statusTip","exporthealthtip")
+
+        self.langAction = QAction(self)
+        self.lang.bind(self.langAction,"text","language")
         self.langAction.setShortcuts(QKeySequence(Qt.CTRL | Qt.Key_L))
-        self.langAction.setStatusTip(self.lang.fromKey("selectlanguage"))
+        self.lang.bind(self.langAction,"statusTip","selectlanguage")
 
-        self.aboutAction = QAction(self.lang.fromKey("about"), self)
+        self.aboutAction = QAction(self)
+        self.lang.bind(self.aboutAction,"text","about")
         self.aboutAction.setShortcuts(QKeySequence(Qt.CTRL | Qt.Key_A))
-        self.aboutAction.setStatusTip(self.lang.fromKey("about"))
+        self.lang.bind(self.aboutAction,"statusTip","about")
 
-        self.exitAction = QAction(self.lang.fromKey("exit"), self)
+        self.exitAction = QAction(self)
+        self.lang.bind(self.exitAction,"text","exit")
         #self.exitAction.setShortcuts(QKeySequence(Qt.CTRL | Qt.Key_Q))
         self.exitAction.setShortcuts(QKeySequence.Cancel)
-        self.exitAction.setStatusTip(self.lang.fromKey("exit"))
+        self.lang.bind(self.exitAction,"statusTip","exit")
     
     def _createMenuBar(self):
         '''Create the menu bar buttons'''
@@ -124,6 +199,10 @@ class MainWindow(QMainWindow):
         self.menuBar.addMenu(self.fileMenu)
 
         self.fileMenu.addAction(self.openAction)
+        self.fileMenu.addAction(self.enqueueAction)
+        self.fileMenu.addAction(self.libraryAction)
+        self.fileMenu.addAction(self.healthAction)
+        self.fileMenu.addAction(self.exportHealthAction)
         self.fileMenu.addAction(self.langAction)
         self.fileMenu.addAction(self.aboutAction)
         self.fileMenu.addAction(self.exitAction)
@@ -131,7 +210,11 @@ class MainWindow(QMainWindow):
     def _conenctAction(self):
         '''Connect menu bar buttons to a specific action'''
         self.openAction.triggered.connect(self.dialog)
+        self.enqueueAction.triggered.connect(self.enqueue_dialog)
+        self.libraryAction.triggered.connect(self.library_dialog)
         self.exitAction.triggered.connect(self.close)
+        self.healthAction.triggered.connect(lambda: self.build_player().health_overlay.toggle())
+        self.exportHealthAction.triggered.connect(self.export_health)
         self.langAction.triggered.connect(self.language)
         self.aboutAction.triggered.connect(self.about)
 
@@ -142,23 +225,125 @@ class MainWindow(QMainWindow):
         filename = dialog.getOpenFileName(self,
                                           self.lang.fromKey("open_video"),
                                           open_folder,
-                                          "Videos (*.mp4 *.mkv *.avi *.ts *.MOV);; Any files (*)"
+                                          file_filter()
                                           )
         try:
             if filename[0] != '':
-                self.video_widget.stop()
-                self.arg = filename[0]
-                self.header.setHeaderTitle(self.arg)
-                self.video_widget.arg = self.arg
-                self.video_widget.mediaPlayer.MysetSource(self.arg)
+                self.open_file(filename[0])
                 self.new_config['folder'] = os.path.dirname(filename[0])
-                self.new_config['num_videos_opened'] += 1
             else:
                 raise Exception(self.lang.fromKey('nofileselected'))
         except:
             pass
+    def enqueue_dialog(self):
+        '''Create dialog window for selecting videos/music to append to the playing queue'''
+        dialog = QFileDialog(self)
+        open_folder = os.path.expanduser("~") if self.new_config['folder']==0 else self.new_config['folder']
+        filenames = dialog.getOpenFileNames(self,
+                                            self.lang.fromKey("enqueue"),
+                                            open_folder,
+                                            file_filter()
+                                            )
+        self.enqueue_files(filenames[0])
+        if filenames[0]:
+            self.new_config['folder'] = os.path.dirname(filenames[0][0])
+
+    def library_dialog(self):
+        '''Window for searching the media library and opening its files'''
+        from src.library import LibraryDialog
+        w = LibraryDialog(self.media_library(),self.lang)
+        w.fileSelected.connect(self.open_file)
+        w.exec()
+        self.new_config['library_folders'] = list(self.library.folders)
+
+    def open_file(self,filename):
+        '''Open a video/music file
+        
+        Parameters:
+            filename (str): file to open
+        '''
+        self.arg = filename
+        self.header.setHeaderTitle(self.arg)
+        self.build_player().open(self.arg)
+        self.new_config['num_videos_opened'] += 1
+
+    def enqueue_files(self,filenames):
+        '''Append video/music files to the playing queue
+
+        Parameters:
+            filenames (list): files to append
+        '''
+        if not filenames:
+            return
+        if not self.arg:
+            self.arg = filenames[0]
+            self.header.setHeaderTitle(self.arg)
+        self.build_player().enqueueMany(filenames)
+        self.new_config['num_videos_opened'] += len(filenames)
+
+    def open_inputs(self,items,recursive=False,enqueue=False):
+        '''Open files, folders and playlists, resolved in a background thread
+
+        The first file is played as soon as it is found, unless enqueue is
+        set; the others are appended to the queue in batches.
+
+        Parameters:
+            items (list): files, folders and M3U/M3U8/PLS playlists
+            recursive (bool): include the subfolders of the folders
+            enqueue (bool): append the first file to the queue as well
+        '''
+        from src.inputs import InputFeeder
+        if not enqueue: # the queue of the older inputs is replaced
+            for feeder in self.feeders:
+                feeder.stop()
+            self.feeders = []
+            if self.video_widget is not None:
+                self.video_widget.engine.clear()
+        feeder = InputFeeder(items,recursive,split_first=not enqueue,parent=self)
+        feeder.first.connect(self.open_file)
+        feeder.resolved.connect(self.enqueue_files)
+        feeder.finished.connect(lambda count,feeder=feeder: self.__inputs_finished(feeder,count))
+        self.feeders.append(feeder)
+        feeder.start()
+
+    def __inputs_finished(self,feeder,count):
+        '''Release a feeder which has resolved all its inputs'''
+        if feeder in self.feeders:
+            self.feeders.remove(feeder)
+        feeder.deleteLater()
+        if not count:
+            print(f"No media files found in {', '.join(feeder.items)}")
+
+    def remote_command(self,command,files,recursive=False):
+        '''Execute a command forwarded by another instance of the application
+
+        Parameters:
+            command (str): "play", "enqueue" or "show"
+            files (list): files, folders or playlists of the command
+            recursive (bool): include the subfolders of the folders
+        '''
+        if command in ("play","enqueue") and files:
+            self.open_inputs(files,recursive,enqueue=command == "enqueue")
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
+    def export_health(self):
+        '''Write the playback health measures in a json file chosen by the user'''
+        filename = QFileDialog.getSaveFileName(self,
+                                               self.lang.fromKey("exporthealth"),
+                                               os.path.join(os.path.expanduser("~"),"catplayer-health.json"),
+                                               "JSON (*.json)")[0]
+        if filename:
+            try:
+                self.build_player().health.export(filename)
+            except OSError as e:
+                print(f"Playback health not exported: {e}")
+
     def language(self):
         '''Select the language to use in the app from the configuration given'''
+        from src.selectLanguage import SelectLanguage
         w = SelectLanguage(self.lang,self.new_config)
         w.exec()
     
@@ -175,8 +360,8 @@ class MainWindow(QMainWindow):
         w.exec()
 
     def new_config_init(self):
-        '''Initialize the new configuration dictionary'''
-        self.new_config = {}
+        '''Initialize the new configuration dictionary, saved in the background when changed'''
+        self.new_config = SettingsStore(self.path.expand('rw_files','config','config.json'))
         for k in keyListConfig:
             self.new_config[k] = 0
 
@@ -197,9 +382,16 @@ class MainWindow(QMainWindow):
                 self.new_config['folder'] = 0
 
     def closeEvent(self,event):
-        '''Override the close event, saving the new configuration settings in a json file'''
+        '''Override the close event, writing the configuration settings still pending'''
+        if self.video_widget is not None:
+            self.video_widget.saveResume()
+            self.video_widget.waveforms.stop()
+            self.video_widget.loudness.stop()
         self.new_config['close_date'] = datetime.datetime.today().ctime()
-        with open(self.path.expand('rw_files','config','config.json'),'w', encoding ='utf8') as f:
-            json.dump(self.new_config,f, ensure_ascii = False)
+        profiler.report()
+        try:
+            self.new_config.close()
+        except OSError as e:
+            print(f"Configuration not saved: {e}")
 
 
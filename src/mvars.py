@@ -2,3 +2,47 @@ HEIGHT=34
 FONT_SIZE=11
 WIN_SIZE = (854,540) # width,height
 DIR='tmp'
+HIDDEN_REFRESH_RATE=4 # position updates per second when the window is hidden
+SEEK_STEP=5000 # ms moved by the arrow keys
+SEEK_LONG_STEP=30000 # ms moved by the arrow keys with shift
+SEEK_TOLERANCE=250 # ms of distance from the target at which a seek is considered done
+SEEK_TIMEOUT=1000 # ms after which a seek is considered done anyway
+THUMBNAIL_WIDTH=160 # px of the scrub preview thumbnails
+THUMBNAIL_STEP=2000 # ms between two cached thumbnails of the same file
+THUMBNAIL_MEMORY_ITEMS=256 # thumbnails kept in memory
+THUMBNAIL_IDENTITY_ITEMS=64 # files whose identity (path, size, modification time) is kept for the thumbnail keys
+THUMBNAIL_CACHE_SIZE=64*1024*1024 # bytes of thumbnails kept on disk
+VIDEO_EXTENSIONS=['mp4','mkv','avi','ts','MOV'] # extensions of the "Videos" filter when opening files
+PROBE_TIMEOUT=5000 # ms given to a file for loading when probed
+LIBRARY_WATCH_LIMIT=4096 # maximum number of library folders watched for changes
+AUDIO_EXTENSIONS=['mp3','wav','flac','ogg','m4a'] # music files indexed by the library with the videos
+RESUME_INTERVAL=5000 # ms of playback between two updates of the resume position
+RESUME_FLUSH_INTERVAL=2.0 # s between two batched writes of the resume positions
+RESUME_MARGIN=5000 # ms from the start or the end in which the resume position is dropped
+SETTINGS_DEBOUNCE=1.0 # s from the last change of the configuration before writing it
+INSTANCE_TIMEOUT=500 # ms given to each step of the handoff to the running instance
+HEALTH_WINDOW=1000 # latest samples kept by each playback health histogram
+HEALTH_LATE_FACTOR=1.5 # a frame is late when shown after this many times its expected duration
+HEALTH_DISCONTINUITY=1000 # ms of timestamp jump between two frames treated as a seek
+HEALTH_OVERLAY_INTERVAL=500 # ms between two updates of the playback health overlay
+READAHEAD_BUFFER=32*1024*1024 # bytes of the ring buffer of the read-ahead source
+READAHEAD_CHUNK=2*1024*1024 # bytes of each read of the read-ahead thread
+READAHEAD_BACK=4*1024*1024 # bytes already played kept by the read-ahead source for backward seeks
+WAVEFORM_RATE=8000 # Hz of the mono samples decoded for the waveform timeline
+WAVEFORM_BUCKET=80 # decoded frames reduced to one min/max/RMS peak (10 ms)
+WAVEFORM_RESOLUTIONS=(256,512,1024,2048,4096) # numbers of peaks cached for each file
+LOUDNESS_RATE=48000 # Hz of the stereo samples decoded for the loudness analysis
+LOUDNESS_TARGET=-18.0 # LUFS the played files are brought to by the loudness normalization
+LOUDNESS_MAX_GAIN=12.0 # dB of the largest boost or cut of the loudness normalization
+SEGMENT_CACHE_BYTES=128*1024*1024 # bytes of decoded frames kept for the A-B loop and the frame stepping
+SEGMENT_WINDOW=12 # frames kept around the frame on screen, outside the A-B loop, for stepping back
+SEGMENT_FRAME=40 # ms of a frame until the frame rate of the file is known
+PLAYBACK_RATES=(0.25,0.5,0.75,1.0,1.25,1.5,2.0,3.0,4.0) # rates given to the backend
+TRICK_RATES=(8.0,16.0,32.0,64.0) # rates scanned by timed seeks, the player being paused
+TRICK_INTERVAL=250 # ms of wall clock between two seeks of the trick play
+PROFILE_HEARTBEAT=50 # ms between two beats of the timer measuring the event loop lag with --profile
+PROFILE_TOP=30 # slots printed by the --profile report, by total time
+INPUT_BATCH=500 # files of the command line delivered to the queue at once
+INPUT_BATCH_INTERVAL=0.1 # s after which the files of the command line resolved so far are delivered
+PLAYLIST_FETCH=1000 # rows of the playlist added to its view at each scroll to the bottom
+PLAYLIST_UNDO=100 # moves and removals of the playlist which can be undone
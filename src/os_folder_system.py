@@ -82,6 +82,10 @@ class Path:
 
     def expand(self,thetype,*arg):
         return p(self.fs[self.installation_type][thetype],*arg)
+
+    def cache_dir(self,*arg):
+        '''Path of a cache folder inside the read-write config folder, not created here'''
+        return self.expand('rw_files','config','cache',*arg)
     
     def create_rw_dirs(self):
         if self.os == "linux":
@@ -120,14 +124,18 @@ class Path:
         else:
             raise Exception(f"Error in {__file__}: operating system not recognized.")
 
+    def default_config(self):
+        '''Configuration of the first start, also used when config.json is missing or corrupt'''
+        return {"os":self.os,
+                "open_date":datetime.datetime.today().ctime(),
+                "close_date":"",
+                "language":"en",
+                "num_videos_opened":0,
+                "volume":50,
+                "folder":os.path.abspath(".")}
+
     def setup_config_json(self):
-        config_json = {"os":self.os,
-                       "open_date":datetime.datetime.today().ctime(),
-                       "close_date":"",
-                       "language":"en",
-                       "num_videos_opened":0,
-                       "volume":50,
-                       "folder":os.path.abspath(".")}
+        config_json = self.default_config()
 
         config_file = os.path.join(self.config_folder,"config.json")
 
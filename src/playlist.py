@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we define the playing queue:
+    Entry -> file of the playlist, as folder index and name
+    Playlist -> compact ordered list of files, with shuffle and undo
+    PlaylistModel -> list model of a Playlist, fetching its rows lazily
+    PlaylistDock -> dock widget showing the playlist
+
+'''
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QObject, Qt, Signal
+from PySide6.QtGui import QFont, QKeySequence, QShortcut
+from PySide6.QtWidgets import QAbstractItemView, QDockWidget, QHBoxLayout, QListView, QPushButton, QVBoxLayout, QWidget
+from src.mvars import PLAYLIST_FETCH, PLAYLIST_UNDO
+from array import array
+from collections import deque
+import math
+import os
+import random
+
+class Entry:
+    '''File of the playlist, as index of its folder and name
+
+    Attributes:
+        folder (int): index of the folder in Playlist.folders
+        name (str): file name
+    '''
+    __slots__ = ('folder','name')
+
+    def __init__(self,folder,name):
+        self.folder = folder
+        self.name = name
+
+class Playlist(QObject):
+    '''Compact ordered list of files, with shuffle and undo
+
+    Each folder is stored once, the entries keep only its index and the
+    file name, and the play order is an array of entry indices, so that
+    moving or removing rows never copies the entries.
+
+    In shuffle mode the files are visited along the affine permutation
+    k -> (a*k + b) mod n, with a coprime with n: the next file is computed
+    in O(1) and no shuffled copy of the order is built.
+
+    Attributes:
+        folders (list): folders of the entries
+        entries (list): Entry objects, indexed by the order array
+        order (array): entry indices in play order
+        current (int): row of the playing file, -1 if none
+        resume_row (int): row where the playback continues after the playing file was removed, -1 if none
+        shuffle (bool): True if the files are visited in shuffled order
+    '''
+    rowsInserted = Signal(int,int) # first row, count
+    rowsRemoved = Signal(int,int) # first row, count
+    rowMoved = Signal(int,int) # old row, new row
+    reset = Signal()
+    currentChanged = Signal(int) # new current row
+    shuffleChanged = Signal(bool)
+
+    def __init__(self):
+        '''Class initialization, empty'''
+        super().__init__()
+        self.folders = []
+        self.folder_index = {}
+        self.entries = []
+        self.order = array('I')
+        self.current = -1
+        self.resume_row = -1
+        self.shuffle = False
+        self.undo_stack = deque(maxlen=PLAYLIST_UNDO)
+        self.n = 0
+        self.__permutation(0)
+
+    def __len__(self):
+        return len(self.order)
+
+    def path(self,row):
+        '''File at a row
+
+        Parameters:
+            row (int): row of the playlist
+        Returns:
+            str: path of the file
+        '''
+        entry = self.entries[self.order[row]]
+        return os.path.join(self.folders[entry.folder],entry.name)
+
+    def name(self,row):
+        '''File name at a row'''
+        return self.entries[self.order[row]].name
+
+    def entryId(self,row):
+        '''Identifier of the entry at a row, unchanged by reorders'''
+        return self.order[row]
+
+    def rowOf(self,entry_id):
+        '''Row of an entry identifier, -1 if removed'''
+        try:
+            return self.order.index(entry_id)
+        except ValueError:
+            return -1
+
+    def __entry(self,path):
+        folder,name = os.path.split(path)
+        index = self.folder_index.get(folder)
+        if index is None:
+            index = self.folder_index[folder] = len(self.folders)
+            self.folders.append(folder)
+        self.entries.append(Entry(index,name))
+        return len(self.entries) - 1
+
+    def extend(self,paths):
+        '''Append files at the end of the playlist
+
+        Parameters:
+            paths (list): files to append
+        '''
+        first = len(self.order)
+        self.order.extend(self.__entry(p) for p in paths)
+        if len(self.order) > first:
+            self.__permutation(len(self.order))
+            self.rowsInserted.emit(first,len(self.order) - first)
+
+    def append(self,path):
+        '''Append a file at the end of the playlist'''
+        self.extend([path])
+
+    def insert(self,row,path):
+        '''Insert a file at a row
+
+        Parameters:
+            row (int): row of the new file
+            path (str): file to insert
+        Returns:
+            int: row of the new file
+        '''
+        row = max(0,min(row,len(self.order)))
+        self.order.insert(row,self.__entry(path))
+        if self.current >= row:
+            self.current += 1
+        if self.resume_row > row:
+            self.resume_row += 1
+        self.__permutation(len(self.order))
+        self.rowsInserted.emit(row,1)
+        return row
+
+    def clear(self):
+        '''Remove all the files, forgetting the undo history'''
+        self.folders, self.folder_index, self.entries = [], {}, []
+        self.order = array('I')
+        self.current = -1
+        self.resume_row = -1
+        self.undo_stack.clear()
+        self.__permutation(0)
+        self.reset.emit()
+        self.currentChanged.emit(self.current)
+
+    def setCurrent(self,row,jump=True):
+        '''Set the row of the playing file
+
+        Parameters:
+            row (int): row of the playing file, -1 for none
+            jump (bool): chosen by the user, the shuffled cycle restarts from it;
+                False when the playback moves to nextRow()
+        '''
+        self.current = row if 0 <= row < len(self.order) else -1
+        self.resume_row = -1
+        if jump and self.n:
+            self.shuffle_start = self.__step_of(self.current) if self.current >= 0 else 0
+        self.currentChanged.emit(self.current)
+
+    def setShuffle(self,shuffle):
+        '''Visit the files in shuffled order or in playlist order'''
+        self.shuffle = shuffle
+        self.__permutation(len(self.order),reseed=True)
+        self.shuffleChanged.emit(shuffle)
+
+    def nextRow(self):
+        '''Row of the file following the current one, -1 at the end of the playlist'''
+        n = len(self.order)
+        if self.current < 0 and 0 <= self.resume_row < n:
+            return self.resume_row # the playing file was removed: its follower takes its place
+        if self.shuffle and n:
+            step = (self.__step_of(self.current) + 1) % n if self.current >= 0 else self.shuffle_start
+            if self.current >= 0 and step == self.shuffle_start:
+                return -1 # all the files of the cycle have been visited
+            return (self.a*step + self.b) % n
+        return self.current + 1 if self.current + 1 < n else -1
+
+    def move(self,row,to,undo=True):
+        '''Move a file to another row
+
+        Parameters:
+            row (int): row of the file
+            to (int): new row of the file
+            undo (bool): record the move for undo()
+        '''
+        if row == to or not (0 <= row < len(self.order) and 0 <= to < len(self.order)):
+            return
+        entry = self.order.pop(row)
+        self.order.insert(to,entry)
+        if self.current == row:
+            self.current = to
+        elif row < self.current <= to:
+            self.current -= 1
+        elif to <= self.current < row:
+            self.current += 1
+        if row < self.resume_row <= to:
+            self.resume_row -= 1
+        elif to <= self.resume_row < row:
+            self.resume_row += 1
+        if undo:
+            self.undo_stack.append(("move",to,row))
+        self.rowMoved.emit(row,to)
+
+    def remove(self,rows,undo=True):
+        '''Remove files
+
+        Parameters:
+            rows (list): rows of the files to remove
+            undo (bool): record the removal for undo()
+        '''
+        removed = []
+        for row in sorted(set(rows),reverse=True):
+            if 0 <= row < len(self.order):
+                removed.append((row,self.order.pop(row)))
+                if self.current == row:
+                    self.current = -1
+                    self.resume_row = row
+                elif self.current > row:
+                    self.current -= 1
+                if self.resume_row > row:
+                    self.resume_row -= 1
+                self.rowsRemoved.emit(row,1)
+        if removed:
+            self.__permutation(len(self.order))
+            if undo:
+                self.undo_stack.append(("remove",removed))
+
+    def undo(self):
+        '''Revert the latest move or removal
+
+        Returns:
+            bool: False if there is nothing to undo
+        '''
+        if not self.undo_stack:
+            return False
+        operation = self.undo_stack.pop()
+        if operation[0] == "move":
+            self.move(operation[1],operation[2],undo=False)
+        else:
+            for row,entry in reversed(operation[1]):
+                self.order.insert(row,entry)
+                if self.current >= row:
+                    self.current += 1
+                if self.resume_row >= row:
+                    self.resume_row += 1
+                self.rowsInserted.emit(row,1)
+            self.__permutation(len(self.order))
+        return True
+
+    def canUndo(self):
+        '''Check if there is an operation to undo'''
+        return bool(self.undo_stack)
+
+    def __step_of(self,row):
+        '''Step of the shuffled cycle visiting a row'''
+        return ((row - self.b)*self.a_inverse) % len(self.order)
+
+    def __permutation(self,n,reseed=False):
+        '''Choose the affine permutation of n rows, starting its cycle from the current row
+
+        When the number of rows changes the shuffled cycle restarts from the current row,
+        or from the row following the removed playing file.
+        '''
+        if not n:
+            self.a, self.a_inverse, self.b, self.shuffle_start, self.n = 1, 1, 0, 0, 0
+            return
+        if reseed or self.n != n:
+            a = random.randrange(1,n) if n > 2 else 1
+            while math.gcd(a,n) != 1:
+                a = random.randrange(1,n)
+            self.a, self.a_inverse, self.b = a, pow(a,-1,n) if n > 1 else 0, random.randrange(n)
+        self.n = n
+        anchor = self.current if self.current >= 0 else self.resume_row
+        self.shuffle_start = self.__step_of(anchor) if 0 <= anchor < n else 0
+
+class PlaylistModel(QAbstractListModel):
+    '''List model of a Playlist, exposing its rows PLAYLIST_FETCH at a time
+
+    The view asks for more rows through canFetchMore/fetchMore while
+    scrolling, so that only the visible part of a long queue is ever
+    turned into items.
+    '''
+    def __init__(self,playlist,parent=None):
+        '''Class initialization
+
+        Parameters:
+            playlist (Playlist): playlist to show
+            parent (QObject): parent object
+        '''
+        super().__init__(parent)
+        self.playlist = playlist
+        self.loaded = 0
+        self.current = -1
+        playlist.rowsInserted.connect(self.__inserted)
+        playlist.rowsRemoved.connect(self.__removed)
+        playlist.rowMoved.connect(self.__moved)
+        playlist.reset.connect(self.__reset)
+        playlist.currentChanged.connect(self.__current_changed)
+
+    def rowCount(self,parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def canFetchMore(self,parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.playlist)
+
+    def fetchMore(self,parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(PLAYLIST_FETCH,len(self.playlist) - self.loaded)
+        if count > 0:
+            self.beginInsertRows(QModelIndex(),self.loaded,self.loaded + count - 1)
+            self.loaded += count
+            self.endInsertRows()
+
+    def data(self,index,role=Qt.DisplayRole):
+        row = index.row()
+        if not index.isValid() or row >= self.loaded:
+            return None
+        if role == Qt.DisplayRole:
+            return self.playlist.name(row)
+        if role == Qt.ToolTipRole:
+            return self.playlist.path(row)
+        if role == Qt.FontRole and row == self.playlist.current:
+            font = QFont()
+            font.setBold(True)
+            return font
+        return None
+
+    def __inserted(self,first,count):
+        if first >= self.loaded:
+            if self.loaded < PLAYLIST_FETCH:
+                self.fetchMore() # the first page is shown without scrolling
+            return
+        self.beginInsertRows(QModelIndex(),first,first + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def __removed(self,first,count):
+        if first >= self.loaded:
+            return
+        last = min(first + count,self.loaded) - 1
+        self.beginRemoveRows(QModelIndex(),first,last)
+        self.loaded -= last - first + 1
+        self.endRemoveRows()
+
+    def __moved(self,row,to):
+        if row < self.loaded and to < self.loaded:
+            self.beginMoveRows(QModelIndex(),row,row,QModelIndex(),to + 1 if to > row else to)
+            self.endMoveRows()
+        else:
+            self.__reset()
+
+    def __reset(self):
+        self.beginResetModel()
+        self.loaded = min(self.loaded,len(self.playlist))
+        self.endResetModel()
+
+    def __current_changed(self,row):
+        for r in (self.current,row):
+            if 0 <= r < self.loaded:
+                self.dataChanged.emit(self.index(r),self.index(r),[Qt.FontRole])
+        self.current = row
+
+class PlaylistDock(QDockWidget):
+    '''Dock widget showing the playlist, with shuffle and undo
+
+    Double click plays a file, Delete removes the selected ones,
+    Alt+Up/Alt+Down move them and Ctrl+Z reverts the latest change.
+    '''
+    activated = Signal(int) # row to play
+
+    def __init__(self,playlist,language,parent=None):
+        '''Class initialization
+
+        Parameters:
+            playlist (Playlist): playlist to show
+            language (Language): words translated in the selected language
+            parent (QWidget): main window holding the dock
+        '''
+        super().__init__(parent)
+        self.playlist = playlist
+        self.language = language
+        self.setObjectName("playlist")
+        self.language.bind(self,"windowTitle","playlist")
+        self.model = PlaylistModel(playlist,self)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.view.setUniformItemSizes(True)
+        self.view.setLayoutMode(QListView.Batched)
+        self.view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.view.doubleClicked.connect(lambda index: self.activated.emit(index.row()))
+
+        self.shuffle = QPushButton()
+        self.shuffle.setCheckable(True)
+        self.language.bind(self.shuffle,"text","shuffle")
+        self.shuffle.toggled.connect(self.playlist.setShuffle)
+        self.undo = QPushButton()
+        self.language.bind(self.undo,"text","undo")
+        self.undo.clicked.connect(self.playlist.undo)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.shuffle)
+        buttons.addWidget(self.undo)
+        layout = QVBoxLayout()
+        layout.addWidget(self.view)
+        layout.addLayout(buttons)
+        widget = QWidget()
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+        for key,slot in ((QKeySequence.Delete,self.__remove),(QKeySequence.Undo,self.playlist.undo),
+                         (QKeySequence(Qt.ALT | Qt.Key_Up),lambda: self.__move(-1)),
+                         (QKeySequence(Qt.ALT | Qt.Key_Down),lambda: self.__move(1))):
+            shortcut = QShortcut(key,self.view)
+            shortcut.setContext(Qt.WidgetShortcut)
+            shortcut.activated.connect(slot)
+
+    def __rows(self):
+        return sorted(index.row() for index in self.view.selectionModel().selectedRows())
+
+    def __remove(self):
+        self.playlist.remove(self.__rows())
+
+    def __move(self,delta):
+        rows = self.__rows()
+        if len(rows) != 1:
+            return
+        to = rows[0] + delta
+        self.playlist.move(rows[0],to)
+        if 0 <= to < self.model.loaded:
+            self.view.setCurrentIndex(self.model.index(to))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we define the probing of media files through QMediaPlayer:
+    media_info -> duration, tracks, resolution, codecs and metadata of a loaded player
+    MediaProbe -> hidden player probing a queue of files, one after the other
+
+'''
+
+from PySide6.QtCore import QObject, QTimer, QUrl, QSize, QDateTime, QLocale, Signal
+from PySide6.QtGui import QImage
+from PySide6.QtMultimedia import QMediaPlayer, QMediaMetaData
+from collections import deque
+from src.mvars import PROBE_TIMEOUT
+import enum
+
+def metadata_dict(metadata):
+    '''Convert a QMediaMetaData into a json serializable dictionary
+
+    Parameters:
+        metadata (QMediaMetaData): metadata to convert
+    Returns:
+        dict: values by key name, images are skipped
+    '''
+    result = {}
+    for key in metadata.keys():
+        value = metadata.value(key)
+        if value is None or isinstance(value,QImage):
+            continue
+        if isinstance(value,QSize):
+            value = [value.width(),value.height()]
+        elif isinstance(value,QDateTime):
+            value = value.toString("yyyy-MM-ddTHH:mm:ss")
+        elif isinstance(value,QLocale.Language):
+            value = QLocale.languageToString(value)
+        elif isinstance(value,enum.Enum):
+            value = value.name
+        elif not isinstance(value,(int,float,str,bool,list)):
+            value = str(value)
+        result[QMediaMetaData.metaDataKeyToString(key)] = value
+    return result
+
+def media_info(player):
+    '''Information on the media loaded by a player
+
+    Parameters:
+        player (QMediaPlayer): player in LoadedMedia state
+    Returns:
+        dict: duration in milliseconds, tracks, resolution, codecs and metadata
+    '''
+    video = [metadata_dict(m) for m in player.videoTracks()]
+    audio = [metadata_dict(m) for m in player.audioTracks()]
+    subtitles = [metadata_dict(m) for m in player.subtitleTracks()]
+    metadata = metadata_dict(player.metaData())
+    resolution = metadata.get("Resolution")
+    if resolution is None and video:
+        resolution = video[0].get("Resolution")
+    return {"duration":player.duration(),
+            "has_video":player.hasVideo(),
+            "has_audio":player.hasAudio(),
+            "resolution":resolution,
+            "video_codec":metadata.get("Video codec",video[0].get("Video codec") if video else None),
+            "audio_codec":metadata.get("Audio codec",audio[0].get("Audio codec") if audio else None),
+            "tracks":{"video":video,"audio":audio,"subtitles":subtitles},
+            "metadata":metadata}
+
+class MediaProbe(QObject):
+    '''Hidden player probing a queue of files, one after the other
+
+    Each file is given PROBE_TIMEOUT milliseconds to reach LoadedMedia,
+    otherwise it is reported with a timeout error.
+    '''
+    probed = Signal(str,dict) # file, media_info or {"error":...}
+
+    def __init__(self,timeout=PROBE_TIMEOUT):
+        '''Class initialization
+
+        Parameters:
+            timeout (int): milliseconds given to each file
+        '''
+        super().__init__()
+        self.timeout = timeout
+        self.player = QMediaPlayer(self)
+        self.player.mediaStatusChanged.connect(self.__status_changed)
+        self.player.errorOccurred.connect(self.__error)
+        self.queue = deque()
+        self.current = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(lambda: self.__finish({"error":"timeout"}))
+
+    def probe(self,path):
+        '''Append a file to the queue to probe
+
+        Parameters:
+            path (str): media file
+        '''
+        self.queue.append(path)
+        if self.current is None:
+            self.__next()
+
+    def isIdle(self):
+        '''Check if no file is being probed or waiting'''
+        return self.current is None and not self.queue
+
+    def __next(self):
+        if self.queue:
+            self.current = self.queue.popleft()
+            self.timer.start(self.timeout)
+            self.player.setSource(QUrl.fromLocalFile(self.current))
+
+    def __status_changed(self,status):
+        if self.current is None:
+            return
+        if status == QMediaPlayer.LoadedMedia:
+            self.__finish(media_info(self.player))
+        elif status == QMediaPlayer.InvalidMedia:
+            self.__finish({"error":self.player.errorString() or "invalid media"})
+
+    def __error(self,error,error_string):
+        if self.current is not None and error != QMediaPlayer.NoError:
+            self.__finish({"error":error_string})
+
+    def __finish(self,info):
+        self.timer.stop()
+        path, self.current = self.current, None
+        self.player.setSource(QUrl())
+        self.probed.emit(path,info)
+        self.__next()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+Opt-in profiling of the hot paths of the application (--profile):
+    SlotProfiler -> call counts and latency histograms of the methods of the Qt classes, with the lag of the event loop
+
+The methods are wrapped on their classes, before the objects are created,
+so the connections to bound methods keep the thread of their receiver.
+
+'''
+
+from src.mvars import PROFILE_HEARTBEAT, PROFILE_TOP
+import cProfile
+import functools
+import importlib
+import inspect
+import sys
+import threading
+import time
+
+PROFILE_MODULES = ("src.mainWindow","src.videoplayer","src.selectLanguage","src.seek","src.refresh",
+                   "src.gapless","src.loader","src.playlist","src.waveform","src.health","src.segment",
+                   "src.trickplay") # modules whose classes are instrumented
+SLOT_EDGES = (0.1,0.5,1,2,5,10,16,50,100) # ms, upper bounds of the buckets
+LAG_EDGES = (1,5,10,20,50,100,250,500,1000) # ms
+
+class _SlotStats:
+    '''Calls of a wrapped method'''
+    __slots__ = ("calls","total","worst","latency")
+
+    def __init__(self):
+        from src.health import RollingHistogram
+        self.calls = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.latency = RollingHistogram(SLOT_EDGES)
+
+class SlotProfiler:
+    '''Call counts and latency histograms of the methods of the Qt classes, with the lag of the event loop
+
+    Attributes:
+        enabled (bool): the profiling was asked on the command line
+        stats (dict): _SlotStats by qualified method name
+        stats_file (str): where to write the cProfile statistics, None for no cProfile
+    '''
+    def __init__(self):
+        self.enabled = False
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.stats_file = None
+        self.cprofile = None
+        self.heartbeat = None
+        self.lag = None
+        self.t0 = None
+
+    def install(self,stats_file=None):
+        '''Instrument the classes of PROFILE_MODULES and start the heartbeat, after QApplication
+
+        Parameters:
+            stats_file (str): where to write the cProfile statistics, None for no cProfile
+        '''
+        from PySide6.QtCore import QObject, QTimer, Qt
+        from src.health import RollingHistogram
+        for name in PROFILE_MODULES:
+            module = importlib.import_module(name)
+            for cls in vars(module).values():
+                if inspect.isclass(cls) and cls.__module__ == name and issubclass(cls,QObject):
+                    self.instrument(cls)
+        self.lag = RollingHistogram(LAG_EDGES)
+        self.heartbeat = QTimer()
+        self.heartbeat.setTimerType(Qt.PreciseTimer)
+        self.heartbeat.setInterval(PROFILE_HEARTBEAT)
+        self.heartbeat.timeout.connect(self.__beat)
+        self.last_beat = time.perf_counter()
+        self.heartbeat.start()
+        self.t0 = time.perf_counter()
+        self.stats_file = stats_file
+        if stats_file:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def instrument(self,cls):
+        '''Wrap the methods defined by a class with timers
+
+        Parameters:
+            cls (type): class to instrument
+        '''
+        prefix = f"_{cls.__name__}__"
+        for attr,value in list(vars(cls).items()):
+            if not inspect.isfunction(value) or (attr.startswith("__") and attr.endswith("__")):
+                continue
+            label = f"{cls.__name__}.{attr.replace(prefix,'__',1)}"
+            setattr(cls,attr,self.__wrap(value,label))
+
+    def __wrap(self,func,label):
+        code = func.__code__
+        # Qt gives a slot only the arguments it accepts: the wrapper does the same
+        count = None if code.co_flags & inspect.CO_VARARGS else code.co_argcount
+        stats = self.stats.setdefault(label,_SlotStats())
+        lock = self.lock
+        @functools.wraps(func)
+        def timed(*args,**kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args[:count],**kwargs)
+            finally:
+                elapsed = (time.perf_counter() - start)*1000.0
+                with lock:
+                    stats.calls += 1
+                    stats.total += elapsed
+                    stats.worst = max(stats.worst,elapsed)
+                    stats.latency.add(elapsed)
+        return timed
+
+    def __beat(self):
+        now = time.perf_counter()
+        self.lag.add(max(0.0,(now - self.last_beat)*1000.0 - PROFILE_HEARTBEAT))
+        self.last_beat = now
+
+    def report(self,stream=None):
+        '''Print the PROFILE_TOP methods by total time and the event loop lag, writing the cProfile statistics
+
+        Parameters:
+            stream (file): where to print the report, stderr by default
+        '''
+        if not self.enabled or self.t0 is None:
+            return
+        stream = stream if stream else sys.stderr
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            try:
+                self.cprofile.dump_stats(self.stats_file)
+                print(f"cProfile statistics written in {self.stats_file}",file=stream)
+            except OSError as e:
+                print(f"cProfile statistics not written: {e}",file=stream)
+        self.heartbeat.stop()
+        wall = (time.perf_counter() - self.t0)*1000.0
+        with self.lock:
+            called = sorted(((s.total,label,s) for label,s in self.stats.items() if s.calls),reverse=True)
+        print(f"Slot profile over {wall/1000.0:.1f} s (ms; p50/p95 of the latest calls):",file=stream)
+        print(f"{'calls':>8} {'total':>10} {'mean':>8} {'p50':>8} {'p95':>8} {'max':>8}  slot",file=stream)
+        for total,label,s in called[:PROFILE_TOP]:
+            print(f"{s.calls:8d} {total:10.1f} {total/s.calls:8.3f} {s.latency.percentile(50):8.3f} "
+                  f"{s.latency.percentile(95):8.3f} {s.worst:8.2f}  {label}",file=stream)
+        lag = self.lag.summary()
+        if lag["window"]:
+            print(f"Event loop lag (heartbeat every {PROFILE_HEARTBEAT} ms): p50 {lag['p50']:.1f} ms, "
+                  f"p95 {lag['p95']:.1f} ms, max {lag['max']:.1f} ms, buckets {lag['buckets']}",file=stream)
+
+profiler = SlotProfiler()
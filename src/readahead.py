@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we define the read-ahead source of the player:
+    is_network_path -> check if a file lives on a network filesystem
+    ReadAheadDevice -> QIODevice reading a file ahead of the player in a background thread
+
+'''
+
+from PySide6.QtCore import QIODevice
+from src.mvars import READAHEAD_BUFFER, READAHEAD_CHUNK, READAHEAD_BACK
+import mmap
+import os
+import sys
+import threading
+
+NETWORK_FS = ("nfs","nfs4","cifs","smb3","smbfs","ncpfs","afs","9p","fuse.sshfs","davfs","fuse.rclone")
+
+def is_network_path(path):
+    '''Check if a file lives on a network filesystem (NFS, SMB, ...)
+
+    Parameters:
+        path (str): file to check
+    Returns:
+        bool: True if the filesystem of the file is a network one
+    '''
+    path = os.path.realpath(path)
+    if sys.platform == "win32":
+        if path.startswith("\\\\"):
+            return True
+        import ctypes
+        drive = os.path.splitdrive(path)[0] + "\\"
+        return ctypes.windll.kernel32.GetDriveTypeW(drive) == 4 # DRIVE_REMOTE
+    try:
+        with open("/proc/mounts",'r') as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return False
+    best, fstype = "", ""
+    for mount,kind in mounts:
+        mount = mount.replace("\\040"," ")
+        if (path == mount or path.startswith(mount.rstrip("/") + "/")) and len(mount) > len(best):
+            best, fstype = mount, kind
+    return fstype in NETWORK_FS
+
+class ReadAheadDevice(QIODevice):
+    '''QIODevice reading a file ahead of the player in a background thread
+
+    The thread fills a ring buffer of READAHEAD_BUFFER bytes with large
+    sequential reads of READAHEAD_CHUNK bytes starting from the position
+    read by the player, through a memory map for local files and plain
+    reads for network ones. Up to READAHEAD_BACK bytes already read are
+    kept for short backward seeks; a seek outside the buffer empties it
+    and restarts the read-ahead from the new position.
+
+    Attributes:
+        path (str): file read by the device
+        capacity (int): bytes of the ring buffer
+        use_mmap (bool): True if the file is read through a memory map
+    '''
+    def __init__(self,path,capacity=READAHEAD_BUFFER,chunk=READAHEAD_CHUNK,use_mmap=None,parent=None):
+        '''Class initialization
+
+        Parameters:
+            path (str): file to read
+            capacity (int): bytes of the ring buffer
+            chunk (int): bytes of each read of the background thread
+            use_mmap (bool): read through a memory map, by default only for local files
+            parent (QObject): parent object
+        '''
+        super().__init__(parent)
+        self.path = path
+        self.file_size = os.stat(path).st_size
+        self.capacity = max(capacity,2*chunk)
+        self.chunk = chunk
+        self.back = min(READAHEAD_BACK,self.capacity//4)
+        self.use_mmap = (not is_network_path(path)) if use_mmap is None else use_mmap
+        self.ring = bytearray(self.capacity)
+        self.base = 0 # file offset of the first buffered byte
+        self.head = 0 # ring index of the first buffered byte
+        self.length = 0 # buffered bytes
+        self.read_pos = 0 # file offset following the latest read of the player
+        self.generation = 0 # increased when the buffer is emptied by a seek
+        self.error = None
+        self.stopping = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def open(self,mode=QIODevice.ReadOnly):
+        '''Open the file and start the read-ahead thread, only for reading'''
+        if mode & QIODevice.WriteOnly:
+            return False
+        self.stopping = False
+        self.thread = threading.Thread(target=self.__fill_loop,name="read-ahead",daemon=True)
+        self.thread.start()
+        return super().open(QIODevice.ReadOnly | QIODevice.Unbuffered)
+
+    def close(self):
+        '''Stop the read-ahead thread and close the file'''
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(1.0) # a read blocked on the network is left to the daemon thread
+            self.thread = None
+        super().close()
+
+    def isSequential(self):
+        return False
+
+    def size(self):
+        return self.file_size
+
+    def bytesAvailable(self):
+        return max(0,self.file_size - self.pos()) + super().bytesAvailable()
+
+    def bufferedBytes(self):
+        '''Bytes buffered ahead of the latest read of the player'''
+        with self.condition:
+            return max(0,self.base + self.length - self.read_pos)
+
+    def fillLevel(self):
+        '''Fraction of the ring buffer filled ahead of the player, between 0 and 1'''
+        ahead = self.bufferedBytes()
+        if self.read_pos + ahead >= self.file_size:
+            return 1.0 # everything up to the end of the file is buffered
+        return ahead/float(self.capacity)
+
+    def readData(self,maxlen):
+        pos = self.pos()
+        with self.condition:
+            if not (self.base <= pos <= self.base + self.length):
+                self.base, self.head, self.length = pos, 0, 0 # seek outside the buffer
+                self.generation += 1
+            self.read_pos = pos
+            self.condition.notify_all()
+            while pos == self.base + self.length and pos < self.file_size \
+                  and self.error is None and not self.stopping:
+                self.condition.wait()
+            if self.error is not None:
+                self.setErrorString(self.error)
+            n = min(maxlen,self.base + self.length - pos)
+            if n <= 0:
+                return b""
+            start = (self.head + pos - self.base) % self.capacity
+            end = start + n
+            if end <= self.capacity:
+                data = bytes(self.ring[start:end])
+            else:
+                data = bytes(self.ring[start:]) + bytes(self.ring[:end - self.capacity])
+            self.read_pos = pos + n
+            self.condition.notify_all()
+        return data
+
+    def writeData(self,data):
+        return -1
+
+    def __fill_loop(self):
+        try:
+            with open(self.path,'rb') as f:
+                source = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ) if self.use_mmap else None
+                try:
+                    while self.__fill(f,source):
+                        pass
+                finally:
+                    if source is not None:
+                        source.close()
+        except (OSError,ValueError) as e:
+            with self.condition:
+                self.error = str(e)
+                self.condition.notify_all()
+
+    def __fill(self,f,source):
+        '''Read the next chunk in the ring buffer, waiting for free space
+
+        Returns:
+            bool: False when the device is closing
+        '''
+        with self.condition:
+            while True:
+                if self.stopping:
+                    return False
+                offset = self.base + self.length
+                reclaim = max(0,self.read_pos - self.base - self.back)
+                free = self.capacity - self.length + reclaim
+                if offset < self.file_size and free >= min(self.chunk,self.file_size - offset):
+                    break
+                self.condition.wait()
+            # drop the bytes read by the player beyond the backward reserve
+            self.base += reclaim
+            self.head = (self.head + reclaim) % self.capacity
+            self.length -= reclaim
+            generation = self.generation
+            n = min(self.chunk,self.capacity - self.length,self.file_size - offset)
+        if source is not None:
+            data = source[offset:offset + n]
+        else:
+            f.seek(offset)
+            data = f.read(n)
+        with self.condition:
+            if generation != self.generation:
+                return True # the buffer has been emptied by a seek while reading
+            if not data:
+                self.file_size = offset # the file has been truncated
+                self.condition.notify_all()
+                return True
+            start = (self.head + self.length) % self.capacity
+            end = start + len(data)
+            if end <= self.capacity:
+                self.ring[start:end] = data
+            else:
+                split = self.capacity - start
+                self.ring[start:] = data[:split]
+                self.ring[:end - self.capacity] = data[split:]
+            self.length += len(data)
+            self.condition.notify_all()
+        return True
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we have the class:
+    RefreshScheduler -> coalesce frequent UI updates to the display refresh rate
+
+'''
+
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtGui import QGuiApplication
+from src.mvars import HIDDEN_REFRESH_RATE
+
+class RefreshScheduler(QObject):
+    '''Coalesce update requests, calling back at most once per refresh interval
+
+    The interval follows the refresh rate of the screen showing the widget,
+    or hidden_rate when the window of the widget is hidden or minimized.
+
+    Attributes:
+        callback (function): function applying the pending update
+        widget (QWidget): widget whose window visibility sets the rate
+        hidden_rate (float): updates per second when the window is hidden
+        requested (int): number of update requests
+        skipped (int): number of requests merged into a pending update
+    '''
+    def __init__(self,callback,widget,hidden_rate=HIDDEN_REFRESH_RATE):
+        '''Class initialization
+
+        Parameters:
+            callback (function): function applying the pending update
+            widget (QWidget): widget whose window visibility sets the rate
+            hidden_rate (float): updates per second when the window is hidden
+        '''
+        super().__init__()
+        self.callback = callback
+        self.widget = widget
+        self.hidden_rate = hidden_rate
+        self.requested = 0
+        self.skipped = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.callback)
+
+    def request(self):
+        '''Ask for an update, merged with the pending one if any'''
+        self.requested += 1
+        if self.timer.isActive():
+            self.skipped += 1
+        else:
+            self.timer.start(self.interval())
+
+    def flush(self):
+        '''Apply the pending update at once'''
+        if self.timer.isActive():
+            self.timer.stop()
+            self.callback()
+
+    def interval(self):
+        '''Milliseconds between two updates'''
+        window = self.widget.window()
+        if not window.isVisible() or window.isMinimized():
+            rate = self.hidden_rate
+        else:
+            screen = window.screen() or QGuiApplication.primaryScreen()
+            rate = screen.refreshRate() if screen and screen.refreshRate() > 0 else 60.0
+        return max(1,int(1000.0/rate))
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we have the class:
+    ResumeStore -> positions where each file was left, written in batches by a background thread
+
+'''
+
+from src.mvars import RESUME_FLUSH_INTERVAL, RESUME_MARGIN
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resume (
+    fingerprint TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    path TEXT,
+    updated REAL
+) WITHOUT ROWID;
+"""
+
+class ResumeStore:
+    '''Positions where each file was left, keyed by its content fingerprint
+
+    update() only puts the position in a queue: a background thread merges
+    the queued positions and writes them in one transaction every
+    RESUME_FLUSH_INTERVAL seconds. lookup() reads the positions not
+    written yet first, then the primary key of the SQLite table.
+
+    Attributes:
+        database (str): SQLite file of the positions
+    '''
+    def __init__(self,database):
+        '''Class initialization
+
+        Parameters:
+            database (str): SQLite file of the positions
+        '''
+        self.database = database
+        self.queue = queue.Queue()
+        self.pending = {} # fingerprint -> (position, duration, path), not written yet
+        self.writing = {} # positions of the transaction in progress
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.writer = threading.Thread(target=self.__write_loop,name="resume-writer",daemon=True)
+        self.writer.start()
+
+    def lookup(self,fp):
+        '''Position where a file was left
+
+        Parameters:
+            fp (str): fingerprint of the file
+        Returns:
+            int: position in milliseconds, 0 if unknown
+        '''
+        with self.lock:
+            for positions in (self.pending,self.writing):
+                if fp in positions:
+                    return positions[fp][0]
+        try:
+            row = self.__connection().execute("SELECT position FROM resume WHERE fingerprint = ?",(fp,)).fetchone()
+        except sqlite3.Error:
+            return 0
+        return row[0] if row else 0
+
+    def update(self,fp,path,position,duration):
+        '''Queue the position of a file, dropped when near its start or end
+
+        Parameters:
+            fp (str): fingerprint of the file
+            path (str): location of the file
+            position (int): position in milliseconds
+            duration (int): duration in milliseconds
+        '''
+        if position < RESUME_MARGIN or (duration > 0 and position > duration - RESUME_MARGIN):
+            position = 0
+        with self.lock:
+            self.pending[fp] = (position,duration,path)
+        self.queue.put(fp)
+
+    def close(self):
+        '''Write the queued positions and stop the background thread'''
+        self.queue.put(None)
+        self.writer.join()
+
+    def __connection(self):
+        '''Connection of the calling thread'''
+        if not hasattr(self.local,"con"):
+            os.makedirs(os.path.dirname(self.database),exist_ok=True)
+            self.local.con = sqlite3.connect(self.database,timeout=30)
+            self.local.con.execute("PRAGMA journal_mode=WAL")
+            self.local.con.executescript(SCHEMA)
+        return self.local.con
+
+    def __write_loop(self):
+        running = True
+        while running:
+            try:
+                if self.queue.get() is None:
+                    running = False
+                deadline = time.monotonic() + RESUME_FLUSH_INTERVAL
+                while running and time.monotonic() < deadline:
+                    try:
+                        if self.queue.get(timeout=max(0,deadline - time.monotonic())) is None:
+                            running = False
+                    except queue.Empty:
+                        break
+                self.__flush()
+            except sqlite3.Error as e:
+                print(f"Resume positions not saved: {e}")
+
+    def __flush(self):
+        with self.lock:
+            batch = self.writing = self.pending
+            self.pending = {}
+        if not batch:
+            return
+        con = self.__connection()
+        now = time.time()
+        try:
+            with con:
+                con.executemany("DELETE FROM resume WHERE fingerprint = ?",
+                                ((fp,) for fp,(position,_,_) in batch.items() if position == 0))
+                con.executemany("INSERT OR REPLACE INTO resume VALUES (?,?,?,?,?)",
+                                ((fp,position,duration,path,now) for fp,(position,duration,path) in batch.items() if position > 0))
+        finally:
+            with self.lock:
+                self.writing = {}
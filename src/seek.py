@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we have the class:
+    SeekController -> keep at most one seek in flight, the newest request winning
+
+'''
+
+from PySide6.QtCore import QObject, QTimer, Signal
+from collections import deque
+from src.mvars import SEEK_TOLERANCE, SEEK_TIMEOUT
+import time
+
+class SeekController(QObject):
+    '''Coalesce the seek requests of a player
+
+    A seek is in flight from setPosition until the player reports a position
+    within SEEK_TOLERANCE of the target, or SEEK_TIMEOUT expires. Requests
+    arriving meanwhile replace each other, and only the newest is issued
+    when the in-flight seek completes.
+
+    Attributes:
+        player (QMediaPlayer): player to seek
+        latencies (deque): latency in milliseconds of the latest seeks
+        coalesced (int): number of requests replaced by a newer one
+    '''
+    seekFinished = Signal(int,float) # target position, latency in milliseconds
+
+    def __init__(self,player):
+        '''Class initialization
+
+        Parameters:
+            player (QMediaPlayer): player to seek
+        '''
+        super().__init__()
+        self.player = player
+        self.inflight = None # (target, start time)
+        self.pending = None
+        self.coalesced = 0
+        self.latencies = deque(maxlen=100)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.__complete)
+        self.player.positionChanged.connect(self.__position_changed)
+
+    def seek(self,ms):
+        '''Request a seek
+
+        Parameters:
+            ms (int): target position in milliseconds
+        '''
+        ms = max(0,int(ms))
+        if self.player.duration() > 0:
+            ms = min(ms,self.player.duration())
+        if self.inflight is None:
+            self.__issue(ms)
+        else:
+            if self.pending is not None:
+                self.coalesced += 1
+            self.pending = ms
+
+    def step(self,delta):
+        '''Seek relatively to the latest requested position
+
+        Parameters:
+            delta (int): milliseconds to move, negative for moving back
+        '''
+        self.seek(self.target() + delta)
+
+    def target(self):
+        '''Position the player is going to reach, in milliseconds'''
+        if self.pending is not None:
+            return self.pending
+        if self.inflight is not None:
+            return self.inflight[0]
+        return self.player.position()
+
+    def isSeeking(self):
+        '''Check if a seek is in flight or waiting'''
+        return self.inflight is not None
+
+    def lastLatency(self):
+        '''Latency in milliseconds of the latest completed seek, None if none'''
+        return self.latencies[-1] if self.latencies else None
+
+    def __issue(self,ms):
+        self.inflight = (ms,time.perf_counter())
+        self.timer.start(SEEK_TIMEOUT)
+        self.player.setPosition(ms)
+
+    def __position_changed(self,pos):
+        if self.inflight is not None and abs(pos - self.inflight[0]) <= SEEK_TOLERANCE:
+            self.timer.stop()
+            self.__complete()
+
+    def __complete(self):
+        target, t0 = self.inflight
+        latency = (time.perf_counter() - t0)*1000.0
+        self.latencies.append(latency)
+        self.inflight = None
+        self.seekFinished.emit(target,latency)
+        if self.pending is not None:
+            ms, self.pending = self.pending, None
+            self.__issue(ms)
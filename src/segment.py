@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we define the A-B loop and the frame stepping:
+    own_frame -> copy of a video frame which does not hold the memory of the decoder
+    FrameCache -> decoded frames of the playing file by start time, bounded in bytes
+    SegmentController -> A-B loop points and frame stepping, served from the FrameCache when possible
+
+'''
+
+from PySide6.QtCore import QObject, QTimer, Qt, Signal
+from PySide6.QtMultimedia import QMediaPlayer, QVideoFrame
+from src.mvars import SEGMENT_CACHE_BYTES, SEGMENT_FRAME, SEGMENT_WINDOW
+import bisect
+import itertools
+import numpy as np
+
+def own_frame(frame):
+    '''Copy of a video frame which does not hold the memory of the decoder
+
+    Frames in main memory are shared, frames on the GPU are read back in a
+    new frame, so the cache never keeps the surfaces of a hardware decoder.
+
+    Parameters:
+        frame (QVideoFrame): frame shown by the sink
+    Returns:
+        QVideoFrame: frame to cache, None if it cannot be read
+    '''
+    if frame.handleType() == QVideoFrame.NoHandle:
+        return QVideoFrame(frame)
+    copy = QVideoFrame(frame.surfaceFormat())
+    if not frame.map(QVideoFrame.ReadOnly):
+        return None
+    try:
+        if not copy.map(QVideoFrame.WriteOnly):
+            return None
+        for plane in range(frame.planeCount()):
+            src_line, dst_line = frame.bytesPerLine(plane), copy.bytesPerLine(plane)
+            rows = min(frame.mappedBytes(plane)//src_line,copy.mappedBytes(plane)//dst_line)
+            src = np.frombuffer(frame.bits(plane),dtype=np.uint8,count=rows*src_line).reshape(rows,src_line)
+            dst = np.frombuffer(copy.bits(plane),dtype=np.uint8,count=rows*dst_line).reshape(rows,dst_line)
+            width = min(src_line,dst_line)
+            dst[:,:width] = src[:,:width]
+        copy.unmap()
+    finally:
+        frame.unmap()
+    copy.setStartTime(frame.startTime())
+    copy.setEndTime(frame.endTime())
+    return copy
+
+class FrameCache:
+    '''Decoded frames of the playing file by start time, bounded in bytes
+
+    Outside the pinned range (the A-B loop) only the latest window frames
+    are kept. When the limit is reached the oldest frames are dropped,
+    except the pinned ones, which are only refused once the range alone
+    fills the cache.
+
+    Attributes:
+        limit (int): maximum bytes of the cached frames, estimated from their size
+        window (int): maximum number of frames outside the pinned range
+        size (int): bytes of the cached frames
+    '''
+    def __init__(self,limit=SEGMENT_CACHE_BYTES,window=SEGMENT_WINDOW):
+        '''Class initialization
+
+        Parameters:
+            limit (int): maximum bytes of the cached frames
+            window (int): maximum number of frames outside the pinned range
+        '''
+        self.limit = limit
+        self.window = window
+        self.clear()
+
+    def clear(self):
+        '''Drop all the frames'''
+        self.times = [] # start times in microseconds, sorted
+        self.frames = {} # start time -> frame, in insertion order
+        self.size = 0
+        self.pinned = None
+        self.loose = 0 # frames outside the pinned range
+
+    def setPinned(self,start,end):
+        '''Keep the frames between two positions, or none with None
+
+        Parameters:
+            start (int): first position in microseconds
+            end (int): last position in microseconds
+        '''
+        self.pinned = None if start is None else (start,end)
+        self.loose = sum(1 for k in self.frames if not self.__is_pinned(k))
+        self.__trim()
+
+    @staticmethod
+    def frameBytes(frame):
+        '''Bytes of a frame: 4:2:0 planes for planar formats, 32 bit pixels otherwise'''
+        return frame.width()*frame.height()*(12 if frame.planeCount() > 1 else 32)//8
+
+    def __is_pinned(self,key):
+        return self.pinned is not None and self.pinned[0] <= key <= self.pinned[1]
+
+    def add(self,frame):
+        '''Cache a frame, by its start time
+
+        Parameters:
+            frame (QVideoFrame): frame to cache
+        Returns:
+            bool: True if the frame is in the cache
+        '''
+        key = frame.startTime()
+        if key < 0:
+            return False
+        if key in self.frames:
+            return True
+        size = self.frameBytes(frame)
+        if self.size + size > self.limit:
+            for old in [k for k in self.frames if not self.__is_pinned(k)]:
+                self.__drop(old)
+                if self.size + size <= self.limit:
+                    break
+            if self.size + size > self.limit:
+                return False
+        self.frames[key] = frame
+        bisect.insort(self.times,key)
+        self.size += size
+        if not self.__is_pinned(key):
+            self.loose += 1
+            self.__trim()
+        return key in self.frames
+
+    def __trim(self):
+        '''Drop the oldest frames outside the pinned range beyond the window'''
+        if self.loose <= self.window:
+            return
+        for old in list(itertools.islice((k for k in self.frames if not self.__is_pinned(k)),self.loose - self.window)):
+            self.__drop(old)
+
+    def __drop(self,key):
+        frame = self.frames.pop(key)
+        self.times.pop(bisect.bisect_left(self.times,key))
+        self.size -= self.frameBytes(frame)
+        if not self.__is_pinned(key):
+            self.loose -= 1
+
+    def at(self,us):
+        '''Frame shown at a position, None if not cached'''
+        i = bisect.bisect_right(self.times,us)
+        if i:
+            frame = self.frames[self.times[i - 1]]
+            if frame.endTime() < 0 or us < frame.endTime():
+                return frame
+        return None
+
+    def before(self,us):
+        '''Cached frame starting just before a position, None if there is none'''
+        i = bisect.bisect_left(self.times,us)
+        return self.frames[self.times[i - 1]] if i else None
+
+    def after(self,us):
+        '''Cached frame starting just after a position, None if there is none'''
+        i = bisect.bisect_right(self.times,us)
+        return self.frames[self.times[i]] if i < len(self.times) else None
+
+    @staticmethod
+    def __contiguous(frame,following):
+        end = frame.endTime() if frame.endTime() >= 0 else frame.startTime()
+        return following.startTime() <= end + SEGMENT_FRAME*1000
+
+    def nextFrame(self,us):
+        '''Cached frame following the frame starting at a position, None if it is not cached or a gap is between them'''
+        frame = self.frames.get(us)
+        following = self.after(us)
+        if frame is None or following is None or not self.__contiguous(frame,following):
+            return None
+        return following
+
+    def previousFrame(self,us):
+        '''Cached frame preceding the frame starting at a position, None if it is not cached or a gap is between them'''
+        frame = self.frames.get(us)
+        previous = self.before(us)
+        if frame is None or previous is None or not self.__contiguous(previous,frame):
+            return None
+        return previous
+
+    def covers(self,start,end):
+        '''Check if the frames between two positions are all cached, without gaps
+
+        Parameters:
+            start (int): first position in microseconds
+            end (int): last position in microseconds
+        '''
+        frame = self.at(start)
+        if frame is None:
+            return False
+        while frame.endTime() >= 0 and frame.endTime() < end:
+            frame = self.nextFrame(frame.startTime())
+            if frame is None:
+                return False
+        return True
+
+class SegmentController(QObject):
+    '''A-B loop points and frame stepping of the playing file
+
+    A tap on the video sink caches the frames shown. Stepping back, and
+    forward over frames already decoded, shows them from the cache without
+    touching the player; otherwise the player seeks by one frame. When the
+    playback crosses B it goes back to A: once the whole A-B segment is
+    cached and the player is silent (no audio track, or muted) the loop is
+    replayed from the cache with a timer, otherwise the player seeks to A
+    and the cached frame of A is shown at once.
+
+    Attributes:
+        player (MediaPlayer): observed player, seeking through its SeekController
+        cache (FrameCache): frames shown, by start time
+        a (int): loop start in milliseconds, None if not set
+        b (int): loop end in milliseconds, None if not set
+        replaying (bool): the loop is played from the cache, the player is paused
+    '''
+    loopChanged = Signal(int,int) # start and end in milliseconds, -1 when not set
+    frameShown = Signal(int) # position in milliseconds of a frame shown from the cache
+
+    def __init__(self,sink):
+        '''Class initialization
+
+        Parameters:
+            sink (QVideoSink): sink of the video output, shared by the players
+        '''
+        super().__init__()
+        self.sink = sink
+        self.sink.videoFrameChanged.connect(self.__frame)
+        self.player = None
+        self.cache = FrameCache()
+        self.a = self.b = None
+        self.shown = -1 # start time in microseconds of the frame on screen
+        self.frame_us = SEGMENT_FRAME*1000
+        self.injecting = False
+        self.replaying = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.__replay_next)
+
+    def setPlayer(self,player):
+        '''Follow a new player, e.g. the one taking over the video output, clearing the loop
+
+        Parameters:
+            player (MediaPlayer): player to follow
+        '''
+        if self.player is not None:
+            self.player.sourceChanged.disconnect(self.__source_changed)
+            self.player.positionChanged.disconnect(self.__position_changed)
+        self.player = player
+        self.player.sourceChanged.connect(self.__source_changed)
+        self.player.positionChanged.connect(self.__position_changed)
+        self.__source_changed()
+
+    def position(self):
+        '''Position in milliseconds of the frame on screen, or of the player without video'''
+        if self.shown < 0 or not self.player.hasVideo():
+            return self.player.position()
+        return self.shown//1000
+
+    def cycleLoop(self):
+        '''Set A at the current position, then B, then clear the loop'''
+        pos = self.position()
+        if self.a is None:
+            self.a = pos
+        elif self.b is None and pos != self.a:
+            self.a, self.b = min(self.a,pos), max(self.a,pos)
+        else:
+            self.clearLoop()
+            return
+        if self.b is not None:
+            self.cache.setPinned(self.a*1000,self.b*1000)
+        self.loopChanged.emit(self.a,-1 if self.b is None else self.b)
+
+    def clearLoop(self):
+        '''Remove the loop points, resuming the player if the loop was replayed from the cache'''
+        playing = self.replaying
+        self.stopReplay()
+        self.a = self.b = None
+        self.cache.setPinned(None,None)
+        if playing:
+            self.player.play()
+        self.loopChanged.emit(-1,-1)
+
+    def step(self,frames):
+        '''Show the next or the previous frame, the player being paused
+
+        Parameters:
+            frames (int): 1 for the next frame, -1 for the previous one
+        '''
+        self.stopReplay()
+        # only the neighbours decoded next to the frame on screen: across a gap a frame would be skipped
+        frame = self.cache.nextFrame(self.shown) if frames > 0 else self.cache.previousFrame(self.shown)
+        if frame is not None:
+            self.__show(frame)
+        else:
+            self.player.seeker.seek(max(0,self.position() + frames*self.frame_us//1000))
+
+    def sync(self):
+        '''Move the player to the frame on screen, before playing again after a step or a replay'''
+        self.stopReplay()
+        if self.shown >= 0 and self.player.hasVideo() and abs(self.player.position() - self.shown//1000) > self.frame_us//1000:
+            self.player.seeker.seek(self.shown//1000)
+
+    def stopReplay(self):
+        '''Stop replaying the loop from the cache, leaving the player paused on the frame on screen'''
+        if self.replaying:
+            self.replaying = False
+            self.timer.stop()
+            self.player.seeker.seek(self.shown//1000)
+
+    def __show(self,frame):
+        self.injecting = True
+        self.sink.setVideoFrame(frame)
+        self.injecting = False
+        self.shown = frame.startTime()
+        self.frameShown.emit(self.shown//1000)
+
+    def __silent(self):
+        output = self.player.audioOutput()
+        return not self.player.hasAudio() or output is None or output.isMuted() or output.volume() == 0
+
+    def __source_changed(self,*args):
+        self.stopReplay()
+        self.cache.clear()
+        self.shown = -1
+        if self.a is not None:
+            self.a = self.b = None
+            self.loopChanged.emit(-1,-1)
+
+    def __frame(self,frame):
+        '''Cache each frame shown by the player and loop when B is crossed'''
+        if self.injecting or self.player is None or not frame.isValid():
+            return
+        previous, self.shown = self.shown, frame.startTime()
+        if frame.endTime() > frame.startTime():
+            self.frame_us = frame.endTime() - frame.startTime()
+        playing = self.player.playbackState() == QMediaPlayer.PlayingState
+        # frames on the GPU are read back only when needed: inside the loop, or while stepping
+        if frame.handleType() == QVideoFrame.NoHandle or not playing \
+           or self.b is not None and self.a*1000 <= self.shown <= self.b*1000:
+            cached = own_frame(frame)
+            if cached is not None:
+                self.cache.add(cached)
+        if self.b is not None and previous < self.b*1000 <= self.shown and playing:
+            self.__loop()
+
+    def __position_changed(self,pos):
+        '''Loop when B is crossed by a file without video'''
+        if self.b is not None and not self.player.hasVideo() and pos >= self.b:
+            self.player.seeker.seek(self.a)
+
+    def __loop(self):
+        if self.__silent() and self.cache.covers(self.a*1000,self.b*1000):
+            self.player.pause()
+            self.replaying = True
+            self.__replay(self.cache.at(self.a*1000))
+        else:
+            frame = self.cache.at(self.a*1000)
+            if frame is not None:
+                self.__show(frame)
+            self.player.seeker.seek(self.a)
+
+    def __replay(self,frame):
+        self.__show(frame)
+        duration = (frame.endTime() - frame.startTime() if frame.endTime() > frame.startTime() else self.frame_us)/1000.0
+        self.timer.start(max(1,round(duration/max(0.01,self.player.playbackRate()))))
+
+    def __replay_next(self):
+        if not self.replaying:
+            return
+        frame = self.cache.after(self.shown)
+        if frame is None or frame.startTime() >= self.b*1000:
+            if not self.__silent() or not self.cache.covers(self.a*1000,self.b*1000):
+                # audio back on, or frames dropped: the player takes over from A
+                self.replaying = False
+                self.player.seeker.seek(self.a)
+                self.player.play()
+                return
+            frame = self.cache.at(self.a*1000)
+        self.__replay(frame)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we have the class:
+    SelectLanguage -> window for selecting a given language
+
+'''
+
+from PySide6.QtWidgets import *
+from PySide6.QtGui import *
+from PySide6 import QtCore
+
+class SelectLanguage(QDialog):
+    '''This class is for displaying the window for selecting a language
+    
+    Attributes:
+        language (str): selected language to translate words
+        config (dict): dictionary containing the current configuration
+    '''
+    def __init__(self,language,config):
+        '''Class initialization
+        
+        Parameters:
+            language (str): selected language to translate words
+            config (dict): dictionary containing the current configuration
+        '''
+        super().__init__()
+        self.language = language
+        self.config = config
+
+        self.language.bind(self,"windowTitle","language")
+        self.setFixedWidth(180)
+        self.setFixedHeight(160)
+
+        main_layout = QVBoxLayout()
+        list_layout = QVBoxLayout()
+        for el in self.language.list_languages:
+            w = self.button(el)
+            list_layout.addWidget(w)
+
+        self.decision()
+
+        decision_layout = QHBoxLayout()
+        decision_layout.addWidget(self.okay)
+        decision_layout.addWidget(self.canc)
+        main_layout.addLayout(list_layout)
+        main_layout.addLayout(decision_layout)
+
+        self.setLayout(main_layout)
+
+    def button(self,el):
+        '''Button widget for selecting a language
+        
+        Parameters:
+            el (str): selected language
+        '''
+        w = QPushButton()
+        w.clicked.connect(lambda : self.__select(el))
+        w.setCursor(QCursor(QtCore.Qt.PointingHandCursor))
+        self.language.bind(w,"text",el)
+        return w
+    
+    def decision(self):
+        '''Define Ok and Cancel buttons for implementing the language changes or not'''
+        self.okay = QDialogButtonBox(QDialogButtonBox.Ok)
+        self.language.bind(self.okay,"toolTip","okaylingua")
+        self.okay.setCursor(QCursor(QtCore.Qt.PointingHandCursor))
+        self.okay.clicked.connect(self.commit_language_changes)
+
+        self.canc = QDialogButtonBox(QDialogButtonBox.Cancel)
+        self.language.bind(self.canc,"toolTip","canclingua")
+        self.canc.setCursor(QCursor(QtCore.Qt.PointingHandCursor))
+        self.canc.clicked.connect(self.back_previous_language)
+
+    def back_previous_language(self):
+        '''Function activated when button Canc is chosen'''
+        self.language.select(self.language.old_selected)
+        self.config["language"] = self.language.selected
+        self.updateLanguage(self.language.old_selected)
+        self.close()
+
+    def commit_language_changes(self):
+        '''Function activated when button Ok is chosen'''
+        self.close()
+
+    def __select(self,el):
+        '''Select language el
+        
+        Parameters:
+            el (str): selected language
+        '''
+        self.language.select(el)
+        self.config["language"] = self.language.selected
+        self.updateLanguage(el)
+
+    def updateLanguage(self,el):
+        '''Update language of the widgets registered with Language.bind
+        
+        Parameters:
+            el (str): selected language
+        '''
+        self.language.retranslate()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we have the class:
+    SettingsStore -> configuration dictionary saved in the background when changed
+
+'''
+
+from src.mvars import SETTINGS_DEBOUNCE
+import json
+import os
+import threading
+import time
+
+def write_atomic(filename,text):
+    '''Replace the content of a file so that it is never seen half written
+
+    Parameters:
+        filename (str): file to write
+        text (str): new content of the file
+    '''
+    tmp = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(tmp,'w',encoding='utf8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp,filename)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+class SettingsStore(dict):
+    '''Configuration dictionary saved in the background when changed
+
+    Setting a key only marks it as dirty: a background thread waits
+    SETTINGS_DEBOUNCE seconds from the last change and then writes the
+    whole dictionary with write_atomic(), so the UI never waits on disk.
+
+    Attributes:
+        filename (str): json file of the configuration
+        dirty (set): keys changed and not written yet
+    '''
+    def __init__(self,filename,*arg,**kwarg):
+        '''Class initialization
+
+        Parameters:
+            filename (str): json file of the configuration
+            arg, kwarg: initial content, as for dict
+        '''
+        super().__init__(*arg,**kwarg)
+        self.filename = filename
+        self.dirty = set()
+        self.last_change = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.writer = threading.Thread(target=self.__write_loop,name="settings-writer",daemon=True)
+        self.writer.start()
+
+    def __setitem__(self,key,value):
+        with self.condition:
+            if key in self and self[key] == value:
+                return
+            super().__setitem__(key,value)
+            self.dirty.add(key)
+            self.last_change = time.monotonic()
+            self.condition.notify()
+
+    def __delitem__(self,key):
+        with self.condition:
+            super().__delitem__(key)
+            self.dirty.add(key)
+            self.last_change = time.monotonic()
+            self.condition.notify()
+
+    def update(self,*arg,**kwarg):
+        for k,v in dict(*arg,**kwarg).items():
+            self[k] = v
+
+    def setdefault(self,key,value=None):
+        if key not in self:
+            self[key] = value
+        return self[key]
+
+    def flush(self):
+        '''Write the dirty keys now, in the calling thread'''
+        with self.condition:
+            if not self.dirty:
+                return
+            dirty, self.dirty = self.dirty, set()
+            text = json.dumps(dict(self),ensure_ascii=False)
+        try:
+            write_atomic(self.filename,text)
+        except OSError:
+            with self.condition: # retry at the next change or after SETTINGS_DEBOUNCE
+                self.dirty |= dirty
+                self.last_change = time.monotonic()
+            raise
+
+    def close(self):
+        '''Stop the background thread and write the dirty keys'''
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.writer.join()
+        self.flush()
+
+    def __write_loop(self):
+        with self.condition:
+            while not self.closed:
+                if not self.dirty:
+                    self.condition.wait()
+                    continue
+                delay = self.last_change + SETTINGS_DEBOUNCE - time.monotonic()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                self.condition.release()
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"Configuration not saved: {e}")
+                finally:
+                    self.condition.acquire()
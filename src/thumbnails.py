@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we define the classes for the scrub preview thumbnails:
+    ThumbnailCache -> LRU cache of thumbnails, in memory and on disk
+    ThumbnailExtractor -> hidden player decoding the frames of the thumbnails
+    ScrubPreview -> popup showing the thumbnail above the timeline slider
+
+'''
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, QUrl, Qt, QEvent, QPoint, Signal
+from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtWidgets import QLabel, QStyle, QVBoxLayout, QWidget
+from PySide6.QtMultimedia import QMediaPlayer, QVideoSink
+from collections import OrderedDict
+from src.loader import SourceLoader
+from src.mvars import THUMBNAIL_WIDTH, THUMBNAIL_STEP, THUMBNAIL_MEMORY_ITEMS, THUMBNAIL_IDENTITY_ITEMS, THUMBNAIL_CACHE_SIZE
+import hashlib
+import os
+import threading
+
+class _Signals(QObject):
+    '''Signals emitted by the tasks of the thread pool'''
+    loaded = Signal(str,QImage) # key, thumbnail (null if missing)
+    scaled = Signal(str,QImage) # key, thumbnail (null if the frame cannot be converted)
+
+class _DiskTask(QRunnable):
+    '''Run a function of the cache in the thread pool'''
+    def __init__(self,function,*args):
+        super().__init__()
+        self.function = function
+        self.args = args
+
+    def run(self):
+        self.function(*self.args)
+
+class ThumbnailCache(QObject):
+    '''LRU cache of thumbnails, kept in memory and in a size-bounded disk folder
+
+    The keys are built from the identity of the file (path, size and
+    modification time) and the timestamp rounded to THUMBNAIL_STEP. The
+    identities of the latest THUMBNAIL_IDENTITY_ITEMS files are kept, and
+    read again with forget() when a file is loaded anew.
+    On disk the least recently used thumbnails are removed when the
+    folder exceeds THUMBNAIL_CACHE_SIZE bytes.
+
+    Attributes:
+        folder (str): folder of the thumbnails on disk
+        hits (int): thumbnails found in memory or on disk
+        misses (int): thumbnails to extract
+    '''
+    loaded = Signal(str,QImage) # key, thumbnail
+
+    def __init__(self,folder):
+        '''Class initialization
+
+        Parameters:
+            folder (str): folder of the thumbnails on disk
+        '''
+        super().__init__()
+        self.folder = folder
+        self.memory = OrderedDict()
+        self.identities = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.index = None # file name -> (size, last use), read at the first disk access
+        self.signals = _Signals()
+        self.signals.loaded.connect(self.__loaded)
+
+    def key(self,path,ms):
+        '''Key of the thumbnail of a file at a given time
+
+        Parameters:
+            path (str): media file
+            ms (int): time in milliseconds
+        Returns:
+            tuple: key and time of the thumbnail, rounded to THUMBNAIL_STEP
+        '''
+        if path not in self.identities:
+            st = os.stat(path)
+            self.identities[path] = f"{os.path.realpath(path)}|{st.st_size}|{st.st_mtime_ns}"
+            while len(self.identities) > THUMBNAIL_IDENTITY_ITEMS:
+                self.identities.popitem(last=False)
+        self.identities.move_to_end(path)
+        ms = int(round(ms/THUMBNAIL_STEP))*THUMBNAIL_STEP
+        return hashlib.sha1(f"{self.identities[path]}|{ms}".encode()).hexdigest(), ms
+
+    def forget(self,path):
+        '''Read the identity of a file again at its next key, e.g. after it was replaced
+
+        Parameters:
+            path (str): media file
+        '''
+        self.identities.pop(path,None)
+
+    def get(self,key):
+        '''Thumbnail kept in memory, None if missing
+
+        Parameters:
+            key (str): key of the thumbnail
+        '''
+        image = self.memory.get(key)
+        if image is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+        return image
+
+    def load(self,key):
+        '''Read a thumbnail from disk in the thread pool, emitting loaded (with a null image if missing)
+
+        Parameters:
+            key (str): key of the thumbnail
+        '''
+        QThreadPool.globalInstance().start(_DiskTask(self.__read,key))
+
+    def put(self,key,image):
+        '''Store a thumbnail in memory and, from the thread pool, on disk
+
+        Parameters:
+            key (str): key of the thumbnail
+            image (QImage): thumbnail
+        '''
+        self.__remember(key,image)
+        QThreadPool.globalInstance().start(_DiskTask(self.__write,key,image))
+
+    def __remember(self,key,image):
+        self.memory[key] = image
+        self.memory.move_to_end(key)
+        while len(self.memory) > THUMBNAIL_MEMORY_ITEMS:
+            self.memory.popitem(last=False)
+
+    def __loaded(self,key,image):
+        if image.isNull():
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.__remember(key,image)
+        self.loaded.emit(key,image)
+
+    def __file(self,key):
+        return os.path.join(self.folder,key+".jpg")
+
+    def __read_index(self):
+        '''Scan the folder once, the index is then kept up to date'''
+        if self.index is None:
+            os.makedirs(self.folder,exist_ok=True)
+            self.index = {}
+            for entry in os.scandir(self.folder):
+                if entry.name.endswith(".jpg"):
+                    st = entry.stat()
+                    self.index[entry.name] = (st.st_size,st.st_mtime)
+
+    def __read(self,key):
+        image = QImage()
+        filename = self.__file(key)
+        name = os.path.basename(filename)
+        with self.lock:
+            try:
+                self.__read_index()
+                if name in self.index and image.load(filename):
+                    os.utime(filename) # last use, for the LRU eviction
+                    self.index[name] = (self.index[name][0],os.stat(filename).st_mtime)
+            except OSError:
+                image = QImage()
+        self.signals.loaded.emit(key,image)
+
+    def __write(self,key,image):
+        filename = self.__file(key)
+        with self.lock:
+            try:
+                self.__read_index()
+                if image.save(filename,"JPG",80):
+                    st = os.stat(filename)
+                    self.index[os.path.basename(filename)] = (st.st_size,st.st_mtime)
+                    self.__evict()
+            except OSError:
+                pass
+
+    def __evict(self):
+        total = sum(size for size,_ in self.index.values())
+        if total <= THUMBNAIL_CACHE_SIZE:
+            return
+        for name,(size,_) in sorted(self.index.items(),key=lambda item: item[1][1]):
+            try:
+                os.remove(os.path.join(self.folder,name))
+            except OSError:
+                pass
+            del self.index[name]
+            total -= size
+            if total <= THUMBNAIL_CACHE_SIZE:
+                break
+
+class _ScaleTask(QRunnable):
+    '''Convert a video frame to a thumbnail in the thread pool'''
+    def __init__(self,key,frame,signals):
+        super().__init__()
+        self.key = key
+        self.frame = frame
+        self.signals = signals
+
+    def run(self):
+        image = self.frame.toImage()
+        if not image.isNull():
+            image = image.scaledToWidth(THUMBNAIL_WIDTH,Qt.SmoothTransformation)
+        self.signals.scaled.emit(self.key,image)
+
+class ThumbnailExtractor(QObject):
+    '''Hidden player seeking to the requested times and feeding a QVideoSink
+
+    Only one request is served at a time: the newest request replaces the
+    waiting one. The frames are scaled to thumbnails in the thread pool.
+    Each request ends with ready, or with dropped when it is replaced,
+    the file cannot be played or no frame comes in time.
+    '''
+    ready = Signal(str,QImage) # key, thumbnail (null if the frame cannot be converted)
+    dropped = Signal(str) # key of a request given up
+
+    def __init__(self):
+        '''Class initialization'''
+        super().__init__()
+        self.player = QMediaPlayer(self)
+        self.sink = QVideoSink(self)
+        self.player.setVideoOutput(self.sink)
+        self.player.mediaStatusChanged.connect(self.__status_changed)
+        self.sink.videoFrameChanged.connect(self.__frame)
+        self.signals = _Signals()
+        self.signals.scaled.connect(self.ready)
+        self.source = None
+        self.current = None # (key, path, ms)
+        self.pending = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.__give_up)
+
+    def request(self,key,path,ms):
+        '''Ask for the thumbnail of a file at a given time
+
+        Parameters:
+            key (str): key of the thumbnail
+            path (str): media file
+            ms (int): time in milliseconds
+        '''
+        if self.current is not None:
+            if self.pending is not None:
+                self.dropped.emit(self.pending[0])
+            self.pending = (key,path,ms)
+        else:
+            self.__start((key,path,ms))
+
+    def __start(self,request):
+        self.current = request
+        key, path, ms = request
+        self.timer.start(2000) # give up on frames never delivered
+        if path != self.source:
+            self.source = path
+            self.player.setSource(QUrl.fromLocalFile(path))
+        elif self.player.mediaStatus() in (QMediaPlayer.LoadedMedia,QMediaPlayer.BufferedMedia,QMediaPlayer.EndOfMedia):
+            self.player.setPosition(ms)
+
+    def __status_changed(self,status):
+        if status == QMediaPlayer.LoadedMedia and self.current is not None:
+            self.player.pause()
+            self.player.setPosition(self.current[2])
+        elif status == QMediaPlayer.InvalidMedia:
+            self.__give_up()
+
+    def __frame(self,frame):
+        if self.current is None or not frame.isValid():
+            return
+        key, path, ms = self.current
+        if frame.startTime() >= 0 and abs(frame.startTime()/1000.0 - ms) > THUMBNAIL_STEP:
+            return # frame decoded before the seek
+        QThreadPool.globalInstance().start(_ScaleTask(key,frame,self.signals))
+        self.__next()
+
+    def __give_up(self):
+        if self.current is not None:
+            self.dropped.emit(self.current[0])
+        self.__next()
+
+    def __next(self):
+        self.timer.stop()
+        self.current = None
+        if self.pending is not None:
+            request, self.pending = self.pending, None
+            self.__start(request)
+
+class ScrubPreview(QWidget):
+    '''Popup showing the thumbnail and the time of the hovered or dragged position of a timeline slider
+
+    Attributes:
+        cache (ThumbnailCache): cache of the thumbnails
+        extractor (ThumbnailExtractor): extractor of the missing thumbnails
+    '''
+    def __init__(self,cache):
+        '''Class initialization
+
+        Parameters:
+            cache (ThumbnailCache): cache of the thumbnails
+        '''
+        super().__init__(None,Qt.ToolTip | Qt.FramelessWindowHint)
+        self.cache = cache
+        self.extractor = ThumbnailExtractor()
+        self.players = {} # bar -> MediaPlayer
+        self.requested = set() # keys being loaded or extracted
+        self.pending_request = None
+        self.shown_key = None
+        self.image = QLabel()
+        self.image.setAlignment(Qt.AlignHCenter)
+        self.time = QLabel()
+        self.time.setAlignment(Qt.AlignHCenter)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(2,2,2,2)
+        layout.setSpacing(0)
+        layout.addWidget(self.image)
+        layout.addWidget(self.time)
+        self.setLayout(layout)
+        self.cache.loaded.connect(self.__loaded)
+        self.extractor.ready.connect(self.__extracted)
+        self.extractor.dropped.connect(self.requested.discard)
+
+    def attach(self,player):
+        '''Show the preview for the timeline slider of a player
+
+        Parameters:
+            player (MediaPlayer): player owning the slider
+        '''
+        self.players[player.bar] = player
+        player.bar.setMouseTracking(True)
+        player.bar.installEventFilter(self)
+        player.bar.sliderMoved.connect(lambda v,player=player: self.showAt(player,v))
+        player.bar.sliderReleased.connect(self.hide)
+        player.loader.stateChanged.connect(self.__loader_state)
+
+    def eventFilter(self,obj,event):
+        '''Follow the mouse over the attached sliders'''
+        if obj in self.players:
+            if event.type() == QEvent.MouseMove and not obj.isSliderDown():
+                ms = QStyle.sliderValueFromPosition(obj.minimum(),obj.maximum(),int(event.position().x()),obj.width())
+                self.showAt(self.players[obj],ms)
+            elif event.type() == QEvent.Leave and not obj.isSliderDown():
+                self.hide()
+        return False
+
+    def showAt(self,player,ms):
+        '''Show the preview of a player at a given time
+
+        Parameters:
+            player (MediaPlayer): player owning the slider
+            ms (int): time in milliseconds
+        '''
+        path = player.loader.path
+        if not path or not player.hasVideo() or player.duration() <= 0:
+            return
+        try:
+            key, ms = self.cache.key(path,ms)
+        except OSError:
+            return
+        changed, self.shown_key = key != self.shown_key, key
+        self.time.setText(player.convertDuration(ms)[0])
+        image = self.cache.get(key)
+        if image is not None:
+            self.image.setPixmap(QPixmap.fromImage(image))
+        elif changed:
+            self.image.clear() # no frame of another time under the new label
+        if image is None and key not in self.requested:
+            self.requested.add(key)
+            self.pending_request = (key,path,ms)
+            self.cache.load(key)
+        bar = player.bar
+        x = QStyle.sliderPositionFromValue(bar.minimum(),bar.maximum(),ms,bar.width())
+        self.adjustSize()
+        self.move(bar.mapToGlobal(QPoint(x - self.width()//2,-self.height())))
+        self.show()
+
+    def __loader_state(self,state,path):
+        if state == SourceLoader.Loaded and path:
+            self.cache.forget(path) # the file may have been replaced since its latest load
+
+    def __loaded(self,key,image):
+        if image.isNull():
+            if self.pending_request and self.pending_request[0] == key:
+                self.extractor.request(*self.pending_request)
+            else:
+                self.requested.discard(key)
+        else:
+            self.requested.discard(key)
+            self.__display(key,image)
+
+    def __extracted(self,key,image):
+        self.requested.discard(key)
+        if image.isNull():
+            return
+        self.cache.put(key,image)
+        self.__display(key,image)
+
+    def __display(self,key,image):
+        if key == self.shown_key:
+            self.image.setPixmap(QPixmap.fromImage(image))
+            self.adjustSize()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+Trace of the startup of the application: each step is marked with the time
+elapsed since the interpreter started importing the application.
+
+'''
+
+import sys
+import threading
+import time
+
+class StartupTrace:
+    '''Collect the time of the startup steps
+
+    Attributes:
+        enabled (bool): print the report when asked
+        t0 (float): reference time of the trace
+        marks (list): list of (time, thread name, label)
+    '''
+    def __init__(self):
+        self.enabled = False
+        self.t0 = time.perf_counter()
+        self.marks = []
+        self.lock = threading.Lock()
+
+    def mark(self,label):
+        '''Mark the end of a startup step
+
+        Parameters:
+            label (str): description of the step
+        '''
+        with self.lock:
+            self.marks.append((time.perf_counter(),threading.current_thread().name,label))
+
+    def report(self,stream=None):
+        '''Print the steps with their absolute and relative time in milliseconds
+
+        Parameters:
+            stream (file): where to print the report, stderr by default
+        '''
+        if not self.enabled:
+            return
+        stream = stream if stream else sys.stderr
+        with self.lock:
+            marks = sorted(self.marks)
+        previous = {}
+        print("Startup trace (ms since start, ms since previous step of the same thread):",file=stream)
+        for t,thread,label in marks:
+            delta = (t - previous.get(thread,self.t0))*1000.0
+            previous[thread] = t
+            print(f"{(t-self.t0)*1000.0:9.2f} {delta:+9.2f}  [{thread}] {label}",file=stream)
+
+trace = StartupTrace()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we have the class:
+    RateController -> playback rate of the playing file, with trick play above the rates of the backend
+
+'''
+
+from PySide6.QtCore import QObject, QTimer, Signal
+from PySide6.QtMultimedia import QMediaPlayer
+from src.mvars import PLAYBACK_RATES, TRICK_RATES, TRICK_INTERVAL
+
+class RateController(QObject):
+    '''Playback rate of the playing file
+
+    Up to the largest of PLAYBACK_RATES the rate is given to the backend,
+    asking for pitch compensation where Qt provides it. Above that the
+    player is paused and every TRICK_INTERVAL ms of wall clock it seeks
+    forward by rate times the interval: only the frames shown are decoded,
+    and the SeekController keeps at most one seek in flight, dropping the
+    targets the decoder cannot keep up with.
+
+    Attributes:
+        player (MediaPlayer): player following the rate
+        rate (float): current rate
+        playing (bool): the playback is running, as seen by the user
+    '''
+    rateChanged = Signal(float)
+
+    def __init__(self):
+        super().__init__()
+        self.player = None
+        self.rate = 1.0
+        self.playing = False
+        self.rates = sorted(set(PLAYBACK_RATES) | set(TRICK_RATES))
+        self.timer = QTimer(self)
+        self.timer.setInterval(TRICK_INTERVAL)
+        self.timer.timeout.connect(self.__tick)
+
+    def setPlayer(self,player):
+        '''Follow a new player, e.g. the one taking over the outputs, keeping the rate
+
+        Parameters:
+            player (MediaPlayer): player to follow
+        '''
+        self.timer.stop()
+        self.player = player
+        self.__apply()
+
+    def isTrick(self):
+        '''Check if the rate is above the rates given to the backend'''
+        return self.rate > max(PLAYBACK_RATES)
+
+    def setRate(self,rate):
+        '''Set the playback rate
+
+        Parameters:
+            rate (float): rate between the smallest of PLAYBACK_RATES and the largest of TRICK_RATES
+        '''
+        rate = min(max(rate,self.rates[0]),self.rates[-1])
+        if rate != self.rate:
+            self.rate = rate
+            self.__apply()
+            self.rateChanged.emit(rate)
+
+    def faster(self):
+        '''Move to the next rate'''
+        self.setRate(next((r for r in self.rates if r > self.rate),self.rates[-1]))
+
+    def slower(self):
+        '''Move to the previous rate'''
+        self.setRate(next((r for r in reversed(self.rates) if r < self.rate),self.rates[0]))
+
+    def setPlaying(self,playing):
+        '''Notify that the playback was started or paused by the user
+
+        Parameters:
+            playing (bool): the playback is running
+        '''
+        self.playing = playing
+        self.__apply()
+
+    def __apply(self):
+        if self.player is None:
+            return
+        if self.isTrick():
+            self.player.setPlaybackRate(1.0)
+            if self.playing:
+                if self.player.playbackState() == QMediaPlayer.PlayingState:
+                    self.player.pause()
+                if not self.timer.isActive():
+                    self.timer.start()
+            else:
+                self.timer.stop()
+            return
+        scanning = self.timer.isActive()
+        self.timer.stop()
+        if hasattr(self.player,"setPitchCompensation"): # Qt 6.10
+            self.player.setPitchCompensation(True)
+        self.player.setPlaybackRate(self.rate)
+        if scanning and self.playing:
+            self.player.play()
+
+    def __tick(self):
+        target = self.player.seeker.target() + int(self.rate*TRICK_INTERVAL)
+        if 0 < self.player.duration() <= target:
+            self.setRate(1.0) # the end is played normally, so that the queue moves on
+        else:
+            self.player.seeker.seek(target)
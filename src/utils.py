@@ -12,13 +12,31 @@ Functions for managing path across different operating systems
 '''
 
 import json
+import os
 
 def get_past_settings(path):
     ''' Get the past settings saved on the previous application usage
 
+    A missing or unreadable configuration gives the defaults of the first
+    start (Path.default_config); an unreadable one is kept aside as
+    config.json.corrupt.
+
     Returns:
         dict: dictionary of previous settings.
     '''
-    with open(path.expand('rw_files','config','config.json'),'r') as f:
-        latest_config = json.load(f)
+    filename = path.expand('rw_files','config','config.json')
+    try:
+        with open(filename,'r',encoding='utf8') as f:
+            latest_config = json.load(f)
+        if not isinstance(latest_config,dict):
+            raise ValueError("not a json object")
+    except FileNotFoundError:
+        return path.default_config()
+    except (OSError,ValueError) as e:
+        print(f"Configuration {filename} not readable, starting from the default settings: {e}")
+        try:
+            os.replace(filename,filename+'.corrupt')
+        except OSError:
+            pass
+        return path.default_config()
     return latest_config
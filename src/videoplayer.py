@@ -22,9 +22,23 @@ from PySide6.QtGui import *
 from PySide6.QtCore import *
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput, QAudio
 from PySide6.QtMultimediaWidgets import QVideoWidget
+from src.loader import SourceLoader
+from src.gapless import GaplessEngine
+from src.refresh import RefreshScheduler
+from src.seek import SeekController
+from src.thumbnails import ThumbnailCache, ScrubPreview
+from src.resume import ResumeStore
+from src.assets import AssetCache
+from src.health import PlaybackHealth, HealthOverlay
+from src.readahead import ReadAheadDevice, is_network_path
+from src.waveform import WaveformCache, WaveformSlider
+from src.loudness import LoudnessCache, track_gain
+from src.segment import SegmentController
+from src.trickplay import RateController
+from src.mvars import SEEK_STEP, SEEK_LONG_STEP, RESUME_INTERVAL
 import sys
+import time
 
-fmt = 'svg' if sys.platform=="linux" or sys.platform=="linux2" else "png"
 dim = 28
 
 class MediaPlayer(QMediaPlayer):
@@ -34,13 +48,25 @@ class MediaPlayer(QMediaPlayer):
 
         # Status bar widgets
         self.current_time = QLabel() # display the current time
-        self.bar =  QSlider(Qt.Horizontal) # status bar time video
+        self.bar =  WaveformSlider(Qt.Horizontal) # status bar time video, with the waveform of music files
         self.total_time = QLabel() # total time 
         self.tot_time=("--:--:--",0)
+        self.__last_second = None # cache of convertDuration
+        self.__last_text = None
         self.__default_button_style()
         self.slider_pressed = False
         self.slider_moving = False
-        self.slider_changed = False
+        self.__update_duration_check = False
+        self.seeker = SeekController(self)
+        self.pending_position = 0
+        self.refresh = RefreshScheduler(self.__apply_position,self.current_time)
+        self.loader = SourceLoader(self)
+        self.loader.sourceReady.connect(self.__source_ready)
+        self.source_mode = "file" # "file", "readahead" or "auto" (read-ahead for network files)
+        self.device = None
+        self.loader.stateChanged.connect(self.load_state_changed)
+        self.mediaStatusChanged.connect(self.__loading_status)
+        self.errorOccurred.connect(self.__loading_error)
         self.sourceChanged.connect(self.source_changed)
         self.durationChanged.connect(self.__update_duration)
         self.positionChanged.connect(self.__update_position)
@@ -48,99 +74,154 @@ class MediaPlayer(QMediaPlayer):
     def source_changed(self,media):
         '''Notify the media change and print the media location'''
         print(f"Media has been changed in {media}")
+        if media.isEmpty() and self.device is not None:
+            self.device.close()
+            self.device = None
+
+    def __source_ready(self,url):
+        '''Give the validated file to the backend, through a read-ahead device if enabled
+
+        Parameters:
+            url (QUrl): url of the validated file
+        '''
+        path = url.toLocalFile()
+        if self.source_mode == "readahead" or (self.source_mode == "auto" and is_network_path(path)):
+            try:
+                device = ReadAheadDevice(path)
+            except OSError as e:
+                self.loader.setFailed(str(e))
+                return
+            old, self.device = self.device, device
+            device.open(QIODevice.ReadOnly)
+            self.setSourceDevice(device,url)
+            if old is not None:
+                old.close()
+        else:
+            self.setSource(url)
+
+    def readAheadFill(self):
+        '''Fill level of the read-ahead buffer, None when the file is read directly'''
+        return self.device.fillLevel() if self.device is not None else None
+
+    def load_state_changed(self,state,path):
+        '''Notify the load state of the requested media'''
+        print(f"Loading {path}: {state}")
 
     def MysetSource(self,x):
         '''Set the new file source to be played
+
+        The old source is released at once, while the new file is validated
+        by self.loader off the GUI thread, which then hands its url to setSource.
         
         Parameters:
             x (str): source file location
         '''
-        self.thread().sleep(1)
-        self.setSource(QUrl.fromLocalFile(x))
         self.__update_duration_check = False
+        self.setSource(QUrl())
+        self.loader.load(x)
+
+    def __loading_status(self,status):
+        '''Forward the media status to the loader'''
+        if status == QMediaPlayer.LoadedMedia:
+            self.loader.setLoaded()
+        elif status == QMediaPlayer.InvalidMedia:
+            self.loader.setFailed(self.errorString())
+
+    def __loading_error(self,error,error_string):
+        '''Forward the player errors to the loader'''
+        self.loader.setFailed(error_string)
 
     def __update_duration(self):
-        '''Extract the duration of the video/music'''
+        '''Extract the duration of the video/music, which sets the range of the bar slider in milliseconds'''
         if not self.__update_duration_check:
             self.__update_duration_check = True
             self.tot_time = self.convertDuration(self.duration())
             self.total_time.setText(self.tot_time[0])
-            self.total_time.repaint()
+            self.bar.setMaximum(max(0,self.tot_time[1]))
+
+    def __show_time(self,ms_pos):
+        '''Show a position in the time label
+
+        Parameters:
+            ms_pos (int): position in milliseconds
+        '''
+        self.new_pos = self.convertDuration(ms_pos)
+        self.current_time.setText(self.new_pos[0])
 
     def __slider_pressed(self):
         '''Set the new slider position'''
         self.slider_pressed = True
-        ms_pos = int(self.tot_time[1]*(self.bar.value()/100.0))
-        self.new_pos = self.convertDuration(ms_pos)
-        self.current_time.setText(self.new_pos[0])
-        self.current_time.repaint()
-        self.setPosition(ms_pos)
+        self.__show_time(self.bar.value())
+        self.seeker.seek(self.bar.value())
     
     def __slider_moved(self,v):
-        '''Notify that the slider has been moved and update the time
+        '''Notify that the slider has been moved, update the time and seek
         
         Parameters:
-            v (float): position of the slider as percentage 
+            v (int): position of the slider in milliseconds
         '''
         self.slider_moving = True
-        ms_pos = int(self.tot_time[1]*(v/100.0))
-        self.new_pos = self.convertDuration(ms_pos)
-        self.current_time.setText(self.new_pos[0])
-        self.current_time.repaint()
+        self.__show_time(v)
+        self.seeker.seek(v)
 
     def __slider_released(self):
         '''Set the new slider position'''
-        ms_pos = int(self.tot_time[1]*(self.bar.value()/100.0))
-        self.new_pos = self.convertDuration(ms_pos)
-        self.current_time.setText(self.new_pos[0])
-        self.current_time.repaint()
-        self.setPosition(ms_pos)
+        self.__show_time(self.bar.value())
+        self.seeker.seek(self.bar.value())
         self.slider_pressed = False
         self.slider_moving = False
 
-    def __slider_changed(self,v):
-        '''Notify that slider has been changed by a large step
+    def __slider_action(self,action):
+        '''Seek when the slider is moved by a click on its groove or by the keyboard
         
         Parameters:
-            v (float): position of the slider as percentage 
+            action (QAbstractSlider.SliderAction): action triggered on the slider
         '''
-        try:
-            pos = 100*self.position()/self.tot_time[1]
-            if abs(v - pos) > 9:
-                self.slider_changed = True
-            else:
-                self.slider_changed = False
-        except:
-            pass
-
-    def __update_position(self):
-        '''Update position of the video and change the bar slider accordingly'''
-        if not self.slider_moving: 
-            if not self.slider_pressed:
-                self.new_pos = self.convertDuration(self.position())
-                self.current_time.setText(self.new_pos[0])
-                self.current_time.repaint()
-                if self.__update_duration_check:
-                    if not self.slider_changed:
-                        self.bar.setValue(100*self.new_pos[1]/self.tot_time[1])
-                        self.bar.repaint()
-                        self.slider_changed = False
-                    else:
-                        ms_pos = int(self.tot_time[1]*(self.bar.value()/100.0))
-                        self.setPosition(ms_pos)
-                        self.slider_changed = False
+        if action not in (QAbstractSlider.SliderNoAction,QAbstractSlider.SliderMove):
+            self.__show_time(self.bar.sliderPosition())
+            self.seeker.seek(self.bar.sliderPosition())
+
+    def showPosition(self,pos):
+        '''Show a position in the time label and the bar slider, e.g. of a frame shown without the player
+
+        Parameters:
+            pos (int): position in milliseconds
+        '''
+        self.__update_position(pos)
+
+    def __update_position(self,pos):
+        '''Store the new position of the video, the widgets are updated by self.refresh
+        
+        Parameters:
+            pos (int): position in milliseconds
+        '''
+        self.pending_position = pos
+        self.refresh.request()
+
+    def __apply_position(self):
+        '''Update the time label and the bar slider with the latest position'''
+        if not self.slider_moving and not self.slider_pressed and not self.seeker.isSeeking():
+            self.__show_time(self.pending_position)
+            if self.__update_duration_check:
+                self.bar.setValue(self.pending_position)
 
     def convertDuration(self,ms):
         '''Convert duration in milliseconds in hh:mm:ss notation
+
+        The text of the latest converted second is reused.
         
         Parameters:
             ms (float): duration in milliseconds
         '''
         stot = int(ms/1000.0)
+        if stot == self.__last_second:
+            return (self.__last_text,ms)
         s = int(stot%60)
         m = int((stot - s)/60)%60
         h = int((stot - s - m*60)/(60*60))
-        return (f"{h:02d}:{m:02d}:{s:02d}",ms)
+        self.__last_second = stot
+        self.__last_text = f"{h:02d}:{m:02d}:{s:02d}"
+        return (self.__last_text,ms)
 
     def __default_button_style(self):
         '''Setup styles of the buttons'''
@@ -156,14 +237,15 @@ class MediaPlayer(QMediaPlayer):
         # self.bar slider
         self.bar.setFixedHeight(dim)
         self.bar.setCursor(QCursor(Qt.PointingHandCursor))
-        self.bar.setTickInterval(10)
         self.bar.setMinimum(0)
-        self.bar.setMaximum(100)
+        self.bar.setMaximum(0) # set to the duration in milliseconds
+        self.bar.setSingleStep(SEEK_STEP)
+        self.bar.setPageStep(SEEK_LONG_STEP)
         self.bar.setValue(0)
         self.bar.sliderReleased.connect(self.__slider_released)
         self.bar.sliderPressed.connect(self.__slider_pressed)
         self.bar.sliderMoved.connect(self.__slider_moved)
-        self.bar.valueChanged.connect(self.__slider_changed)
+        self.bar.actionTriggered.connect(self.__slider_action)
 
         # self.total_time label
         self.total_time.setFixedHeight(dim)
@@ -183,7 +265,9 @@ class VideoPlayer(QWidget):
             containing the dictionary
     
     '''
-    def __init__(self,arg,config,language,path):
+    mediaChanged = Signal(str) # file played after a gapless swap
+
+    def __init__(self,arg,config,language,path,assets=None):
         '''Class initialization
         
         Parameters:
@@ -191,12 +275,14 @@ class VideoPlayer(QWidget):
             config (dict): dictionary of the current configuration
             language (Language): variable of type class Language in src/language.py 
                 containing the dictionary
+            assets (AssetCache): icons shared with the main window, a new cache if None
         '''
         super().__init__()
         self.arg = arg
         self.new_config = config
         self.lang = language
         self.path = path
+        self.assets = assets if assets is not None else AssetCache(self.path.expand('r_files','data','media'))
         
         # Main layout
         self.lvideo = QVBoxLayout()
@@ -206,20 +292,48 @@ class VideoPlayer(QWidget):
         # Widget of the video
         self.videoWidget = QVideoWidget()
         self.audioOutput = QAudioOutput()
-        self.mediaPlayer = MediaPlayer()
-        self.mediaPlayer.setAudioOutput(self.audioOutput)
-        self.mediaPlayer.setVideoOutput(self.videoWidget)
-        self.mediaPlayer.mediaStatusChanged.connect(self.__media_status_changed)
+        self.engine = GaplessEngine((MediaPlayer(),MediaPlayer()),self.videoWidget,self.audioOutput)
+        self.engine.swapped.connect(self.__media_swapped)
+        self.engine.finished.connect(self.__media_finished)
+        self.mediaPlayer = self.engine.active
+        self.health = PlaybackHealth(self.videoWidget.videoSink())
+        self.health.setPlayer(self.mediaPlayer)
+        self.health_overlay = HealthOverlay(self.health,self.videoWidget)
+        self.segments = SegmentController(self.videoWidget.videoSink())
+        self.segments.setPlayer(self.mediaPlayer)
+        self.segments.loopChanged.connect(lambda start,end: self.mediaPlayer.bar.setLoop(start,end))
+        self.segments.frameShown.connect(lambda pos: self.mediaPlayer.showPosition(pos))
+        self.rates = RateController()
+        self.rates.setPlayer(self.mediaPlayer)
+        self.rates.rateChanged.connect(self.__rate_changed)
+        self.preview = ScrubPreview(ThumbnailCache(self.path.cache_dir("thumbnails")))
+        self.preview.attach(self.engine.active)
+        self.preview.attach(self.engine.standby)
+        self.resume = ResumeStore(self.path.expand('rw_files','config','resume.sqlite'))
+        self.last_resume_update = 0
+        self.waveforms = WaveformCache(self.path.cache_dir("waveforms"))
+        self.waveforms.ready.connect(self.__waveform_ready)
+        self.normalize = self.new_config.get('normalize',True) # loudness normalization of the played files
+        self.track_gain = 1.0
+        self.loudness = LoudnessCache(self.path.cache_dir("loudness"))
+        self.loudness.ready.connect(self.__loudness_ready)
+        for player in (self.engine.active,self.engine.standby):
+            player.source_mode = self.new_config.get('source_mode') or "file"
+            player.loader.resume = self.resume
+            player.loader.stateChanged.connect(lambda state,path,player=player: self.__resume_position(player,state))
+            player.loader.stateChanged.connect(lambda state,path,player=player: self.__load_waveform(player,state))
+            player.loader.stateChanged.connect(lambda state,path,player=player: self.__load_loudness(player,state))
+            player.positionChanged.connect(lambda pos,player=player: self.__record_position(player,pos))
         self.check_mediaPlayer=False
         if self.arg:
             try:
-                self.mediaPlayer.MysetSource(self.arg)
+                self.engine.open(self.arg)
             except:
                 pass
 
         # Default volume  
         self.audio_placeholder = self.new_config['volume']
-        self.audioOutput.setVolume(apn(self.audio_placeholder))
+        self.__apply_volume(self.audio_placeholder)
 
         # Control button widgets
         self.player = QPushButton() # play/pause button
@@ -228,15 +342,19 @@ class VideoPlayer(QWidget):
         self.exit_button = QPushButton()
         self.audioplay = QPushButton() # activate or deactivate audio
         self.audiolabel = QLabel()
+        self.rate_label = QLabel() # playback rate, hidden at 1x
+        self.rate_label.hide()
         self.setaudio = QSlider(Qt.Horizontal) # audio slider
         self.fillempty = QLabel() # empty widget
         self.__default_button_style()
+        self.__shortcuts()
 
         # Put all buttons into self.lcontrol layout
         self.lcontrol.addWidget(self.player)
         self.lcontrol.addWidget(self.mediaPlayer.current_time)
         self.lcontrol.addWidget(self.mediaPlayer.bar)
         self.lcontrol.addWidget(self.mediaPlayer.total_time)
+        self.lcontrol.addWidget(self.rate_label)
         self.lcontrol.addWidget(self.restarter)
         self.lcontrol.addWidget(self.audioplay)
         self.lcontrol.addWidget(self.setaudio)
@@ -273,7 +391,7 @@ class VideoPlayer(QWidget):
         self.player.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
         self.player.clicked.connect(self.play)
         self.player.setCursor(QCursor(Qt.PointingHandCursor))
-        self.player.setToolTip(self.lang.fromKey("play1"))
+        self.lang.bind(self.player,"toolTip","play1")
 
         # self.restarter button
         self.restarter.setFixedHeight(dim)
@@ -281,29 +399,29 @@ class VideoPlayer(QWidget):
         self.restarter.setIcon(self.style().standardIcon(QStyle.SP_MediaStop))
         self.restarter.setCursor(QCursor(Qt.PointingHandCursor))
         self.restarter.clicked.connect(self.stop)
-        self.restarter.setToolTip(self.lang.fromKey("stop"))
+        self.lang.bind(self.restarter,"toolTip","stop")
 
         # self.screen_regulator button
         self.screen_regulator.setFixedHeight(dim)
         self.screen_regulator.setFixedWidth(dim)
-        self.screen_regulator.setIcon(QtGui.QIcon(self.path.expand('r_files','data','media',f'full_screen.{fmt}')))
+        self.assets.apply(self.screen_regulator,'full_screen')
         self.screen_regulator.setCursor(QCursor(Qt.PointingHandCursor))
-        self.screen_regulator.setToolTip(self.lang.fromKey("expand"))
+        self.lang.bind(self.screen_regulator,"toolTip","expand")
 
         # self.exit_button button
         self.exit_button.setFixedHeight(dim)
         self.exit_button.setFixedWidth(dim)
-        self.exit_button.setIcon(QtGui.QIcon(self.path.expand('r_files','data','media',f'exit.{fmt}')))
+        self.assets.apply(self.exit_button,'exit')
         self.exit_button.setCursor(QCursor(Qt.PointingHandCursor))
-        self.exit_button.setToolTip(self.lang.fromKey("exit"))
+        self.lang.bind(self.exit_button,"toolTip","exit")
 
         # self.audioplay button for audio on/off
         self.audioplay.setFixedHeight(dim)
         self.audioplay.setFixedWidth(dim)
-        self.audioplay.setIcon(QtGui.QIcon(self.path.expand('r_files','data','media',f'audio_max.{fmt}')))
+        self.assets.apply(self.audioplay,'audio_max')
         self.audioplay.setCursor(QCursor(Qt.PointingHandCursor))
         self.audioplay.clicked.connect(self.__volume)
-        self.audioplay.setToolTip(self.lang.fromKey("audioacceso"))
+        self.lang.bind(self.audioplay,"toolTip","audioacceso")
 
         self.audiolabel.setFixedHeight(dim)
         self.audiolabel.setFixedWidth(4*dim)
@@ -322,18 +440,99 @@ class VideoPlayer(QWidget):
         self.setaudio.setValue(self.audio_placeholder)
         self.setaudio.valueChanged.connect(self.__volumebar)
 
+    def __shortcuts(self):
+        '''Keyboard shortcuts for seeking by steps, stepping by frames and setting the A-B loop'''
+        for key,delta in ((Qt.Key_Right,SEEK_STEP),(Qt.Key_Left,-SEEK_STEP),
+                          (Qt.SHIFT | Qt.Key_Right,SEEK_LONG_STEP),(Qt.SHIFT | Qt.Key_Left,-SEEK_LONG_STEP)):
+            shortcut = QShortcut(QKeySequence(key),self)
+            shortcut.activated.connect(lambda delta=delta: self.mediaPlayer.seeker.step(delta))
+        for key,frames in ((Qt.Key_Period,1),(Qt.Key_Comma,-1)):
+            shortcut = QShortcut(QKeySequence(key),self)
+            shortcut.activated.connect(lambda frames=frames: self.stepFrame(frames))
+        QShortcut(QKeySequence(Qt.Key_L),self).activated.connect(self.segments.cycleLoop)
+        for key,slot in ((Qt.Key_BracketRight,self.rates.faster),(Qt.Key_BracketLeft,self.rates.slower),
+                         (Qt.Key_Backspace,lambda: self.rates.setRate(1.0))):
+            QShortcut(QKeySequence(key),self).activated.connect(slot)
+
+    def stepFrame(self,frames):
+        '''Pause the playback and show the next or the previous frame
+
+        Parameters:
+            frames (int): 1 for the next frame, -1 for the previous one
+        '''
+        if self.check_mediaPlayer:
+            self.play()
+        self.segments.step(frames)
+
     def play(self):
         '''Take care of the play event, when play button is clicked'''
         if self.check_mediaPlayer:
             self.check_mediaPlayer = False
+            self.segments.stopReplay()
             self.mediaPlayer.pause()
+            self.rates.setPlaying(False)
+            self.__record_position(self.mediaPlayer,self.mediaPlayer.position(),True)
             self.player.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
-            self.player.setToolTip(self.lang.fromKey("play1"))
+            self.lang.bind(self.player,"toolTip","play1")
         else:
             self.check_mediaPlayer = True
-            self.mediaPlayer.play()
+            self.segments.sync()
+            if not self.rates.isTrick():
+                self.mediaPlayer.play()
+            self.rates.setPlaying(True)
             self.player.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
-            self.player.setToolTip(self.lang.fromKey("pause"))
+            self.lang.bind(self.player,"toolTip","pause")
+
+    def open(self,x):
+        '''Open a new source file, resetting the play button
+        
+        Parameters:
+            x (str): source file location
+        '''
+        self.check_mediaPlayer = False
+        self.rates.setPlaying(False)
+        self.__record_position(self.mediaPlayer,self.mediaPlayer.position(),True) # the file being left
+        self.player.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
+        self.lang.bind(self.player,"toolTip","play1")
+        self.arg = x
+        self.engine.open(x)
+
+    def enqueue(self,x):
+        '''Append a file to the playing queue, opening it if nothing is loaded
+        
+        Parameters:
+            x (str): source file location
+        '''
+        if self.arg:
+            self.engine.enqueue(x)
+        else:
+            self.open(x)
+
+    def enqueueMany(self,paths):
+        '''Append files to the playing queue, opening the first one if nothing is loaded
+
+        Parameters:
+            paths (list): source file locations
+        '''
+        if paths and not self.arg:
+            self.open(paths[0])
+            paths = paths[1:]
+        self.engine.enqueueMany(paths)
+
+    def playRow(self,row):
+        '''Play a row of the playlist at once
+
+        Parameters:
+            row (int): row of the playlist
+        '''
+        self.check_mediaPlayer = True
+        self.player.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
+        self.lang.bind(self.player,"toolTip","pause")
+        self.__record_position(self.mediaPlayer,self.mediaPlayer.position(),True) # the file being left
+        self.engine.play(row)
+        self.rates.setPlaying(True)
+        self.arg = self.engine.current
+        self.mediaChanged.emit(self.arg)
 
     def stop(self):
         '''Take care of the stop event, when stop button is clicked 
@@ -341,25 +540,28 @@ class VideoPlayer(QWidget):
 
         self.check_mediaPlayer = False
         #if self.mediaPlayer.isPlaying():
+        self.segments.stopReplay()
+        self.rates.setPlaying(False)
         self.mediaPlayer.stop()
+        self.__record_position(self.mediaPlayer,0,True)
         self.player.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay)) 
 
     def __volume(self):
         '''Setup volume'''
         if self.audioOutput.volume():
-            self.audioplay.setIcon(QtGui.QIcon(self.path.expand('r_files','data','media',f'audio_min.{fmt}')))
-            self.audioplay.setToolTip(self.lang.fromKey("audiospento"))
+            if self.assets.apply(self.audioplay,'audio_min'):
+                self.lang.bind(self.audioplay,"toolTip","audiospento")
             self.audioOutput.setVolume(0)
             self.setaudio.setValue(0)
             self.new_config['volume'] = 0
         else:
-            self.audioplay.setIcon(QtGui.QIcon(self.path.expand('r_files','data','media',f'audio_max.{fmt}')))
-            self.audioplay.setToolTip(self.lang.fromKey("audioacceso"))
+            if self.assets.apply(self.audioplay,'audio_max'):
+                self.lang.bind(self.audioplay,"toolTip","audioacceso")
             if self.audio_placeholder:
-                self.audioOutput.setVolume(apn(self.audio_placeholder))
+                self.__apply_volume(self.audio_placeholder)
                 self.setaudio.setValue(self.audio_placeholder)
             else:
-                self.audioOutput.setVolume(50)
+                self.__apply_volume(50)
                 self.setaudio.setValue(50)
             self.setaudio.setValue(self.audio_placeholder)
 
@@ -369,23 +571,114 @@ class VideoPlayer(QWidget):
         self.audiolabel.setText(f"{self.audio_placeholder}%")
         self.audiolabel.setToolTip(f"{self.audio_placeholder}%")
         
-        self.audioOutput.setVolume(apn(self.audio_placeholder))
+        self.__apply_volume(self.audio_placeholder)
         self.new_config['volume'] = self.audio_placeholder
         if self.audio_placeholder:
-            self.audioplay.setIcon(QtGui.QIcon(self.path.expand('r_files','data','media',f'audio_max.{fmt}')))
-            self.audioplay.setToolTip(self.lang.fromKey("audioacceso"))
-        else:
-            self.audioplay.setIcon(QtGui.QIcon(self.path.expand('r_files','data','media',f'audio_min.{fmt}')))
-            self.audioplay.setToolTip(self.lang.fromKey("audiospento"))
+            if self.assets.apply(self.audioplay,'audio_max'):
+                self.lang.bind(self.audioplay,"toolTip","audioacceso")
+        elif self.assets.apply(self.audioplay,'audio_min'):
+            self.lang.bind(self.audioplay,"toolTip","audiospento")
     
-    def __media_status_changed(self,v):
-        '''Function to stop media, when reached its end'''
-        if v == QMediaPlayer.EndOfMedia:
-            self.mediaPlayer.setPosition(0)
-            self.stop()
+    def __rate_changed(self,rate):
+        '''Show the playback rate next to the total time, nothing at 1x'''
+        self.rate_label.setText("" if rate == 1.0 else f"{rate:g}\u00d7")
+        self.rate_label.setVisible(rate != 1.0)
+
+    def __apply_volume(self,value):
+        '''Set the volume of the slider value, with the loudness gain of the playing file
+
+        Parameters:
+            value (int): slider value, between 0 and 100
+        '''
+        self.audioOutput.setVolume(min(1.0,apn(value)*self.track_gain))
+
+    def __media_finished(self):
+        '''Function to stop media, when reached its end with an empty queue'''
+        self.mediaPlayer.setPosition(0)
+        self.stop()
+
+    def __resume_position(self,player,state):
+        '''Seek to the position where the loaded file was left'''
+        if state == SourceLoader.Loaded and player.loader.resume_position > 0:
+            player.seeker.seek(player.loader.resume_position)
+
+    def __load_waveform(self,player,state):
+        '''Request the waveform of a loaded music file, clearing the old one on a new load'''
+        if state == SourceLoader.Queued:
+            player.bar.setWaveform(None)
+        elif state == SourceLoader.Loaded and player.loader.fingerprint \
+             and player.hasAudio() and not player.hasVideo():
+            self.waveforms.request(player.loader.path,player.loader.fingerprint)
+
+    def __waveform_ready(self,fp,peaks):
+        '''Show the waveform on the timeline of the player holding the file'''
+        for player in (self.engine.active,self.engine.standby):
+            if player.loader.fingerprint == fp:
+                player.bar.setWaveform(peaks)
+
+    def __load_loudness(self,player,state):
+        '''Request the loudness of a loaded file with audio, resetting the gain when the playing file changes'''
+        if not self.normalize:
+            return
+        if state == SourceLoader.Queued and player is self.mediaPlayer:
+            self.__update_gain()
+        elif state == SourceLoader.Loaded and player.loader.fingerprint and player.hasAudio():
+            self.loudness.request(player.loader.path,player.loader.fingerprint)
+
+    def __loudness_ready(self,fp,info):
+        '''Apply the gain of the playing file once its loudness is known'''
+        if self.mediaPlayer.loader.fingerprint == fp:
+            self.__update_gain()
+
+    def __update_gain(self):
+        '''Set the loudness gain of the playing file, 1 while it is not analysed'''
+        gain = 1.0
+        if self.normalize and self.mediaPlayer.loader.fingerprint:
+            gain = track_gain(self.loudness.memory.get(self.mediaPlayer.loader.fingerprint))
+        if gain != self.track_gain:
+            self.track_gain = gain
+            if self.audioOutput.volume():
+                self.__apply_volume(self.audio_placeholder)
+
+    def __record_position(self,player,pos,force=False):
+        '''Queue the position of the playing file in the resume store, at most every RESUME_INTERVAL ms
+
+        Parameters:
+            player (MediaPlayer): player whose position changed
+            pos (int): position in milliseconds
+            force (bool): ignore the RESUME_INTERVAL limit
+        '''
+        if player is not self.mediaPlayer or not player.loader.fingerprint:
+            return
+        now = time.monotonic()
+        if force or (now - self.last_resume_update)*1000.0 >= RESUME_INTERVAL:
+            self.last_resume_update = now
+            self.resume.update(player.loader.fingerprint,player.loader.path,pos,player.duration())
+
+    def saveResume(self):
+        '''Write the position of the playing file and the queued ones, stopping the resume writer'''
+        self.__record_position(self.mediaPlayer,self.mediaPlayer.position(),True)
+        self.resume.close()
+
+    def __media_swapped(self,old,new):
+        '''Show the status widgets of the player which took over the outputs'''
+        if old.loader.fingerprint:
+            self.resume.update(old.loader.fingerprint,old.loader.path,old.duration(),old.duration())
+        for w_old,w_new in ((old.current_time,new.current_time),(old.bar,new.bar),(old.total_time,new.total_time)):
+            self.lcontrol.replaceWidget(w_old,w_new)
+            w_old.hide()
+            w_new.show()
+        self.mediaPlayer = new
+        self.health.setPlayer(new)
+        old.bar.setLoop(-1,-1)
+        self.segments.setPlayer(new)
+        self.rates.setPlayer(new)
+        self.__update_gain()
+        self.arg = self.engine.current
+        self.mediaChanged.emit(self.arg)
 def apn(pl):
-    '''Volume conversion from linear to cubic scale'''
+    '''Volume conversion from the cubic scale of the slider (0-100) to the linear scale of QAudioOutput (0-1)'''
     linear_volume = QAudio.convertVolume(pl/100,
                                             QAudio.CubicVolumeScale,
                                             QAudio.LinearVolumeScale)
-    return linear_volume*100
+    return linear_volume
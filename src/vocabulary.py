@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we have the class:
+    VocabularyCache -> compile the vocabulary json into one binary file per language
+
+'''
+
+import hashlib
+import json
+import marshal
+import os
+
+class VocabularyCache:
+    '''Compiled vocabulary, stored as one marshal file per language
+
+    The manifest keeps size, modification time and sha1 of the json source:
+    the cache is used as long as size and time match, or the content hash
+    does when only the time changed; otherwise the json is compiled again.
+
+    Attributes:
+        source (str): vocabulary json file
+        folder (str): folder of the compiled files
+    '''
+    def __init__(self,source,folder):
+        '''Class initialization
+
+        Parameters:
+            source (str): vocabulary json file
+            folder (str): folder of the compiled files
+        '''
+        self.source = source
+        self.folder = folder
+        self.manifest_file = os.path.join(folder,"vocabulary.manifest")
+        self.fallback = None # words kept in memory when the folder is not writable
+
+    def languages(self):
+        '''Validate the cache, compiling the json if needed
+
+        Returns:
+            list: available languages, in the order of the json file
+        '''
+        st = os.stat(self.source)
+        manifest = self.__read(self.manifest_file)
+        if manifest and manifest.get("marshal") == marshal.version:
+            if manifest["size"] == st.st_size and manifest["mtime_ns"] == st.st_mtime_ns:
+                return manifest["languages"]
+            with open(self.source,"rb") as f:
+                raw = f.read()
+            if manifest["sha1"] == hashlib.sha1(raw).hexdigest():
+                manifest["size"], manifest["mtime_ns"] = st.st_size, st.st_mtime_ns
+                self.__write(self.manifest_file,manifest)
+                return manifest["languages"]
+        return self.compile()
+
+    def load(self,lang):
+        '''Load the words of a language
+
+        Parameters:
+            lang (str): language to load
+        Returns:
+            dict: dictionary from key to word
+        '''
+        if self.fallback is not None:
+            return self.fallback.get(lang,{})
+        words = self.__read(self.__language_file(lang))
+        if words is None:
+            self.compile()
+            words = self.fallback.get(lang,{}) if self.fallback is not None else self.__read(self.__language_file(lang))
+        return words if words is not None else {}
+
+    def compile(self):
+        '''Compile the json source into the per language files
+
+        Returns:
+            list: available languages, in the order of the json file
+        '''
+        with open(self.source,"rb") as f:
+            raw = f.read()
+        st = os.stat(self.source)
+        data = json.loads(raw)
+        languages = list(data[list(data)[0]].keys())
+        words = {lang:{k:v[lang] for k,v in data.items() if lang in v} for lang in languages}
+        manifest = {"marshal":marshal.version,"size":st.st_size,"mtime_ns":st.st_mtime_ns,
+                    "sha1":hashlib.sha1(raw).hexdigest(),"languages":languages}
+        try:
+            os.makedirs(self.folder,exist_ok=True)
+            for lang in languages:
+                self.__write(self.__language_file(lang),words[lang])
+            self.__write(self.manifest_file,manifest) # written last: it validates the others
+            self.fallback = None
+        except OSError:
+            self.fallback = words
+        return languages
+
+    def __language_file(self,lang):
+        return os.path.join(self.folder,f"vocabulary.{lang}.bin")
+
+    def __read(self,filename):
+        try:
+            with open(filename,"rb") as f:
+                return marshal.load(f)
+        except (OSError,EOFError,ValueError,TypeError):
+            return None
+
+    def __write(self,filename,obj):
+        tmp = filename + ".tmp"
+        with open(tmp,"wb") as f:
+            marshal.dump(obj,f)
+        os.replace(tmp,filename)
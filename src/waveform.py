@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+
+catplayer: app for video player
+
+Copyright (C) 2024 Marco Catillo
+
+Distribuited under GPLv3 license
+https://www.gnu.org/licenses/gpl-3.0.html
+
+In this python file we define the waveform timeline of the music files:
+    WaveformAccumulator -> min/max/RMS peaks of the decoded samples
+    WaveformCache -> peaks at several resolutions, decoded once per file fingerprint
+    WaveformSlider -> timeline slider drawing the peaks of the playing file and the A-B loop
+
+'''
+
+from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtGui import QColor, QPainter, QPixmap
+from PySide6.QtWidgets import QSlider, QStyle, QStyleOptionSlider
+from src.decoder import DecodeThread, audio_format
+from src.mvars import WAVEFORM_RATE, WAVEFORM_BUCKET, WAVEFORM_RESOLUTIONS
+import numpy as np
+import os
+
+def reduce_peaks(peaks,width):
+    '''Reduce min/max/RMS peaks to a given number of buckets
+
+    Parameters:
+        peaks (numpy.ndarray): (3, n) array of min, max and RMS values
+        width (int): number of buckets wanted, not larger than n
+    Returns:
+        numpy.ndarray: (3, width) array of min, max and RMS values
+    '''
+    n = peaks.shape[1]
+    starts = (np.arange(width)*n)//width
+    return np.stack([np.minimum.reduceat(peaks[0],starts),
+                     np.maximum.reduceat(peaks[1],starts),
+                     np.sqrt(np.add.reduceat(peaks[2]**2,starts)/np.diff(np.append(starts,n)))]).astype(np.float32)
+
+class WaveformAccumulator:
+    '''Min/max/RMS peaks of the decoded samples, one every WAVEFORM_BUCKET frames
+
+    The channels are averaged; the frames of a buffer which do not fill a
+    bucket are kept for the next buffer.
+    '''
+    def __init__(self):
+        self.rest = np.zeros(0,dtype=np.float32)
+        self.peaks = []
+
+    def feed(self,samples,rate):
+        '''Add the peaks of a decoded buffer
+
+        Parameters:
+            samples (numpy.ndarray): (frames, channels) float32 samples
+            rate (int): sample rate in Hz
+        '''
+        mono = np.concatenate((self.rest,samples.mean(axis=1)))
+        n = len(mono)//WAVEFORM_BUCKET*WAVEFORM_BUCKET
+        self.rest = mono[n:]
+        if n:
+            buckets = mono[:n].reshape(-1,WAVEFORM_BUCKET)
+            self.peaks.append(np.stack([buckets.min(axis=1),buckets.max(axis=1),
+                                        np.sqrt((buckets**2).mean(axis=1))]))
+
+    def result(self):
+        '''Peaks of the whole file at each of WAVEFORM_RESOLUTIONS
+
+        Returns:
+            dict: number of buckets -> (3, buckets) float32 array of min, max and RMS values
+        '''
+        if len(self.rest):
+            self.peaks.append(np.array([[self.rest.min()],[self.rest.max()],[np.sqrt((self.rest**2).mean())]]))
+        if not self.peaks:
+            raise ValueError("no audio samples")
+        peaks = np.concatenate(self.peaks,axis=1)
+        return {width:reduce_peaks(peaks,min(width,peaks.shape[1])) for width in WAVEFORM_RESOLUTIONS}
+
+class WaveformCache(QObject):
+    '''Peaks at several resolutions, decoded once per file fingerprint and kept on disk
+
+    The decoding runs in a DecodeThread at WAVEFORM_RATE Hz mono; the
+    peaks are saved as a numpy archive named after the fingerprint.
+
+    Attributes:
+        folder (str): folder of the peaks on disk
+        memory (dict): peaks of the files already loaded, by fingerprint
+    '''
+    ready = Signal(str,dict) # fingerprint, peaks by number of buckets
+
+    def __init__(self,folder):
+        '''Class initialization
+
+        Parameters:
+            folder (str): folder of the peaks on disk
+        '''
+        super().__init__()
+        self.folder = folder
+        self.memory = {}
+        self.decoder = None
+
+    def request(self,path,fp):
+        '''Emit ready with the peaks of a file, decoding it in the background the first time
+
+        Parameters:
+            path (str): audio file
+            fp (str): fingerprint of the file
+        '''
+        if fp in self.memory:
+            self.ready.emit(fp,self.memory[fp])
+            return
+        filename = os.path.join(self.folder,f"{fp}.npz")
+        try:
+            with np.load(filename) as archive:
+                self.memory[fp] = {int(k):archive[k] for k in archive.files}
+            self.ready.emit(fp,self.memory[fp])
+            return
+        except (OSError,ValueError):
+            pass
+        if self.decoder is None:
+            self.decoder = DecodeThread(audio_format(1,WAVEFORM_RATE),WaveformAccumulator,self)
+            self.decoder.finished.connect(self.__decoded)
+            self.decoder.failed.connect(self.__failed)
+        self.decoder.decode(path,fp)
+
+    def stop(self):
+        '''Stop the decoding thread'''
+        if self.decoder is not None:
+            self.decoder.stop()
+
+    def __decoded(self,path,fp,peaks):
+        self.memory[fp] = peaks
+        try:
+            os.makedirs(self.folder,exist_ok=True)
+            np.savez(os.path.join(self.folder,f"{fp}.npz"),**{str(k):v for k,v in peaks.items()})
+        except OSError as e:
+            print(f"Waveform of {path} not cached: {e}")
+        self.ready.emit(fp,peaks)
+
+    def __failed(self,path,fp,reason):
+        print(f"Waveform of {path} not available: {reason}")
+
+class WaveformSlider(QSlider):
+    '''Timeline slider drawing the peaks of the playing file behind its handle
+
+    The peaks are reduced to the width of the slider and rasterized in a
+    pixmap only when the peaks or the size change, so painting does not
+    depend on the length of the file.
+    '''
+    def __init__(self,orientation):
+        '''Class initialization
+
+        Parameters:
+            orientation (Qt.Orientation): orientation of the slider
+        '''
+        super().__init__(orientation)
+        self.peaks = None
+        self.pixmap = None
+        self.loop = None
+
+    def setWaveform(self,peaks):
+        '''Set the peaks to draw, or None for a plain slider
+
+        Parameters:
+            peaks (dict): number of buckets -> (3, buckets) array of min, max and RMS values
+        '''
+        self.peaks = peaks
+        self.pixmap = None
+        self.update()
+
+    def setLoop(self,start,end):
+        '''Set the A-B loop to draw, -1 for the points not set
+
+        Parameters:
+            start (int): loop start in milliseconds
+            end (int): loop end in milliseconds
+        '''
+        self.loop = None if start < 0 else (start,end)
+        self.update()
+
+    def resizeEvent(self,event):
+        self.pixmap = None
+        super().resizeEvent(event)
+
+    def paintEvent(self,event):
+        if not self.peaks:
+            super().paintEvent(event)
+        else:
+            if self.pixmap is None or self.pixmap.size() != self.size()*self.devicePixelRatioF():
+                self.pixmap = self.__render()
+            painter = QPainter(self)
+            painter.drawPixmap(0,0,self.pixmap)
+            option = QStyleOptionSlider()
+            self.initStyleOption(option)
+            option.subControls = QStyle.SC_SliderHandle
+            self.style().drawComplexControl(QStyle.CC_Slider,option,painter,self)
+            painter.end()
+        if self.loop is not None:
+            self.__paint_loop()
+
+    def __paint_loop(self):
+        '''Draw the A-B loop as a band over the groove, or a line at A while B is not set'''
+        start = QStyle.sliderPositionFromValue(self.minimum(),self.maximum(),self.loop[0],self.width())
+        color = self.palette().highlight().color()
+        painter = QPainter(self)
+        if self.loop[1] < 0:
+            painter.setPen(color)
+            painter.drawLine(start,0,start,self.height())
+        else:
+            end = QStyle.sliderPositionFromValue(self.minimum(),self.maximum(),self.loop[1],self.width())
+            painter.fillRect(start,0,max(1,end - start),self.height(),QColor(color.red(),color.green(),color.blue(),70))
+        painter.end()
+
+    def __render(self):
+        '''Rasterize the peaks at the current size, in O(width)'''
+        dpr = self.devicePixelRatioF()
+        width, height = max(1,int(self.width()*dpr)), max(1,int(self.height()*dpr))
+        pixmap = QPixmap(width,height)
+        pixmap.fill(Qt.transparent)
+        levels = sorted(self.peaks)
+        level = next((l for l in levels if l >= width),levels[-1])
+        peaks = self.peaks[level]
+        if peaks.shape[1] > width:
+            peaks = reduce_peaks(peaks,width)
+        scale = max(1e-6,float(np.abs(peaks[:2]).max()))
+        middle = height/2.0
+        step = width/float(peaks.shape[1])
+        painter = QPainter(pixmap)
+        color = self.palette().highlight().color()
+        for i,(low,high,rms) in enumerate(peaks.T):
+            x = int(i*step)
+            painter.setPen(QColor(color.red(),color.green(),color.blue(),110))
+            painter.drawLine(x,int(middle - high/scale*middle),x,int(middle - low/scale*middle))
+            painter.setPen(color)
+            painter.drawLine(x,int(middle - rms/scale*middle),x,int(middle + rms/scale*middle))
+        painter.end()
+        pixmap.setDevicePixelRatio(dpr)
+        return pixmap